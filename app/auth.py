@@ -1,4 +1,6 @@
 import jwt
+import asyncio
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
 from sqlalchemy import select
 from passlib.context import CryptContext
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,6 +11,7 @@ from fastapi import Depends, HTTPException, status
 from app.models.users import User as UserModel
 from app.db_depends import get_async_db
 from app.config import settings
+from app.cache import user_cache
 
 # Создаём контекст для хеширования с использованием bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -29,6 +32,40 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+_password_executor: Executor | None = None
+
+
+def get_password_executor() -> Executor:
+    """
+    Возвращает общий пул для хеширования паролей. Его размер ограничен,
+    поэтому всплеск логинов занимает не больше PASSWORD_HASH_WORKERS потоков (процессов),
+    а остальные запросы ждут своей очереди, не блокируя event loop.
+    """
+    global _password_executor
+    if _password_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _password_executor = ProcessPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS)
+        else:
+            _password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS,
+                                                    thread_name_prefix="password-hash")
+    return _password_executor
+
+
+async def hash_password_async(password: str) -> str:
+    """
+    Хеширует пароль в пуле хеширования, не блокируя event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_password_executor(), hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Проверяет пароль в пуле хеширования, не блокируя event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(get_password_executor(), verify_password,
+                                                            plain_password, hashed_password)
+
+
 def create_access_token(data: dict) -> str:
     """
     Создаёт JWT с payload (sub, role, id, exp).
@@ -49,10 +86,43 @@ def create_refresh_token(data: dict) -> str:
 
 
 
+def token_claims(user: UserModel) -> dict:
+    """
+    Данные пользователя, которые кладутся в access- и refresh-токены.
+    """
+    return {"sub": user.email, "role": user.role, "id": user.id, "ver": user.token_version}
+
+
+def user_state(user: UserModel) -> dict:
+    """
+    Данные пользователя, по которым проверяется токен; в таком виде они хранятся в user_cache.
+    """
+    return {"id": user.id, "email": user.email, "role": user.role,
+            "is_active": user.is_active, "token_version": user.token_version}
+
+
+async def get_user_state(db: AsyncSession, user_id: int) -> dict | None:
+    """
+    Возвращает данные пользователя для проверки токена из общего кэша (Redis), при промахе — из базы.
+    Локальной копии в процессе нет, поэтому смена роли и отзыв токенов действуют сразу на всех воркерах.
+    """
+    state = await user_cache.get(user_id)
+    if state is None:
+        user = await db.scalar(select(UserModel).where(UserModel.id == user_id))
+        if user is None:
+            return None
+        state = user_state(user)
+        # Не перезаписываем состояние, которое PATCH /users/{id} мог сохранить после нашего чтения
+        await user_cache.set(user_id, state, only_missing=True)
+    return state
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme),
                            db: AsyncSession = Depends(get_async_db)) -> UserModel:
     """
-    Проверяет JWT и возвращает пользователя из базы.
+    Проверяет JWT и возвращает пользователя.
+    В режиме AUTH_TRUST_TOKEN_CLAIMS пользователь берётся из кэша по id из токена,
+    а отзыв токенов обеспечивает сверка версии токена (ver) с token_version пользователя.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -72,10 +142,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme),
         )
     except jwt.PyJWTError:
         raise credentials_exception
+    # Токены, выданные до появления версий, соответствуют token_version = 0
+    token_version = payload.get("ver", 0)
+    user_id = payload.get("id")
+
+    if settings.AUTH_TRUST_TOKEN_CLAIMS and isinstance(user_id, int):
+        state = await get_user_state(db, user_id)
+        if state is None or not state["is_active"] or state["token_version"] != token_version:
+            raise credentials_exception
+        # Объект не привязан к сессии: обработчикам нужны только id и роль
+        return UserModel(**state)
+
     result = await db.scalars(
         select(UserModel).where(UserModel.email == email, UserModel.is_active == True))
     user = result.first()
-    if user is None:
+    if user is None or user.token_version != token_version:
         raise credentials_exception
     return user
 
@@ -87,6 +168,14 @@ async def get_current_seller(current_user: UserModel = Depends(get_current_user)
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only sellers can perform this action")
     return current_user
 
+async def get_current_seller_or_admin(current_user: UserModel = Depends(get_current_user)) -> UserModel:
+    """
+    Проверяет, что пользователь имеет роль 'seller' или 'admin'.
+    """
+    if current_user.role not in ("seller", "admin"):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only sellers and admins can perform this action")
+    return current_user
+
 async def get_current_buyer(current_user: UserModel = Depends(get_current_user)) -> UserModel:
     """
     Проверяет, что пользователь имеет роль 'buyer'.
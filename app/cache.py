@@ -0,0 +1,155 @@
+import json
+import time
+from typing import Any
+from collections import OrderedDict
+from collections.abc import Hashable
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.log import logger
+from app.config import settings
+
+
+class TTLCache:
+    """
+    In-process LRU-кэш с ограниченным временем жизни записей.
+    Используется для коротких кэшей в пределах одного воркера.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение по ключу или default, если записи нет или она устарела.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        Сохраняет значение и вытесняет самые давно использованные записи при переполнении.
+        """
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+_redis_client: Redis | None = None
+
+
+def get_redis() -> Redis | None:
+    """
+    Возвращает общий клиент Redis для кэшей или None, если Redis-уровень отключён.
+    По умолчанию используется тот же Redis, что и брокер Celery.
+    """
+    global _redis_client
+    if not settings.CACHE_REDIS_ENABLED:
+        return None
+    if _redis_client is None:
+        _redis_client = Redis.from_url(settings.CACHE_REDIS_URL or settings.CELERY_BROKER_URL)
+    return _redis_client
+
+
+class TieredCache:
+    """
+    Двухуровневый read-through кэш: локальный LRU в процессе и, опционально, общий Redis.
+    Локальный уровень живёт недолго, поэтому после инвалидации на другом узле
+    устаревшие данные видны не дольше local_ttl секунд.
+    Ошибки Redis не ломают запрос: кэш просто деградирует до локального уровня.
+    """
+
+    def __init__(self, namespace: str, maxsize: int, local_ttl: float, remote_ttl: int):
+        self.namespace = namespace
+        self.remote_ttl = remote_ttl
+        # local_ttl = 0 отключает локальный уровень: каждое чтение идёт в общий Redis
+        self.local = TTLCache(maxsize=maxsize, ttl=local_ttl) if local_ttl > 0 else None
+
+    def _remote_key(self, key: Hashable) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    async def get(self, key: Hashable) -> Any:
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        client = get_redis()
+        if client is None:
+            return None
+        try:
+            raw = await client.get(self._remote_key(key))
+        except RedisError as exc:
+            logger.warning(f"Cache {self.namespace}: Redis get failed: {exc}")
+            return None
+        if raw is None:
+            return None
+        value = json.loads(raw)
+        if self.local is not None:
+            self.local.set(key, value)
+        return value
+
+    async def set(self, key: Hashable, value: Any, only_missing: bool = False) -> None:
+        """
+        Сохраняет значение на обоих уровнях.
+        only_missing=True — записать в Redis, только если ключа там нет: так значение, прочитанное
+        из базы до изменения, не затрёт записанное после него.
+        """
+        if self.local is not None:
+            self.local.set(key, value)
+        client = get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(self._remote_key(key), json.dumps(value), ex=self.remote_ttl, nx=only_missing)
+        except RedisError as exc:
+            logger.warning(f"Cache {self.namespace}: Redis set failed: {exc}")
+
+    async def delete(self, *keys: Hashable) -> None:
+        if self.local is not None:
+            for key in keys:
+                self.local.delete(key)
+        client = get_redis()
+        if client is None or not keys:
+            return
+        try:
+            await client.delete(*(self._remote_key(key) for key in keys))
+        except RedisError as exc:
+            logger.warning(f"Cache {self.namespace}: Redis delete failed: {exc}")
+
+
+# Карточки товаров для GET /products/{product_id}
+product_cache = TieredCache("product", maxsize=settings.PRODUCT_CACHE_MAXSIZE,
+                            local_ttl=settings.PRODUCT_CACHE_LOCAL_TTL_SECONDS,
+                            remote_ttl=settings.PRODUCT_CACHE_TTL_SECONDS)
+
+# Данные пользователей для проверки токенов по id; перезаписываются при смене роли или блокировке.
+# Без локального уровня: отзыв токена сразу виден всем воркерам. Без Redis кэш пуст,
+# и состояние пользователя читается из базы на каждом запросе
+user_cache = TieredCache("user", maxsize=0, local_ttl=0, remote_ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+# Дерево категорий для GET /categories/tree; сбрасывается при любом изменении категорий
+category_tree_cache = TieredCache("category_tree", maxsize=1,
+                                  local_ttl=settings.CATEGORY_TREE_LOCAL_TTL_SECONDS,
+                                  remote_ttl=settings.CATEGORY_TREE_TTL_SECONDS)
+
+# То же дерево с количеством товаров: счётчики меняются вместе с товарами, поэтому TTL короткий
+category_tree_counts_cache = TieredCache("category_tree_counts", maxsize=1,
+                                         local_ttl=settings.CATEGORY_TREE_LOCAL_TTL_SECONDS,
+                                         remote_ttl=settings.CATEGORY_TREE_COUNTS_TTL_SECONDS)
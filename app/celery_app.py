@@ -13,7 +13,26 @@ celery_app.conf.update(
     result_serializer='json',
     timezone='UTC',
     enable_utc=True,
+    beat_schedule={
+        "expire-order-reservations": {
+            "task": "app.tasks.order_tasks.expire_order_reservations_task",
+            "schedule": settings.RESERVATION_EXPIRY_INTERVAL_SECONDS,
+        },
+        "cleanup-idempotency-keys": {
+            "task": "app.tasks.idempotency_tasks.cleanup_idempotency_keys_task",
+            "schedule": settings.IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS,
+        },
+        "fail-stale-product-imports": {
+            "task": "app.tasks.import_tasks.fail_stale_import_jobs_task",
+            "schedule": settings.IMPORT_SWEEP_INTERVAL_SECONDS,
+        },
+    },
 )
 
 
-import app.tasks.email_tasks
\ No newline at end of file
+import app.tasks.email_tasks
+import app.tasks.image_tasks
+import app.tasks.payment_tasks
+import app.tasks.order_tasks
+import app.tasks.idempotency_tasks
+import app.tasks.import_tasks
\ No newline at end of file
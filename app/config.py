@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -16,6 +17,15 @@ class Settings(BaseSettings):
     YOOKASSA_SHOP_ID: int
     YOOKASSA_SECRET_KEY: str
     YOOKASSA_RETURN_URL: str = "http://localhost:8000/"
+    PAYMENT_INLINE_TIMEOUT_SECONDS: float = 3.0
+    ORDER_RESERVATION_TTL_MINUTES: int = 60
+    RESERVATION_EXPIRY_INTERVAL_SECONDS: int = 60
+    RESERVATION_EXPIRY_BATCH_SIZE: int = 1000
+    IDEMPOTENCY_TTL_HOURS: int = 24
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0
+    IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS: int = 120
+    IDEMPOTENCY_CLEANUP_INTERVAL_SECONDS: int = 3600
+    IDEMPOTENCY_CLEANUP_BATCH_SIZE: int = 5000
     CELERY_BROKER_URL: str = "redis://127.0.0.1:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://127.0.0.1:6379/0"
     SMTP_HOST: str = "localhost"
@@ -23,6 +33,34 @@ class Settings(BaseSettings):
     SMTP_USER: str = ""
     SMTP_PASSWORD: str = ""
     SMTP_FROM: str = "noreply@online-store.com"
+    COUNT_CACHE_TTL_SECONDS: int = 30
+    COUNT_ESTIMATE_MIN_ROWS: int = 10000
+    CACHE_REDIS_ENABLED: bool = False
+    CACHE_REDIS_URL: str | None = None
+    PRODUCT_CACHE_MAXSIZE: int = 10000
+    PRODUCT_CACHE_LOCAL_TTL_SECONDS: int = 5
+    PRODUCT_CACHE_TTL_SECONDS: int = 60
+    AUTH_TRUST_TOKEN_CLAIMS: bool = True
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+    PASSWORD_HASH_WORKERS: int = 2
+    USER_CACHE_TTL_SECONDS: int = 300
+    SUGGEST_RELOAD_SECONDS: int = 300
+    CATEGORY_TREE_LOCAL_TTL_SECONDS: int = 30
+    CATEGORY_TREE_TTL_SECONDS: int = 86400
+    CATEGORY_TREE_COUNTS_TTL_SECONDS: int = 60
+    FAST_JSON_RESPONSES: bool = True
+    EXPORT_BATCH_SIZE: int = 1000
+    IMPORT_BATCH_SIZE: int = 1000
+    IMPORT_MAX_FILE_SIZE: int = 50 * 1024 * 1024
+    IMPORT_MAX_ERRORS: int = 1000
+    IMPORT_UPLOAD_DIR: str | None = None
+    IMPORT_STALE_MINUTES: int = 30
+    IMPORT_SWEEP_INTERVAL_SECONDS: int = 300
+    MEDIA_STORAGE_ROOT: str | None = None
+    RESIZE_CACHE_DIR: str | None = None
+    RESIZE_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    RESIZE_WORKERS: int = 2
+    SUGGEST_SCAN_LIMIT: int = 5000
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
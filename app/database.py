@@ -1,4 +1,5 @@
 from sqlalchemy.orm import DeclarativeBase, declared_attr
+from sqlalchemy.pool import NullPool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession,  AsyncAttrs
 
 from app.config import settings
@@ -18,4 +19,9 @@ DATABASE_URL = f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASSWORD}@
 async_engine = create_async_engine(DATABASE_URL, echo=True)
 
 # Настраиваем фабрику сеансов
-async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
\ No newline at end of file
+async_session_maker = async_sessionmaker(async_engine, expire_on_commit=False, class_=AsyncSession)
+
+# Фабрика сеансов для задач Celery: каждая задача запускает свой event loop через asyncio.run,
+# а соединения asyncpg нельзя переиспользовать между циклами, поэтому без пула
+task_engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+task_session_maker = async_sessionmaker(task_engine, expire_on_commit=False, class_=AsyncSession)
@@ -0,0 +1,188 @@
+import time
+import asyncio
+import hashlib
+from datetime import timedelta
+import jwt
+from fastapi import Request, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, delete, update, func, or_, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session_maker
+from app.models.idempotency_keys import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENT_METHODS = ("POST",)
+MAX_KEY_LENGTH = 255
+# Ответы, после которых повтор с тем же ключом должен выполнить запрос заново:
+# ошибки сервера и конфликты параллельных изменений (например, корзина изменилась во время checkout)
+RETRYABLE_STATUSES = (status.HTTP_409_CONFLICT, status.HTTP_429_TOO_MANY_REQUESTS)
+# Ответы выдачи токенов не сохраняются ни под каким ключом: JWT не должны лежать в базе.
+# /users/refresh-token принимает refresh-токен в Authorization, поэтому одной проверки scope мало
+EXCLUDED_PATHS = ("/users/token", "/users/refresh-token")
+POLL_INITIAL_DELAY_SECONDS = 0.05
+POLL_MAX_DELAY_SECONDS = 0.5
+
+
+def _request_scope(request: Request) -> str | None:
+    """
+    Область уникальности ключа: пользователь из access-токена.
+    None — запрос без токена или с токеном, не прошедшим проверку: анонимные клиенты
+    не различимы между собой, поэтому ключ для них не применяется.
+    """
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    return f"user:{payload['sub']}" if payload.get("sub") else None
+
+
+def _request_hash(request: Request, body: bytes) -> str:
+    digest = hashlib.sha256()
+    for part in (request.method, request.url.path, request.url.query):
+        digest.update(part.encode())
+        digest.update(b"\x00")
+    digest.update(body)
+    return digest.hexdigest()
+
+
+def _build_response(status_code: int, headers: list[list[str]], body: bytes, replayed: bool) -> Response:
+    response = Response(content=body, status_code=status_code)
+    response.raw_headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return response
+
+
+async def _claim(scope: str, key: str, request_hash: str) -> tuple[int | None, IdempotencyKey | None]:
+    """
+    Пытается занять ключ. Возвращает (id новой записи, None), если запрос нужно выполнить,
+    иначе (None, существующая запись); (None, None) — запись исчезла, попытку нужно повторить.
+    """
+    async with async_session_maker() as session:
+        record_id = await session.scalar(
+            insert(IdempotencyKey)
+            .values(scope=scope, key=key, request_hash=request_hash, status="processing",
+                    expires_at=func.now() + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS))
+            .on_conflict_do_nothing(constraint="uq_idempotency_keys_scope_key")
+            .returning(IdempotencyKey.id)
+        )
+        record = None
+        if record_id is None:
+            # Истёкший ключ и запрос, обработка которого оборвалась (например, при перезапуске воркера),
+            # не должны блокировать повторы: такие записи удаляем и занимаем ключ заново
+            await session.execute(
+                delete(IdempotencyKey)
+                .where(IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+                       or_(IdempotencyKey.expires_at < func.now(),
+                           and_(IdempotencyKey.status == "processing",
+                                IdempotencyKey.created_at < func.now() - timedelta(
+                                    seconds=settings.IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS))))
+            )
+            record = await session.scalar(
+                select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+            )
+        await session.commit()
+        return record_id, record
+
+
+async def _release(record_id: int) -> None:
+    async with async_session_maker() as session:
+        await session.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+        await session.commit()
+
+
+async def _complete(record_id: int, status_code: int, headers: list[list[str]], body: bytes) -> None:
+    async with async_session_maker() as session:
+        await session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.id == record_id)
+            .values(status="completed", response_status=status_code, response_headers=headers,
+                    response_body=body, completed_at=func.now())
+        )
+        await session.commit()
+
+
+async def _execute(request: Request, call_next, record_id: int) -> Response:
+    try:
+        response = await call_next(request)
+        body = b"".join([chunk async for chunk in response.body_iterator])
+    except Exception:
+        await _release(record_id)
+        raise
+    headers = [[name.decode("latin-1"), value.decode("latin-1")] for name, value in response.raw_headers]
+    if response.status_code >= 500 or response.status_code in RETRYABLE_STATUSES:
+        await _release(record_id)
+    else:
+        await _complete(record_id, response.status_code, headers, body)
+    return _build_response(response.status_code, headers, body, replayed=False)
+
+
+async def idempotency_middleware(request: Request, call_next):
+    """
+    Поддержка заголовка Idempotency-Key для POST-запросов.
+    Первый запрос с ключом выполняется, а его ответ сохраняется в idempotency_keys;
+    повтор с тем же ключом получает сохранённый ответ без повторного выполнения.
+    Если первый запрос ещё выполняется, повтор ждёт его результата до IDEMPOTENCY_WAIT_SECONDS.
+    Повтор с тем же ключом, но другим телом или адресом отклоняется с 422.
+    Ключ учитывается только для запросов авторизованного пользователя и не применяется
+    к выдаче токенов (EXCLUDED_PATHS).
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None or request.method not in IDEMPOTENT_METHODS:
+        return await call_next(request)
+    if not key or len(key) > MAX_KEY_LENGTH:
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST,
+                            content={"detail": f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters"})
+    scope = None if request.url.path.rstrip("/") in EXCLUDED_PATHS else _request_scope(request)
+    if scope is None:
+        return await call_next(request)
+
+    request_hash = _request_hash(request, await request.body())
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = POLL_INITIAL_DELAY_SECONDS
+    while True:
+        record_id, record = await _claim(scope, key, request_hash)
+        if record_id is not None:
+            return await _execute(request, call_next, record_id)
+        if record is None:
+            continue
+        if record.request_hash != request_hash:
+            return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                                content={"detail": f"{IDEMPOTENCY_HEADER} was already used for a different request"})
+        if record.status == "completed":
+            return _build_response(record.response_status, record.response_headers, record.response_body, replayed=True)
+        if time.monotonic() >= deadline:
+            return JSONResponse(status_code=status.HTTP_409_CONFLICT,
+                                content={"detail": "A request with this Idempotency-Key is still being processed"})
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, POLL_MAX_DELAY_SECONDS)
+
+
+async def delete_expired_idempotency_keys(session: AsyncSession, batch_size: int) -> int:
+    """
+    Удаляет истёкшие ключи пачками по batch_size, фиксируя каждую пачку. Возвращает число удалённых.
+    """
+    deleted = 0
+    while True:
+        expired = (
+            select(IdempotencyKey.id)
+            .where(IdempotencyKey.expires_at < func.now())
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        result = await session.execute(delete(IdempotencyKey).where(IdempotencyKey.id.in_(expired)))
+        await session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
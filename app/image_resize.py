@@ -0,0 +1,129 @@
+import io
+import os
+import asyncio
+import hashlib
+from pathlib import Path
+from collections import OrderedDict
+import anyio
+from PIL import Image, ImageOps
+
+from app.log import logger
+from app.config import settings
+from app.media_storage import MediaStorage, MediaStat, MEDIA_DIR
+
+# Допустимые ширины: произвольная ширина позволила бы забить кэш бесконечным числом вариантов
+RESIZE_WIDTHS = (160, 320, 480, 640, 960, 1280)
+RESIZE_FORMATS = {"webp": ("WEBP", "image/webp"), "jpeg": ("JPEG", "image/jpeg"), "png": ("PNG", "image/png")}
+RESIZE_QUALITY = 80
+
+
+def resize_image(data: bytes, width: int, image_format: str) -> bytes:
+    """
+    Уменьшает изображение до заданной ширины с сохранением пропорций (без увеличения).
+    Выполняется в пуле потоков: Pillow блокирует поток на всё время обработки.
+    """
+    pil_format, _ = RESIZE_FORMATS[image_format]
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if pil_format == "JPEG" and image.mode != "RGB":
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, quality=RESIZE_QUALITY)
+        return buffer.getvalue()
+
+
+class ResizeCache:
+    """
+    Дисковый LRU-кэш уменьшенных изображений с ограничением суммарного размера.
+    Одновременные запросы одного и того же варианта объединяются в одну задачу,
+    а сама обработка идёт в пуле потоков с ограниченным числом воркеров.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, workers: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.limiter = anyio.CapacityLimiter(workers)
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._total_bytes = 0
+        self._scanned = False
+        self._in_flight: dict[str, asyncio.Task] = {}
+
+    def _scan(self) -> list[tuple[str, int]]:
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = [entry for entry in os.scandir(self.root) if entry.is_file() and not entry.name.startswith(".")]
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        return [(entry.name, entry.stat().st_size) for entry in files]
+
+    async def _ensure_scanned(self) -> None:
+        # Кэш переживает перезапуск: подхватываем файлы с диска в порядке давности
+        if self._scanned:
+            return
+        for name, size in await anyio.to_thread.run_sync(self._scan):
+            if name not in self._entries:
+                self._entries[name] = size
+                self._total_bytes += size
+        self._scanned = True
+
+    @staticmethod
+    def variant_name(key: str, source: MediaStat, width: int, image_format: str) -> str:
+        """
+        Имя файла варианта; размер и время изменения источника входят в хеш,
+        поэтому после замены исходного файла старый вариант просто перестаёт использоваться.
+        """
+        digest = hashlib.sha256(f"{key}:{source.size}:{source.modified_at.timestamp()}:{width}".encode())
+        return f"{digest.hexdigest()[:40]}.{image_format}"
+
+    async def get_or_create(self, storage: MediaStorage, key: str, source: MediaStat,
+                            width: int, image_format: str) -> tuple[Path, str]:
+        """
+        Возвращает путь к файлу варианта и его имя, при необходимости создавая его.
+        """
+        await self._ensure_scanned()
+        name = self.variant_name(key, source, width, image_format)
+        path = self.root / name
+        if name in self._entries and await anyio.Path(path).exists():
+            self._entries.move_to_end(name)
+            return path, name
+
+        # Вариант создаёт отдельная задача: отключение клиента, который её запустил,
+        # не прерывает обработку для остальных ожидающих
+        task = self._in_flight.get(name)
+        if task is None:
+            task = asyncio.create_task(self._create(storage, key, path, width, image_format))
+            self._in_flight[name] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(name, None))
+        await asyncio.shield(task)
+        return path, name
+
+    async def _create(self, storage: MediaStorage, key: str, path: Path, width: int, image_format: str) -> None:
+        data = await storage.read_bytes(key)
+        content = await anyio.to_thread.run_sync(resize_image, data, width, image_format, limiter=self.limiter)
+        partial = path.with_name(f".{path.name}.{os.getpid()}.part")
+        await anyio.Path(partial).write_bytes(content)
+        await anyio.to_thread.run_sync(os.replace, partial, path)
+        self._add(path.name, len(content))
+        await self._evict()
+
+    def _add(self, name: str, size: int) -> None:
+        self._total_bytes += size - self._entries.pop(name, 0)
+        self._entries[name] = size
+
+    async def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                await anyio.Path(self.root / name).unlink(missing_ok=True)
+            except OSError as exc:
+                logger.warning(f"Resize cache: failed to evict {name}: {exc}")
+
+
+resize_cache = ResizeCache(
+    root=Path(settings.RESIZE_CACHE_DIR) if settings.RESIZE_CACHE_DIR else MEDIA_DIR / "resized",
+    max_bytes=settings.RESIZE_CACHE_MAX_BYTES,
+    workers=settings.RESIZE_WORKERS,
+)
@@ -0,0 +1,18 @@
+from sqlalchemy import case, and_
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.models.products import Product as ProductModel
+
+
+def is_active_after_stock_change(new_stock: ColumnElement) -> ColumnElement:
+    """
+    Значение is_active для UPDATE, меняющего остаток товара, — одно правило для всех путей:
+    нулевой остаток выключает товар, переход 0 → >0 снова включает его,
+    если товар не удалён продавцом (deleted_at IS NULL). В остальных случаях is_active не меняется.
+    В SET столбцы читаются до обновления, поэтому ProductModel.stock здесь — прежний остаток.
+    """
+    return case(
+        (new_stock == 0, False),
+        (and_(ProductModel.stock == 0, new_stock > 0, ProductModel.deleted_at.is_(None)), True),
+        else_=ProductModel.is_active,
+    )
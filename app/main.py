@@ -1,13 +1,31 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 
 from app.log import log_middleware
-from app.routers import categories, products, users, reviews, cart, orders, payments
+from app.idempotency import idempotency_middleware
+from app.routers import categories, products, users, reviews, cart, orders, payments, media
+from app.media_storage import MEDIA_DIR
 from app.celery_app import celery_app
+from app.suggest import suggest_index
 
-app = FastAPI(title="Интернет-магазин", version="0.1.0")
 
-app.mount("/media", StaticFiles(directory="media"), name="media")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Прогревает индекс подсказок в фоне: приложение сразу принимает запросы,
+    а первый /products/suggest не загружает каталог сам.
+    """
+    warm_up = asyncio.create_task(suggest_index.warm_up())
+    yield
+    warm_up.cancel()
+
+
+app = FastAPI(title="Интернет-магазин", version="0.1.0", lifespan=lifespan)
+
+# Idempotency-Key обрабатывается внутри логирования: повторы и ошибки тоже попадают в лог
+app.middleware("http")(idempotency_middleware)
 app.middleware("http")(log_middleware)
 
 app.include_router(cart.router)
@@ -17,6 +35,10 @@ app.include_router(users.router)
 app.include_router(reviews.router)
 app.include_router(orders.router)
 app.include_router(payments.router)
+app.include_router(media.router)
+
+# Файлы по хешу отдаёт media.router, остальные (старые загрузки) — статика; порядок важен
+app.mount("/media", StaticFiles(directory=MEDIA_DIR, check_dir=False), name="media")
 
 @app.get("/")
 async def root() -> dict:
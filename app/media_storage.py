@@ -0,0 +1,127 @@
+import os
+import shutil
+from abc import ABC, abstractmethod
+from pathlib import Path
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from collections.abc import AsyncIterator
+import anyio
+
+from app.config import settings
+
+MEDIA_DIR = Path(__file__).resolve().parent.parent / "media"
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class MediaStat:
+    size: int
+    modified_at: datetime
+
+
+class MediaStorage(ABC):
+    """
+    Хранилище медиафайлов. Ключ — относительный путь вида "cas/<sha256>.png",
+    публичный URL файла — "/media/<ключ>". Реализация может хранить файлы
+    на локальном или общем диске либо в S3-совместимом хранилище,
+    чтобы несколько узлов API работали с одними и теми же файлами.
+    """
+
+    @abstractmethod
+    async def put_file(self, key: str, source: Path) -> None:
+        """
+        Переносит локальный файл в хранилище под ключом key. Исходный файл после вызова не существует.
+        """
+
+    @abstractmethod
+    async def put_bytes(self, key: str, data: bytes) -> None:
+        """
+        Сохраняет содержимое под ключом key.
+        """
+
+    @abstractmethod
+    async def stat(self, key: str) -> MediaStat | None:
+        """
+        Возвращает размер и время изменения файла или None, если файла нет.
+        """
+
+    @abstractmethod
+    async def read_bytes(self, key: str) -> bytes:
+        """
+        Читает файл целиком. Бросает FileNotFoundError, если файла нет.
+        """
+
+    @abstractmethod
+    def stream(self, key: str) -> AsyncIterator[bytes]:
+        """
+        Отдаёт содержимое файла частями.
+        """
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """
+        Удаляет файл, если он существует.
+        """
+
+    async def exists(self, key: str) -> bool:
+        return await self.stat(key) is not None
+
+
+class LocalDiskStorage(MediaStorage):
+    """
+    Хранилище в каталоге на диске. Для нескольких узлов API каталог монтируется как общий том.
+    Запись идёт во временный файл с атомарным переименованием, поэтому
+    читатели никогда не видят недописанный файл.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        path = (self.root / key).resolve()
+        if not path.is_relative_to(self.root.resolve()):
+            raise ValueError(f"Invalid media key: {key}")
+        return path
+
+    @staticmethod
+    def _partial(path: Path) -> Path:
+        return path.with_name(f".{path.name}.part")
+
+    async def put_file(self, key: str, source: Path) -> None:
+        path = self._path(key)
+        partial = self._partial(path)
+        await anyio.Path(path.parent).mkdir(parents=True, exist_ok=True)
+        # shutil.move копирует файл, если источник лежит на другой файловой системе
+        await anyio.to_thread.run_sync(shutil.move, source, partial)
+        # Временные файлы создаются с правами 0600, а файл должны читать и воркеры, и веб-сервер
+        await anyio.Path(partial).chmod(0o644)
+        await anyio.to_thread.run_sync(os.replace, partial, path)
+
+    async def put_bytes(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        partial = self._partial(path)
+        await anyio.Path(path.parent).mkdir(parents=True, exist_ok=True)
+        await anyio.Path(partial).write_bytes(data)
+        await anyio.to_thread.run_sync(os.replace, partial, path)
+
+    async def stat(self, key: str) -> MediaStat | None:
+        try:
+            result = await anyio.Path(self._path(key)).stat()
+        except FileNotFoundError:
+            return None
+        return MediaStat(size=result.st_size, modified_at=datetime.fromtimestamp(result.st_mtime, tz=timezone.utc))
+
+    async def read_bytes(self, key: str) -> bytes:
+        return await anyio.Path(self._path(key)).read_bytes()
+
+    async def stream(self, key: str) -> AsyncIterator[bytes]:
+        async with await anyio.open_file(self._path(key), "rb") as source:
+            while chunk := await source.read(STREAM_CHUNK_SIZE):
+                yield chunk
+
+    async def delete(self, key: str) -> None:
+        await anyio.Path(self._path(key)).unlink(missing_ok=True)
+
+
+media_storage: MediaStorage = LocalDiskStorage(Path(settings.MEDIA_STORAGE_ROOT) if settings.MEDIA_STORAGE_ROOT else MEDIA_DIR)
@@ -0,0 +1,48 @@
+"""Add product filter indexes
+
+Revision ID: 5d2f8a1c9e47
+Revises: c8ac31c4e94b
+Create Date: 2026-10-17 10:12:41.318205
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8a1c9e47'
+down_revision: Union[str, Sequence[str], None] = 'c8ac31c4e94b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (имя индекса, колонки, условие частичного индекса)
+PRODUCT_INDEXES: tuple[tuple[str, list[str], str], ...] = (
+    ('ix_products_active_id', ['id'], 'is_active = true'),
+    ('ix_products_active_category_id', ['category_id', 'id'], 'is_active = true'),
+    ('ix_products_active_seller_id', ['seller_id', 'id'], 'is_active = true'),
+    ('ix_products_active_price', ['price', 'id'], 'is_active = true'),
+    ('ix_products_active_category_price', ['category_id', 'price'], 'is_active = true'),
+    ('ix_products_active_seller_price', ['seller_id', 'price'], 'is_active = true'),
+    ('ix_products_active_in_stock_id', ['id'], 'is_active = true AND stock > 0'),
+    ('ix_products_active_out_of_stock_id', ['id'], 'is_active = true AND stock = 0'),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в products, но не может выполняться внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, columns, where in PRODUCT_INDEXES:
+            op.create_index(name, 'products', columns, unique=False,
+                            postgresql_where=sa.text(where), postgresql_concurrently=True,
+                            if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(PRODUCT_INDEXES):
+            op.drop_index(name, table_name='products', postgresql_concurrently=True, if_exists=True)
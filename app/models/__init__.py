@@ -1,8 +1,12 @@
 from .users import User
 from .reviews import Review
 from .products import Product
+from .product_imports import ProductImportJob
 from .categories import Category
+from .category_closure import CategoryClosure
 from .cart_items import CartItem
 from .orders import Order, OrderItem
+from .idempotency_keys import IdempotencyKey
 
-__all__ = ["Category", "Product", "User", "Review", "CartItem", "Order", "OrderItem"]
\ No newline at end of file
+__all__ = ["Category", "CategoryClosure", "Product", "ProductImportJob", "User", "Review", "CartItem", "Order", "OrderItem",
+           "IdempotencyKey"]
\ No newline at end of file
@@ -1,7 +1,8 @@
+from datetime import datetime
 from sqlalchemy.orm import relationship
 from typing import TYPE_CHECKING, Optional
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy import String, ForeignKey, Boolean
+from sqlalchemy import String, ForeignKey, Boolean, DateTime, func
 
 from app.database import Base
 
@@ -16,6 +17,7 @@ class Category(Base):
     name: Mapped[str] = mapped_column(String(50), nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     parent_id: Mapped[int | None] = mapped_column(ForeignKey("categories.id"), nullable=True) 
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     products: Mapped[list["Product"]] = relationship("Product", back_populates="category")
     parent: Mapped[Optional["Category"]] = relationship("Category", back_populates="children", remote_side="Category.id")
     children: Mapped[list["Category"]] = relationship("Category", back_populates="parent")
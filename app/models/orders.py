@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, Boolean, DateTime, ForeignKey, CheckConstraint, Text, String, Numeric, func
+from sqlalchemy import Integer, Boolean, DateTime, ForeignKey, CheckConstraint, Text, String, Numeric, Index, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from datetime import datetime
 from decimal import Decimal
@@ -9,10 +9,15 @@ class Order(Base):
     __tablename__ = "orders"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     status: Mapped[str] = mapped_column(String(20), default="pending", nullable=False)
     total_amount: Mapped[Decimal] = mapped_column(Numeric(10, 2), default=0, nullable=False)
     payment_id: Mapped[str | None] = mapped_column(String(64), unique=True, nullable=True)
+    # Ключ идемпотентности ЮKassa: повторные попытки создать платёж по заказу возвращают тот же платёж
+    payment_idempotence_key: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    confirmation_url: Mapped[str | None] = mapped_column(String(512), nullable=True)
+    # До этого момента списанные под заказ остатки удерживаются; неоплаченный заказ затем истекает
+    reserved_until: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     paid_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -20,6 +25,13 @@ class Order(Base):
     user: Mapped["User"] = relationship("User", back_populates="orders")
     items: Mapped[list["OrderItem"]] = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # История заказов пользователя: фильтр, сортировка и keyset-пагинация без отдельной сортировки
+        Index("ix_orders_user_id_created_at", "user_id", "created_at", "id"),
+        # Для периодического снятия просроченных резервов: в индекс попадают только ожидающие оплаты заказы
+        Index("ix_orders_pending_reserved_until", "reserved_until", postgresql_where=text("status = 'pending'")),
+    )
+
 class OrderItem(Base):
     __tablename__ = "order_items"
 
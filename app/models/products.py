@@ -1,7 +1,8 @@
 from decimal import Decimal
-from sqlalchemy import ForeignKey, Computed, Index
+from datetime import datetime
+from sqlalchemy import ForeignKey, Computed, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Boolean, Integer, Numeric, Float
+from sqlalchemy import String, Boolean, Integer, Numeric, Float, DateTime, func
 from sqlalchemy.dialects.postgresql import TSVECTOR
 
 from app.database import Base
@@ -18,8 +19,11 @@ class Product(Base):
     stock: Mapped[int] = mapped_column(Integer, nullable=False)
     rating: Mapped[float] = mapped_column(Float, server_default="0.0", nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    # Мягкое удаление продавцом; отличает удалённый товар от распроданного (оба с is_active = false)
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
     category_id: Mapped[int] = mapped_column(ForeignKey("categories.id"), nullable=False)
     seller_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False) 
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     tsv: Mapped[TSVECTOR] = mapped_column(
         TSVECTOR,
@@ -32,6 +36,8 @@ class Product(Base):
             persisted=True,
         ),
         nullable=False,
+        # Вектор нужен только для фильтрации в SQL; не тянем его в каждый загружаемый товар
+        deferred=True,
     )
 
     category: Mapped["Category"] = relationship("Category", back_populates="products")
@@ -41,4 +47,15 @@ class Product(Base):
     
     __table_args__ = (
         Index("ix_products_tsv_gin", "tsv", postgresql_using="gin"),
+        # Частичные индексы под фильтры и сортировки каталога (только активные товары)
+        Index("ix_products_active_id", "id", postgresql_where=text("is_active = true")),
+        Index("ix_products_active_category_id", "category_id", "id", postgresql_where=text("is_active = true")),
+        Index("ix_products_active_seller_id", "seller_id", "id", postgresql_where=text("is_active = true")),
+        Index("ix_products_active_price", "price", "id", postgresql_where=text("is_active = true")),
+        Index("ix_products_active_category_price", "category_id", "price", postgresql_where=text("is_active = true")),
+        Index("ix_products_active_seller_price", "seller_id", "price", postgresql_where=text("is_active = true")),
+        Index("ix_products_active_in_stock_id", "id", postgresql_where=text("is_active = true AND stock > 0")),
+        Index("ix_products_active_out_of_stock_id", "id", postgresql_where=text("is_active = true AND stock = 0")),
+        # Проверка, ссылается ли ещё какой-либо товар на файл изображения перед его удалением
+        Index("ix_products_image_url", "image_url", postgresql_where=text("image_url IS NOT NULL")),
     )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Integer, Boolean, DateTime, ForeignKey, CheckConstraint, Text
+from sqlalchemy import Integer, Boolean, DateTime, ForeignKey, CheckConstraint, Text, func
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -14,6 +14,7 @@ class Review(Base):
     comment_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.now)
     grade: Mapped[int] = mapped_column(Integer, nullable=False)
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
     __table_args__ = (
     CheckConstraint("grade >= 1 AND grade <= 5", name="check_grade_range"),)
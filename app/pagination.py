@@ -0,0 +1,68 @@
+import json
+import base64
+import binascii
+from typing import Any
+from sqlalchemy import Select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+
+
+class Explain(Executable, ClauseElement):
+    """
+    Конструкция EXPLAIN (FORMAT JSON) поверх любого SELECT.
+    Возвращает одну строку с планом запроса в формате JSON.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement, analyze: bool = False):
+        self.statement = statement
+        self.analyze = analyze
+
+
+@compiles(Explain, "postgresql")
+def _compile_explain(element: Explain, compiler, **kw) -> str:
+    options = "ANALYZE, FORMAT JSON" if element.analyze else "FORMAT JSON"
+    return f"EXPLAIN ({options}) " + compiler.process(element.statement, **kw)
+
+
+# Кэш общего количества строк по нормализованному набору фильтров
+counts_cache = TTLCache(maxsize=1024, ttl=settings.COUNT_CACHE_TTL_SECONDS)
+
+
+def encode_cursor(payload: dict[str, Any]) -> str:
+    """
+    Упаковывает позицию keyset-пагинации в непрозрачную для клиента строку.
+    """
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, mode: str) -> dict[str, Any]:
+    """
+    Распаковывает курсор и проверяет, что он выдан для того же режима сортировки.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(payload, dict) or not isinstance(payload.get("id"), int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if payload.get("m") != mode:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor does not match this query")
+    return payload
+
+
+async def estimate_row_count(session: AsyncSession, statement: Select) -> int:
+    """
+    Возвращает оценку количества строк запроса по плану PostgreSQL, не выполняя сам запрос.
+    """
+    plan = await session.scalar(Explain(statement))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
@@ -2,13 +2,38 @@ from uuid import uuid4
 from typing import Any
 from decimal import Decimal
 from anyio import to_thread
+from requests import RequestException
 from yookassa import Configuration, Payment
+from yookassa.domain.exceptions import ApiError, InternalServerError, ResponseProcessingError, TooManyRequestsError
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
+from app.models.users import User as UserModel
+from app.models.orders import Order as OrderModel
+
+
+class PaymentGatewayUnavailable(Exception):
+    """
+    ЮKassa недоступна или ответила временной ошибкой (5xx, 429, 202).
+    Запрос можно повторить с тем же ключом идемпотентности; остальные ошибки
+    (настройки магазина, 4xx на данные платежа) повтором не исправить.
+    """
+
+
+def _is_transient_gateway_error(exc: Exception) -> bool:
+    if isinstance(exc, (InternalServerError, TooManyRequestsError, ResponseProcessingError)):
+        return True
+    if isinstance(exc, ApiError):
+        # Базовый ApiError SDK выбрасывает для кодов, которых не знает (502, 503, 504 от балансировщика)
+        return type(exc) is ApiError
+    # При сетевой ошибке SDK падает на разборе несуществующего ответа, исходная ошибка requests — в __context__
+    return isinstance(exc, RequestException) or isinstance(exc.__context__, RequestException)
 
 
 async def create_yookassa_payment(order_id: int, amount: Decimal,
-                                    user_email: str, description: str) -> dict[str, Any]:
+                                    user_email: str, description: str,
+                                    idempotence_key: str | None = None) -> dict[str, Any]:
 
     if not settings.YOOKASSA_SHOP_ID or not settings.YOOKASSA_SECRET_KEY:
         raise RuntimeError("Задайте YOOKASSA_SHOP_ID и YOOKASSA_SECRET_KEY в .env")
@@ -54,7 +79,12 @@ async def create_yookassa_payment(order_id: int, amount: Decimal,
     }
 
     def _request() -> Payment:
-        return Payment.create(payload, str(uuid4()))
+        try:
+            return Payment.create(payload, idempotence_key or str(uuid4()))
+        except Exception as exc:
+            if _is_transient_gateway_error(exc):
+                raise PaymentGatewayUnavailable(f"YooKassa is unavailable: {exc!r}") from exc
+            raise
     
     payment: Payment = await to_thread.run_sync(_request)
 
@@ -65,4 +95,36 @@ async def create_yookassa_payment(order_id: int, amount: Decimal,
         "id": payment.id,
         "status": payment.status,
         "confirmation_url": confirmation_url,
-    }   
\ No newline at end of file
+    }   
+
+
+async def create_order_payment(session: AsyncSession, order_id: int) -> dict[str, Any] | None:
+    """
+    Создаёт платёж ЮKassa для уже сохранённого заказа и записывает его в заказ.
+    Транзакция чтения завершается до обращения к ЮKassa, поэтому на время HTTP-запроса
+    не удерживаются ни блокировки, ни соединение из пула.
+    Повторный вызов безопасен: используется ключ идемпотентности заказа,
+    а уже созданный платёж просто возвращается.
+    """
+    order = (await session.execute(
+        select(OrderModel.id, OrderModel.total_amount, OrderModel.status, OrderModel.payment_id,
+               OrderModel.confirmation_url, OrderModel.payment_idempotence_key, UserModel.email)
+        .join(UserModel, UserModel.id == OrderModel.user_id)
+        .where(OrderModel.id == order_id)
+    )).first()
+    await session.rollback()
+    if order is None or order.status != "pending":
+        return None
+    if order.payment_id is not None:
+        return {"id": order.payment_id, "status": "pending", "confirmation_url": order.confirmation_url}
+
+    payment_info = await create_yookassa_payment(order_id=order.id, amount=order.total_amount,
+                                                 user_email=order.email, description=f"Оплата заказа #{order.id}",
+                                                 idempotence_key=order.payment_idempotence_key)
+    await session.execute(
+        update(OrderModel)
+        .where(OrderModel.id == order_id, OrderModel.payment_id.is_(None))
+        .values(payment_id=payment_info.get("id"), confirmation_url=payment_info.get("confirmation_url"))
+    )
+    await session.commit()
+    return payment_info
@@ -0,0 +1,221 @@
+import os
+import csv
+import json
+import tempfile
+from pathlib import Path
+from datetime import datetime, timezone, timedelta
+from collections.abc import Iterator
+import anyio
+from fastapi import HTTPException, UploadFile, status
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.log import logger
+from app.config import settings
+from app.database import task_session_maker
+from app.media_storage import MEDIA_DIR
+from app.schemas import ProductCreate
+from app.models.products import Product as ProductModel
+from app.models.categories import Category as CategoryModel
+from app.models.product_imports import ProductImportJob as ImportJobModel
+
+IMPORT_CHUNK_SIZE = 1024 * 1024
+# Колонки, заполняемые через COPY; rating, updated_at и tsv получают значения на стороне базы
+COPY_COLUMNS = ("name", "description", "price", "stock", "category_id", "seller_id", "is_active")
+
+# Каталог загруженных файлов импорта; API и воркер Celery должны видеть его оба (общий том).
+# Не внутри media: содержимое media раздаётся публично
+IMPORT_DIR = Path(settings.IMPORT_UPLOAD_DIR) if settings.IMPORT_UPLOAD_DIR else MEDIA_DIR.parent / "imports"
+
+product_create_adapter = TypeAdapter(ProductCreate)
+
+# Строка файла: номер, разобранные данные или текст ошибки разбора
+RawRow = tuple[int, dict | None, str | None]
+
+
+async def save_import_file(file: UploadFile) -> Path:
+    """
+    Потоково копирует загруженный файл в IMPORT_DIR, чтобы задача Celery
+    могла прочитать его после завершения запроса. Превышение IMPORT_MAX_FILE_SIZE прерывает загрузку.
+    """
+    await anyio.Path(IMPORT_DIR).mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix="product-import-", dir=IMPORT_DIR)
+    os.close(fd)
+    size = 0
+    try:
+        async with await anyio.open_file(name, "wb") as target:
+            while chunk := await file.read(IMPORT_CHUNK_SIZE):
+                size += len(chunk)
+                if size > settings.IMPORT_MAX_FILE_SIZE:
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Import file is too large")
+                await target.write(chunk)
+    except BaseException:
+        await anyio.Path(name).unlink(missing_ok=True)
+        raise
+    return Path(name)
+
+
+def _read_rows(path: Path, import_format: str) -> Iterator[RawRow]:
+    with open(path, newline="", encoding="utf-8-sig") as source:
+        if import_format == "csv":
+            for number, row in enumerate(csv.DictReader(source), start=1):
+                # Пустые ячейки CSV трактуем как отсутствующие значения
+                yield number, {key: value or None for key, value in row.items() if key is not None}, None
+            return
+        number = 0
+        for line in source:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, None, f"Invalid JSON: {exc}"
+                continue
+            if not isinstance(row, dict):
+                yield number, None, "Row must be a JSON object"
+                continue
+            yield number, row, None
+
+
+def _read_batches(path: Path, import_format: str, batch_size: int) -> Iterator[list[RawRow]]:
+    batch: list[RawRow] = []
+    for row in _read_rows(path, import_format):
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _format_validation_error(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}" for error in exc.errors())
+
+
+def _validate_batch(batch: list[RawRow]) -> tuple[list[tuple[int, ProductCreate]], list[dict]]:
+    valid, errors = [], []
+    for number, row, parse_error in batch:
+        if parse_error is not None:
+            errors.append({"row": number, "error": parse_error})
+            continue
+        try:
+            valid.append((number, product_create_adapter.validate_python(row)))
+        except ValidationError as exc:
+            errors.append({"row": number, "error": _format_validation_error(exc)})
+    return valid, errors
+
+
+async def _check_categories(session: AsyncSession,
+                            products: list[tuple[int, ProductCreate]]) -> tuple[list[tuple[int, ProductCreate]], list[dict]]:
+    """
+    Проверяет категории всей пачки одним запросом вместо запроса на каждый товар.
+    """
+    category_ids = {product.category_id for _, product in products}
+    active_ids = set(await session.scalars(
+        select(CategoryModel.id).where(CategoryModel.id.in_(category_ids), CategoryModel.is_active == True)
+    ))
+    valid, errors = [], []
+    for number, product in products:
+        if product.category_id in active_ids:
+            valid.append((number, product))
+        else:
+            errors.append({"row": number, "error": "Category not found or inactive"})
+    return valid, errors
+
+
+async def _copy_products(session: AsyncSession, products: list[tuple[int, ProductCreate]], seller_id: int) -> None:
+    """
+    Загружает пачку товаров одной командой COPY в текущей транзакции сессии.
+    """
+    connection = await session.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        ProductModel.__tablename__,
+        columns=COPY_COLUMNS,
+        records=[(product.name, product.description, product.price, product.stock, product.category_id, seller_id, True)
+                 for _, product in products],
+    )
+
+
+async def _mark_failed(job_id: int, reason: str) -> None:
+    async with task_session_maker() as session:
+        job = await session.get(ImportJobModel, job_id)
+        if job is None:
+            return
+        job.status = "failed"
+        job.finished_at = datetime.now(timezone.utc)
+        if len(job.errors) < settings.IMPORT_MAX_ERRORS:
+            job.errors = job.errors + [{"row": job.total_rows + 1, "error": reason}]
+        await session.commit()
+
+
+async def run_product_import(job_id: int, path: Path, import_format: str, seller_id: int) -> None:
+    """
+    Обработка файла импорта в воркере Celery: чтение и валидация пачками по IMPORT_BATCH_SIZE строк,
+    проверка категорий одним запросом на пачку и загрузка через COPY.
+    Каждая пачка фиксируется вместе с прогрессом задачи, поэтому при сбое
+    уже загруженные товары остаются, а в задаче видно, где обработка остановилась.
+    Задача, которую уже взял другой воркер или закрыла fail_stale_import_jobs, пропускается.
+    """
+    batches = _read_batches(path, import_format, settings.IMPORT_BATCH_SIZE)
+    try:
+        async with task_session_maker() as session:
+            claimed = await session.scalar(
+                update(ImportJobModel)
+                .where(ImportJobModel.id == job_id, ImportJobModel.status == "pending")
+                .values(status="processing")
+                .returning(ImportJobModel.id)
+            )
+            await session.commit()
+            if claimed is None:
+                logger.warning(f"Product import {job_id} is not pending, skipping")
+                return
+            job = await session.get(ImportJobModel, job_id)
+
+            # Чтение и разбор файла — блокирующие операции, выполняем их вне event loop
+            while (batch := await anyio.to_thread.run_sync(next, batches, None)) is not None:
+                valid, errors = _validate_batch(batch)
+                if valid:
+                    valid, category_errors = await _check_categories(session, valid)
+                    errors.extend(category_errors)
+                if valid:
+                    await _copy_products(session, valid, seller_id)
+                job.total_rows += len(batch)
+                job.imported_rows += len(valid)
+                job.failed_rows += len(errors)
+                free_slots = settings.IMPORT_MAX_ERRORS - len(job.errors)
+                if errors and free_slots > 0:
+                    job.errors = job.errors + sorted(errors, key=lambda error: error["row"])[:free_slots]
+                await session.commit()
+
+            job.status = "completed"
+            job.finished_at = datetime.now(timezone.utc)
+            await session.commit()
+            logger.info(f"Product import {job_id} completed: {job.imported_rows} imported, {job.failed_rows} failed")
+    except Exception as exc:
+        logger.exception(f"Product import {job_id} failed")
+        await _mark_failed(job_id, f"Import aborted: {exc}")
+    finally:
+        batches.close()
+        await anyio.Path(path).unlink(missing_ok=True)
+
+
+async def fail_stale_import_jobs(session: AsyncSession, stale_minutes: int) -> int:
+    """
+    Помечает проваленными задачи импорта, прогресс которых не менялся stale_minutes минут:
+    воркер перезапустился посреди файла или задача потерялась в очереди.
+    Уже загруженные пачки остаются, прогресс показывает, где обработка остановилась.
+    """
+    interrupted = func.jsonb_build_array(func.jsonb_build_object(
+        "row", ImportJobModel.total_rows + 1, "error", "Import interrupted, please upload the file again"))
+    job_ids = list(await session.scalars(
+        update(ImportJobModel)
+        .where(ImportJobModel.status.in_(("pending", "processing")),
+               ImportJobModel.updated_at < func.now() - timedelta(minutes=stale_minutes))
+        .values(status="failed", finished_at=func.now(), errors=ImportJobModel.errors.op("||")(interrupted))
+        .returning(ImportJobModel.id)
+    ))
+    await session.commit()
+    return len(job_ids)
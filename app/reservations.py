@@ -0,0 +1,126 @@
+import time
+from dataclasses import dataclass
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.inventory import is_active_after_stock_change
+from app.models.products import Product as ProductModel
+from app.models.orders import Order as OrderModel, OrderItem as OrderItemModel
+
+
+@dataclass
+class ReservationRelease:
+    """
+    Итог возврата резервов на склад: сколько заказов снято, сколько единиц
+    вернулось, по скольким товарам и сколько товаров снова стали доступны.
+    """
+    orders: int = 0
+    units: int = 0
+    products: int = 0
+    reactivated: int = 0
+
+    def add(self, other: "ReservationRelease") -> None:
+        self.orders += other.orders
+        self.units += other.units
+        self.products += other.products
+        self.reactivated += other.reactivated
+
+
+async def release_order_stock(session: AsyncSession, order_ids: list[int]) -> tuple[ReservationRelease, list[int]]:
+    """
+    Возвращает на склад товары заказов и снова включает распроданные (но не удалённые) товары.
+    Вызывается в той же транзакции, в которой заказы переведены из "pending",
+    поэтому каждый заказ возвращает остатки ровно один раз.
+    Возвращает итог и id затронутых товаров (для инвалидации кэша).
+    """
+    if not order_ids:
+        return ReservationRelease(), []
+    restock = (
+        select(OrderItemModel.product_id, func.sum(OrderItemModel.quantity).label("quantity"))
+        .where(OrderItemModel.order_id.in_(order_ids))
+        .group_by(OrderItemModel.product_id)
+        .subquery("restock")
+    )
+    # Блокируем товары в порядке id, как и checkout, чтобы не получить взаимную блокировку
+    await session.execute(
+        select(ProductModel.id)
+        .where(ProductModel.id.in_(select(restock.c.product_id)))
+        .order_by(ProductModel.id)
+        .with_for_update()
+    )
+    new_stock = ProductModel.stock + restock.c.quantity
+    rows = (await session.execute(
+        update(ProductModel)
+        .where(ProductModel.id == restock.c.product_id)
+        .values(stock=new_stock, is_active=is_active_after_stock_change(new_stock))
+        .returning(ProductModel.id, restock.c.quantity,
+                   and_(ProductModel.stock == restock.c.quantity, ProductModel.is_active).label("reactivated"))
+    )).all()
+    release = ReservationRelease(orders=len(order_ids), units=sum(row.quantity for row in rows),
+                                 products=len(rows), reactivated=sum(1 for row in rows if row.reactivated))
+    return release, [row.id for row in rows]
+
+
+async def cancel_pending_order(session: AsyncSession, order_id: int) -> list[int] | None:
+    """
+    Отменяет ожидающий оплаты заказ и возвращает его остатки на склад.
+    Условный переход из "pending" гарантирует, что остатки вернутся один раз, даже если
+    заказ параллельно снимает задача истечения резервов. Возвращает id затронутых товаров
+    или None, если заказ уже не ожидал оплаты. Коммит — на вызывающей стороне.
+    """
+    canceled_id = await session.scalar(
+        update(OrderModel)
+        .where(OrderModel.id == order_id, OrderModel.status == "pending")
+        .values(status="canceled", reserved_until=None)
+        .returning(OrderModel.id)
+    )
+    if canceled_id is None:
+        return None
+    _, product_ids = await release_order_stock(session, [canceled_id])
+    return product_ids
+
+
+async def expire_reservations(session: AsyncSession, batch_size: int) -> tuple[ReservationRelease, list[int]]:
+    """
+    Переводит в "expired" до batch_size просроченных неоплаченных заказов и возвращает их остатки.
+    Заказы, строки которых в этот момент меняет другая транзакция (условный переход вебхука
+    или отмены checkout), пропускаются: после её коммита заказ либо уже не "pending", либо будет
+    обработан следующим запуском. Коммит — на вызывающей стороне.
+    """
+    expired = (
+        select(OrderModel.id)
+        .where(OrderModel.status == "pending", OrderModel.reserved_until < func.now())
+        .order_by(OrderModel.reserved_until)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .cte("expired")
+    )
+    order_ids = list((await session.scalars(
+        update(OrderModel)
+        .where(OrderModel.id == expired.c.id)
+        .values(status="expired", reserved_until=None)
+        .returning(OrderModel.id)
+    )).all())
+    return await release_order_stock(session, order_ids)
+
+
+async def expire_all_reservations(session: AsyncSession, batch_size: int) -> dict[str, int | float]:
+    """
+    Снимает все просроченные резервы пачками по batch_size, фиксируя каждую пачку отдельно,
+    чтобы блокировки товаров не держались дольше одной пачки. Возвращает метрики запуска.
+    """
+    started = time.perf_counter()
+    total = ReservationRelease()
+    batches = 0
+    while True:
+        release, _ = await expire_reservations(session, batch_size)
+        await session.commit()
+        if not release.orders:
+            break
+        batches += 1
+        total.add(release)
+        if release.orders < batch_size:
+            break
+    return {"orders": total.orders, "units": total.units, "products": total.products,
+            "reactivated": total.reactivated, "batches": batches,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
@@ -1,8 +1,9 @@
 from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Response, status
-from sqlalchemy import delete, select
+from sqlalchemy import delete, select, update, func, literal, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import contains_eager
 
 from app.auth import get_current_buyer
 from app.db_depends import get_async_db
@@ -14,25 +15,14 @@ from app.schemas import (
     CartItem as CartItemSchema,
     CartItemCreate,
     CartItemUpdate,
+    CartBatchUpdate,
+    CartSummary,
 )
 
 
 router = APIRouter(prefix="/cart", tags=["carts"])
 
 
-async def _get_cart_item(
-    session: AsyncSession, user_id: int, product_id: int
-) -> CartItemModel | None:
-    result = await session.scalars(
-        select(CartItemModel)
-        .options(selectinload(CartItemModel.product))
-        .where(
-            CartItemModel.user_id == user_id,
-            CartItemModel.product_id == product_id,
-        )
-    )
-    return result.first()
-
 async def _check_product_item(session: AsyncSession, product_id: int) -> ProductModel:
 
     check_stuck_product = await session.scalars(select(ProductModel).
@@ -44,72 +34,167 @@ async def _check_product_item(session: AsyncSession, product_id: int) -> Product
     return product
 
 
+async def _changed_item(session: AsyncSession, statement) -> CartItemSchema | None:
+    """
+    Выполняет изменение позиции (INSERT/UPDATE ... RETURNING) и в том же запросе
+    подтягивает товар, чтобы вернуть позицию без повторного чтения.
+    """
+    changed = statement.returning(CartItemModel.id, CartItemModel.quantity, CartItemModel.product_id).cte("changed")
+    row = (await session.execute(
+        select(changed.c.id, changed.c.quantity, ProductModel)
+        .join(ProductModel, ProductModel.id == changed.c.product_id)
+    )).first()
+    if row is None:
+        return None
+    return CartItemSchema(id=row.id, quantity=row.quantity, product=row.Product)
+
+
+def _cart_totals(window: bool = False) -> tuple:
+    """
+    Итоги корзины (количество товаров и сумма) — общие для GET /cart/ и GET /cart/summary.
+    window=True — оконные суммы по всем позициям пользователя рядом с каждой позицией.
+    """
+    total_quantity = func.sum(CartItemModel.quantity)
+    total_price = func.sum(CartItemModel.quantity * ProductModel.price)
+    if window:
+        total_quantity, total_price = total_quantity.over(), total_price.over()
+    return (func.coalesce(total_quantity, 0).label("total_quantity"),
+            func.coalesce(total_price, 0).label("total_price"))
+
+
+async def _load_cart(session: AsyncSession, user_id: int) -> CartSchema:
+    """
+    Загружает корзину одним запросом: позиции вместе с товарами,
+    а итоги считаются в SQL оконными суммами по всем позициям пользователя.
+    """
+    rows = (await session.execute(
+        select(CartItemModel, *_cart_totals(window=True))
+        .join(CartItemModel.product)
+        .options(contains_eager(CartItemModel.product))
+        .where(CartItemModel.user_id == user_id)
+        .order_by(CartItemModel.id)
+    )).all()
+    if not rows:
+        return CartSchema(user_id=user_id, items=[], total_quantity=0, total_price=Decimal("0"))
+    return CartSchema(user_id=user_id, items=[row.CartItem for row in rows],
+                      total_quantity=rows[0].total_quantity, total_price=rows[0].total_price)
+
 
 @router.get('/', response_model=CartSchema, status_code=status.HTTP_200_OK)
 async def get_cart(current_user: UserModel =  Depends(get_current_buyer), session: AsyncSession = Depends(get_async_db)):
-    
-    stmt_check_cart = await session.scalars(
-        select(CartItemModel)
-        .options(selectinload(CartItemModel.product))
-        .where(
-            CartItemModel.user_id == current_user.id,
-        )
-    )
-    check_cart_user = stmt_check_cart.all()
-    total_quantity = sum(elem.quantity for elem in check_cart_user)
-    total_sum_elem = (Decimal(elem.quantity) * (elem.product.price if elem.product.price is not None else Decimal("0")) 
-                 for elem in check_cart_user)
-    total_sum = sum(total_sum_elem, Decimal("0"))
-    
-    return CartSchema(user_id=current_user.id, items=check_cart_user, total_quantity=total_quantity, total_price=total_sum)
+
+    return await _load_cart(session, current_user.id)
+
+@router.get("/summary", response_model=CartSummary, status_code=status.HTTP_200_OK)
+async def get_cart_summary(current_user: UserModel = Depends(get_current_buyer),
+                           session: AsyncSession = Depends(get_async_db)):
+    """
+    Возвращает количество позиций, товаров и сумму корзины одним агрегирующим запросом без загрузки товаров.
+    """
+    row = (await session.execute(
+        select(func.count(CartItemModel.id).label("items_count"), *_cart_totals())
+        .join(ProductModel, ProductModel.id == CartItemModel.product_id)
+        .where(CartItemModel.user_id == current_user.id)
+    )).one()
+    return CartSummary(user_id=current_user.id, items_count=row.items_count,
+                       total_quantity=row.total_quantity, total_price=row.total_price)
 
 @router.post("/items", response_model=CartItemSchema, status_code=status.HTTP_201_CREATED)
 async def add_new_items(cart_item: CartItemCreate,current_user: UserModel =  Depends(get_current_buyer),
                          session: AsyncSession = Depends(get_async_db)):
-    
-    product = await _check_product_item(session=session, product_id=cart_item.product_id)
-    cart_item_model = await _get_cart_item(session=session, user_id=current_user.id, product_id=cart_item.product_id)
-
-    if cart_item_model:
-        cart_item_model.quantity += cart_item.quantity
-    else:
-        new_cart_item = CartItemModel(user_id=current_user.id,
-                                       product_id=cart_item.product_id,
-                                       quantity=cart_item.quantity)
-        session.add(new_cart_item)
-
+    """
+    Добавляет товар в корзину или увеличивает его количество одним UPSERT.
+    Проверка активности товара выполняется в том же запросе.
+    """
+    stmt = insert(CartItemModel).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(literal(current_user.id), ProductModel.id, literal(cart_item.quantity))
+        .where(ProductModel.id == cart_item.product_id, ProductModel.is_active == True)
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_cart_items_user_product",
+        set_={"quantity": CartItemModel.quantity + stmt.excluded.quantity, "updated_at": func.now()},
+    )
+    updated_item = await _changed_item(session, stmt)
+    if updated_item is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found")
     await session.commit()
-    updated_item = await _get_cart_item(session=session, user_id=current_user.id, product_id=cart_item.product_id)
     return updated_item
 
+@router.post("/items/batch", response_model=CartSchema, status_code=status.HTTP_200_OK)
+async def update_items_batch(batch: CartBatchUpdate, current_user: UserModel = Depends(get_current_buyer),
+                             session: AsyncSession = Depends(get_async_db)):
+    """
+    Применяет пакет изменений корзины атомарно: количество задаётся как есть, 0 удаляет позицию.
+    Все позиции обновляются одним UPSERT по unnest-массивам и одним DELETE.
+    """
+    to_delete = [item.product_id for item in batch.items if item.quantity == 0]
+    to_set = [item for item in batch.items if item.quantity > 0]
+
+    if to_delete:
+        await session.execute(
+            delete(CartItemModel).where(CartItemModel.user_id == current_user.id,
+                                        CartItemModel.product_id.in_(to_delete))
+        )
+    if to_set:
+        changes = func.unnest(
+            bindparam("product_ids", [item.product_id for item in to_set], type_=ARRAY(Integer)),
+            bindparam("quantities", [item.quantity for item in to_set], type_=ARRAY(Integer)),
+        ).table_valued("product_id", "quantity").render_derived(name="changes")
+        stmt = insert(CartItemModel).from_select(
+            ["user_id", "product_id", "quantity"],
+            select(literal(current_user.id), ProductModel.id, changes.c.quantity)
+            .join(ProductModel, ProductModel.id == changes.c.product_id)
+            .where(ProductModel.is_active == True)
+        )
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_cart_items_user_product",
+            set_={"quantity": stmt.excluded.quantity, "updated_at": func.now()},
+        ).returning(CartItemModel.product_id)
+        saved = set(await session.scalars(stmt))
+        missing = sorted({item.product_id for item in to_set} - saved)
+        if missing:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                                detail=f"Products not found: {', '.join(map(str, missing))}")
+    await session.commit()
+    return await _load_cart(session, current_user.id)
+
 @router.post("/items/{product_id}", response_model=CartItemSchema, status_code=status.HTTP_200_OK)
 async def updated_item_cart(product_id: int, new_cart_item: CartItemUpdate, current_user: UserModel = Depends(get_current_buyer),
                              session: AsyncSession = Depends(get_async_db)):
-    
-    product = await _check_product_item(session=session, product_id=product_id)
-    cart_item_model = await _get_cart_item(session=session, user_id=current_user.id, product_id=product_id)
-    if cart_item_model:
-        cart_item_model.quantity = new_cart_item.quantity
-    else:
+    """
+    Меняет количество товара в корзине одним UPDATE, если товар активен.
+    """
+    updated_item = await _changed_item(session, update(CartItemModel)
+        .where(CartItemModel.user_id == current_user.id,
+               CartItemModel.product_id == product_id,
+               CartItemModel.product_id == ProductModel.id,
+               ProductModel.is_active == True)
+        .values(quantity=new_cart_item.quantity))
+    if updated_item is None:
+        # Запрос только на пути ошибки: различаем отсутствующий товар и отсутствующую позицию
+        await _check_product_item(session=session, product_id=product_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="This item not found in your cart")
-
     await session.commit()
-    updated_item = await _get_cart_item(session=session, user_id=current_user.id, product_id=product_id)
     return updated_item
 
 @router.delete("/items/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_item_by_product_id(product_id: int,
                                      current_user: UserModel = Depends(get_current_buyer),
                                      session: AsyncSession = Depends(get_async_db)):
-    
-    product = await _check_product_item(session=session, product_id=product_id)
-    cart_item_model = await _get_cart_item(session=session, user_id=current_user.id, product_id=product_id)
-    if cart_item_model:
-        await session.delete(cart_item_model)
-        await session.commit()
-        return Response(status_code=status.HTTP_204_NO_CONTENT)
-    else:
+    """
+    Удаляет товар из корзины одним DELETE.
+    """
+    deleted = await session.scalar(
+        delete(CartItemModel)
+        .where(CartItemModel.user_id == current_user.id, CartItemModel.product_id == product_id)
+        .returning(CartItemModel.id)
+    )
+    if deleted is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="This item not found in your cart")
+    await session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
     
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_all_items(current_user: UserModel = Depends(get_current_buyer),
@@ -117,4 +202,4 @@ async def delete_all_items(current_user: UserModel = Depends(get_current_buyer),
 
     await session.execute(delete(CartItemModel).where(CartItemModel.user_id == current_user.id))
     await session.commit()
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,25 +1,128 @@
-from sqlalchemy import select, update
+from pydantic import TypeAdapter
+from sqlalchemy import select, update, insert, delete, true, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
 
 from app.auth import get_current_admin
 from app.db_depends import get_async_db
+from app.conditional import make_etag, is_not_modified, not_modified_response, validator_headers
+from app.cache import category_tree_cache, category_tree_counts_cache, product_cache
 from app.models.users import User as UserModel
 from app.models.categories import Category as CategoryModel
-from app.schemas import Category as CategorySchema, CategoryCreate
+from app.models.products import Product as ProductModel
+from app.models.category_closure import CategoryClosure as ClosureModel
+from app.schemas import Category as CategorySchema, CategoryCreate, CategoryTreeNode
 
 router = APIRouter(prefix="/categories", tags=["categories"])
 
+category_tree_adapter = TypeAdapter(list[CategoryTreeNode])
+
+async def _closure_attach(db: AsyncSession, category_id: int, parent_id: int | None) -> None:
+    """
+    Связывает все категории поддерева category_id со всеми предками parent_id.
+    Для новой категории поддерево состоит только из неё самой.
+    """
+    if parent_id is None:
+        return
+    ancestors = select(ClosureModel).where(ClosureModel.descendant_id == parent_id).subquery()
+    subtree = select(ClosureModel).where(ClosureModel.ancestor_id == category_id).subquery()
+    await db.execute(
+        insert(ClosureModel).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(ancestors.c.ancestor_id, subtree.c.descendant_id,
+                   ancestors.c.depth + subtree.c.depth + 1).select_from(ancestors.join(subtree, true())),
+        )
+    )
+
+async def _closure_detach(db: AsyncSession, category_id: int) -> None:
+    """
+    Удаляет связи поддерева category_id с его бывшими предками, сохраняя связи внутри поддерева.
+    """
+    subtree = select(ClosureModel.descendant_id).where(ClosureModel.ancestor_id == category_id)
+    ancestors = select(ClosureModel.ancestor_id).where(ClosureModel.descendant_id == category_id,
+                                                       ClosureModel.ancestor_id != category_id)
+    await db.execute(
+        delete(ClosureModel).where(ClosureModel.descendant_id.in_(subtree), ClosureModel.ancestor_id.in_(ancestors))
+    )
+
+
 @router.get("/", response_model=list[CategorySchema], status_code=status.HTTP_200_OK)
-async def get_all_categories(db: AsyncSession = Depends(get_async_db)):
+async def get_all_categories(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """
     Возвращает список всех активных категорий.
+    Поддерживает условные запросы по ETag, который считается по количеству и updated_at категорий.
+    Last-Modified не отдаётся: деактивация категории не увеличивает max(updated_at) активных.
     """
+    validators = (await db.execute(
+        select(func.count(), func.max(CategoryModel.updated_at)).where(CategoryModel.is_active == True)
+    )).one()
+    etag = make_etag("categories", validators[0], validators[1])
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
     result = await db.scalars(select(CategoryModel).where(CategoryModel.is_active==True))
     categories = result.all()
+    response.headers.update(validator_headers(etag))
     return categories
 
 
+async def _build_category_tree(db: AsyncSession, with_counts: bool) -> bytes:
+    """
+    Собирает вложенное дерево активных категорий и сериализует его в JSON.
+    Подкатегории удалённых категорий становятся корнями, как и в таблице замыкания.
+    """
+    categories = (await db.scalars(
+        select(CategoryModel).where(CategoryModel.is_active == True).order_by(CategoryModel.id)
+    )).all()
+    counts: dict[int, int] = {}
+    if with_counts:
+        count_rows = await db.execute(
+            select(ClosureModel.ancestor_id, func.count(ProductModel.id))
+            .join(ProductModel, ProductModel.category_id == ClosureModel.descendant_id)
+            .where(ProductModel.is_active == True)
+            .group_by(ClosureModel.ancestor_id)
+        )
+        counts = dict(count_rows.all())
+
+    nodes = {category.id: CategoryTreeNode(id=category.id, name=category.name, parent_id=category.parent_id,
+                                           product_count=counts.get(category.id, 0) if with_counts else None)
+             for category in categories}
+    roots = []
+    for node in nodes.values():
+        parent = nodes.get(node.parent_id) if node.parent_id is not None else None
+        if parent is not None:
+            parent.children.append(node)
+        else:
+            roots.append(node)
+    return category_tree_adapter.dump_json(roots)
+
+
+@router.get("/tree", response_model=list[CategoryTreeNode], status_code=status.HTTP_200_OK)
+async def get_category_tree(request: Request,
+                            with_counts: bool = Query(False, description="Добавить количество товаров в каждом узле"),
+                            db: AsyncSession = Depends(get_async_db)):
+    """
+    Возвращает дерево активных категорий.
+    Дерево строится один раз и кэшируется до изменения категорий; повторный запрос
+    с совпадающим If-None-Match получает 304 без обращения к базе.
+    """
+    cache = category_tree_counts_cache if with_counts else category_tree_cache
+    cached = await cache.get("tree")
+    if cached is None:
+        body = await _build_category_tree(db, with_counts)
+        cached = {"etag": make_etag(body), "body": body.decode()}
+        await cache.set("tree", cached)
+
+    if is_not_modified(request, cached["etag"]):
+        return not_modified_response(cached["etag"])
+    return Response(content=cached["body"], media_type="application/json", headers=validator_headers(cached["etag"]))
+
+
+async def _invalidate_category_tree() -> None:
+    await category_tree_cache.delete("tree")
+    await category_tree_counts_cache.delete("tree")
+
+
 @router.post("/", response_model=CategorySchema, status_code=status.HTTP_201_CREATED)
 async def create_category(category: CategoryCreate, db: AsyncSession = Depends(get_async_db), current_user: UserModel = Depends(get_current_admin)):
     """
@@ -37,7 +140,12 @@ async def create_category(category: CategoryCreate, db: AsyncSession = Depends(g
     # Создание новой категории
     db_category = CategoryModel(**category.model_dump())
     db.add(db_category)
+    await db.flush()
+    db.add(ClosureModel(ancestor_id=db_category.id, descendant_id=db_category.id, depth=0))
+    await db.flush()
+    await _closure_attach(db, db_category.id, category.parent_id)
     await db.commit()
+    await _invalidate_category_tree()
     await db.refresh(db_category)
     return db_category
 
@@ -66,15 +174,25 @@ async def update_category(category_id: int, category: CategoryCreate, db: AsyncS
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Parent category not found")
         if parent.id == category_id:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category cannot be its own parent")
+        in_subtree = await db.scalar(select(ClosureModel.depth).where(ClosureModel.ancestor_id == category_id,
+                                                                      ClosureModel.descendant_id == parent.id))
+        if in_subtree is not None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category cannot be moved into its own subtree")
 
     # Обновляем категорию
     update_data = category.model_dump(exclude_unset=True)
+    parent_changed = "parent_id" in update_data and db_category.parent_id != category.parent_id
     await db.execute(
         update(CategoryModel)
         .where(CategoryModel.id == category_id)
         .values(**update_data)
     )
+    # Переносим поддерево в замыкании под нового родителя
+    if parent_changed:
+        await _closure_detach(db, category_id)
+        await _closure_attach(db, category_id, category.parent_id)
     await db.commit()
+    await _invalidate_category_tree()
     return db_category
 
 @router.delete("/{category_id}", response_model=CategorySchema, status_code=status.HTTP_200_OK)
@@ -94,6 +212,14 @@ async def delete_category(category_id: int, db: AsyncSession = Depends(get_async
         .where(CategoryModel.id == category_id)
         .values(is_active=False)
     )
+    # Товары удалённой категории и её поддерева больше не видны в выдаче предков
+    await _closure_detach(db, category_id)
+    # Карточки товаров кэшируются вместе с проверкой активности категории: сбрасываем их
+    cached_product_ids = (await db.scalars(
+        select(ProductModel.id).where(ProductModel.category_id == category_id, ProductModel.is_active == True)
+    )).all()
     await db.commit()
+    await _invalidate_category_tree()
+    await product_cache.delete(*cached_product_ids)
     return db_category
 
@@ -0,0 +1,85 @@
+import re
+import mimetypes
+from pathlib import Path
+from typing import Literal
+from PIL import UnidentifiedImageError
+from fastapi import APIRouter, HTTPException, Header, Query, Response, status
+from fastapi.responses import StreamingResponse, FileResponse
+
+from app.conditional import etag_matches
+from app.media_storage import media_storage
+from app.image_resize import resize_cache, RESIZE_WIDTHS, RESIZE_FORMATS
+
+# Создаём маршрутизатор для медиафайлов
+router = APIRouter(
+    prefix="/media",
+    tags=["media"],
+)
+
+# Имя файла в хранилище по хешу: sha256 содержимого, необязательный суффикс превью и расширение
+CAS_FILE_RE = re.compile(r"^(?P<digest>[0-9a-f]{64})(?:_(?P<variant>[a-z]+))?\.(?:jpg|png|webp)$")
+# Содержимое по адресу никогда не меняется, поэтому кэшируем на год без ревалидации
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+RESIZABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+@router.get("/cas/{file_name}", status_code=status.HTTP_200_OK)
+async def get_cas_file(file_name: str, if_none_match: str | None = Header(None)):
+    """
+    Отдаёт файл из хранилища, адресуемого по хешу содержимого, с бессрочным кэшированием.
+    """
+    match = CAS_FILE_RE.match(file_name)
+    if match is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    key = f"cas/{file_name}"
+    stat = await media_storage.stat(key)
+    if stat is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    # Имя файла уже является хешем содержимого, его и используем как сильный ETag
+    etag = f'"{match["digest"]}{"-" + match["variant"] if match["variant"] else ""}"'
+    headers = {"ETag": etag, "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    headers["Content-Length"] = str(stat.size)
+    media_type = mimetypes.guess_type(file_name)[0] or "application/octet-stream"
+    return StreamingResponse(media_storage.stream(key), media_type=media_type, headers=headers)
+
+
+@router.get("/resize/{file_path:path}", status_code=status.HTTP_200_OK)
+async def get_resized_image(file_path: str,
+                            w: int = Query(..., description=f"Ширина в пикселях, одна из {', '.join(map(str, RESIZE_WIDTHS))}"),
+                            image_format: Literal["webp", "jpeg", "png"] = Query("webp", alias="format",
+                                                                                 description="Формат результата"),
+                            if_none_match: str | None = Header(None)):
+    """
+    Отдаёт изображение из /media, уменьшенное до заданной ширины.
+    Результат кэшируется на диске, одновременные запросы одного варианта обрабатываются один раз.
+    """
+    if w not in RESIZE_WIDTHS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Width must be one of {', '.join(map(str, RESIZE_WIDTHS))}")
+    if Path(file_path).suffix.lower() not in RESIZABLE_EXTENSIONS:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    try:
+        source = await media_storage.stat(file_path)
+    except ValueError:
+        source = None
+    if source is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+
+    cached_name = resize_cache.variant_name(file_path, source, w, image_format)
+    etag = f'"{Path(cached_name).stem}"'
+    # Вариант файла по хешу неизменен, остальные файлы могут быть заменены под тем же именем
+    cache_control = IMMUTABLE_CACHE_CONTROL if CAS_FILE_RE.match(Path(file_path).name) and file_path.startswith("cas/") \
+        else "public, max-age=86400"
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    try:
+        path, _ = await resize_cache.get_or_create(media_storage, file_path, source, w, image_format)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="File not found")
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="File is not a valid image")
+    return FileResponse(path, media_type=RESIZE_FORMATS[image_format][1], headers=headers)
@@ -1,18 +1,28 @@
+import asyncio
+from uuid import uuid4
 from decimal import Decimal
+from datetime import datetime, timedelta
 from sqlalchemy.orm import selectinload
-from sqlalchemy import delete, func, select
+from sqlalchemy import delete, func, select, update, insert, case, literal, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 
 from ..log import logger
 from app.auth import get_current_buyer
+from app.serialization import json_response, order_list_adapter
+from app.pagination import encode_cursor, decode_cursor
+from app.cache import product_cache
 from app.db_depends import get_async_db
 from app.models.users import User as UserModel
-from app.payments import create_yookassa_payment
+from app.config import settings
+from app.payments import PaymentGatewayUnavailable, create_order_payment
+from app.reservations import cancel_pending_order
+from app.tasks.payment_tasks import create_order_payment_task
 from app.models.products import Product as ProductModel
 from app.models.cart_items import CartItem as CartItemModel
 from app.models.orders import Order as OrderModel, OrderItem as OrderItemModel
-from app.schemas import Order as OrderSchema, OrderList, OrderCheckoutResponse
+from app.schemas import Order as OrderSchema, OrderList, OrderCheckoutResponse, OrderPayment
 
 router = APIRouter(
     prefix="/orders",
@@ -31,79 +41,164 @@ async def _load_order_with_items(session: AsyncSession, order_id: int, user_id:
     )
     return result.first()
 
-@router.post("/checkout", response_model=OrderSchema, status_code=status.HTTP_201_CREATED)
+async def _cancel_checkout(session: AsyncSession, order_id: int, user_id: int) -> None:
+    """
+    Отменяет только что оформленный заказ, по которому не удалось создать платёж:
+    остатки возвращаются на склад, а позиции — в корзину, чтобы покупатель мог повторить оформление.
+    """
+    product_ids = await cancel_pending_order(session, order_id)
+    if product_ids is None:
+        await session.rollback()
+        return
+    await session.execute(
+        pg_insert(CartItemModel)
+        .from_select(["user_id", "product_id", "quantity"],
+                     select(literal(user_id), OrderItemModel.product_id, OrderItemModel.quantity)
+                     .where(OrderItemModel.order_id == order_id))
+        .on_conflict_do_nothing(constraint="uq_cart_items_user_product")
+    )
+    await session.commit()
+    await product_cache.delete(*product_ids)
+
+@router.post("/checkout", response_model=OrderCheckoutResponse, status_code=status.HTTP_201_CREATED)
 async def checkout_order(user_current: UserModel = Depends(get_current_buyer), session:AsyncSession = Depends(get_async_db)):
     """
     Создаёт заказ на основе текущей корзины пользователя.
-    Сохраняет позиции заказа, вычитает остатки и очищает корзину.
+    Сохраняет позиции заказа, вычитает остатки и очищает корзину одной короткой транзакцией.
+    Платёж в YooKassa создаётся уже после коммита: если шлюз не ответил за
+    PAYMENT_INLINE_TIMEOUT_SECONDS, создание платежа уходит в очередь,
+    а ссылку на оплату клиент получает через GET /orders/{order_id}/payment.
+    Если ЮKassa отклонила платёж или очередь недоступна, заказ отменяется,
+    остатки и корзина восстанавливаются, а клиент получает 502/503.
     """
-    query_cart_items = await session.scalars(select(CartItemModel).options(selectinload(CartItemModel.product))
-                                             .where(CartItemModel.user_id == user_current.id).order_by(CartItemModel.id))
-    cart_user = query_cart_items.all()
+    # Блокируем товары корзины в порядке id: конкурирующие заказы с пересекающимися
+    # корзинами ждут друг друга, а не попадают во взаимную блокировку
+    cart_user = (await session.execute(
+        select(CartItemModel.product_id, CartItemModel.quantity,
+               ProductModel.name, ProductModel.stock, ProductModel.price, ProductModel.is_active)
+        .join(ProductModel, ProductModel.id == CartItemModel.product_id)
+        .where(CartItemModel.user_id == user_current.id)
+        .order_by(ProductModel.id)
+        .with_for_update(of=ProductModel)
+    )).all()
     if not cart_user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cart is empty")
 
-    total_amount = Decimal("0")
-    order = OrderModel(user_id = user_current.id)
-
     for item in cart_user:
-        product = item.product
-
-        if product is None or product.is_active == False:
+        if item.is_active == False:
+            await session.rollback()
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Product {item.product_id} is unavailable")
-        if product.stock < item.quantity:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for product {product.name}")
-        if product.price is None:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Product {product.name} has no price set")
-        
-        unit_price = product.price
-        total_unit_price = unit_price * item.quantity
-        total_amount += total_unit_price
-        order_item = OrderItemModel(product_id = item.product_id, quantity = item.quantity,
-                                    unit_price=unit_price, total_price=total_unit_price) 
-        order.items.append(order_item)
-        product.stock-=item.quantity
-        if product.stock == 0:
-            product.is_active = False
-
-    order.total_amount = total_amount
-    session.add(order)
+        if item.stock < item.quantity:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Not enough stock for product {item.name}")
+        if item.price is None:
+            await session.rollback()
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Product {item.name} has no price set")
+
+    # Одно условное списание по всем позициям; stock >= quantity страхует от ухода остатка в минус
+    new_stock = ProductModel.stock - CartItemModel.quantity
+    decremented = (await session.execute(
+        update(ProductModel)
+        .where(ProductModel.id == CartItemModel.product_id,
+               CartItemModel.user_id == user_current.id,
+               ProductModel.is_active == True,
+               ProductModel.stock >= CartItemModel.quantity)
+        .values(stock=new_stock, is_active=case((new_stock == 0, False), else_=ProductModel.is_active))
+        .returning(ProductModel.id, ProductModel.price, CartItemModel.quantity)
+    )).all()
+    if len(decremented) != len(cart_user):
+        await session.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Cart changed during checkout, please retry")
+
+    total_amount = sum((row.price * row.quantity for row in decremented), Decimal("0"))
+    order_id = await session.scalar(
+        insert(OrderModel).values(user_id=user_current.id, status="pending", total_amount=total_amount,
+                                  payment_idempotence_key=str(uuid4()),
+                                  reserved_until=func.now() + timedelta(minutes=settings.ORDER_RESERVATION_TTL_MINUTES))
+        .returning(OrderModel.id)
+    )
+    await session.execute(insert(OrderItemModel), [
+        {"order_id": order_id, "product_id": row.id, "quantity": row.quantity,
+         "unit_price": row.price, "total_price": row.price * row.quantity}
+        for row in decremented
+    ])
+    await session.execute(delete(CartItemModel).where(CartItemModel.user_id == user_current.id))
+    # Блокировки товаров снимаются здесь, до обращения к платёжному шлюзу
+    await session.commit()
+    await product_cache.delete(*(item.product_id for item in cart_user))
+
     try:
-        await session.flush()
-        payment_info = await create_yookassa_payment(order_id=order.id, amount=order.total_amount,
-                                                    user_email=user_current.email, description=f"Оплата заказа #{order.id}")
-    except RuntimeError as exc:
+        payment_info = await asyncio.wait_for(create_order_payment(session, order_id),
+                                              timeout=settings.PAYMENT_INLINE_TIMEOUT_SECONDS)
+    except (asyncio.TimeoutError, PaymentGatewayUnavailable) as exc:
+        # Заказ уже сохранён и остатки списаны: платёж создаст фоновая задача с тем же ключом идемпотентности
         await session.rollback()
-        logger.exception(f"RuntimeError during checkout: {exc}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)) from exc
-    except Exception as exc:
+        logger.warning(f"Payment for order {order_id} deferred to background task: {exc!r}")
+        try:
+            create_order_payment_task.delay(order_id)
+        except Exception:
+            logger.exception(f"Failed to enqueue payment for order {order_id}")
+            await _cancel_checkout(session, order_id, user_current.id)
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                detail="Payment service is temporarily unavailable, please retry checkout")
+        payment_info = None
+    except Exception:
+        # Настройки магазина или отказ ЮKassa в данных платежа: повтор не поможет
         await session.rollback()
-        logger.exception(f"Unexpected error during checkout: {exc}") 
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)) from exc
-    
-    order.payment_id = payment_info.get("id")
-    created_order = await _load_order_with_items(session, order.id, user_current.id)
+        logger.exception(f"Payment for order {order_id} could not be created")
+        await _cancel_checkout(session, order_id, user_current.id)
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail="Payment could not be created")
+
+    created_order = await _load_order_with_items(session, order_id, user_current.id)
     if not created_order:
         raise HTTPException(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         detail="Failed to load created order",
     )
-    await session.execute(delete(CartItemModel).where(CartItemModel.user_id == user_current.id))
-    await session.commit()
 
+    if payment_info is None:
+        return OrderCheckoutResponse(order=created_order, payment_status="processing")
     return OrderCheckoutResponse(order=created_order, confirmation_url=payment_info.get("confirmation_url"))
 
 @router.get("/", response_model=OrderList, status_code=status.HTTP_200_OK)
 async def get_all_orders(page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100),
+                          cursor: str | None = Query(None, description="Курсор из next_cursor предыдущей страницы (keyset-пагинация, page игнорируется)"),
                           current_user: UserModel = Depends(get_current_buyer), session: AsyncSession = Depends(get_async_db)):
-    
-    all_orders = await session.scalars(select(OrderModel).
-                                       options(selectinload(OrderModel.items).selectinload(OrderItemModel.product)).
-                                       where(OrderModel.user_id == current_user.id).order_by(OrderModel.created_at.desc()).
-                                       offset((page - 1)*page_size).limit(page_size))
-    orders = all_orders.all()
-    list_order = OrderList(items=orders, total=len(orders), page=page, page_size=page_size)
-    return list_order
+    """
+    Возвращает историю заказов пользователя, новые первыми, в кратком виде без позиций.
+    Страница и общее количество читаются по индексу (user_id, created_at, id).
+    """
+    filters = [OrderModel.user_id == current_user.id]
+    page_filters = list(filters)
+    if cursor is not None:
+        cursor_data = decode_cursor(cursor, mode="created")
+        try:
+            last_created_at = datetime.fromisoformat(cursor_data["c"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if last_created_at.tzinfo is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        page_filters.append(tuple_(OrderModel.created_at, OrderModel.id) < tuple_(last_created_at, cursor_data["id"]))
+    offset = 0 if cursor is not None else (page - 1) * page_size
+
+    total = await session.scalar(select(func.count()).select_from(OrderModel).where(*filters))
+    # Подзапрос считается только для строк страницы, уже после LIMIT
+    items_count = (select(func.count()).where(OrderItemModel.order_id == OrderModel.id)
+                   .scalar_subquery().label("items_count"))
+    rows = (await session.execute(
+        select(OrderModel.id, OrderModel.status, OrderModel.total_amount, items_count, OrderModel.created_at)
+        .where(*page_filters)
+        .order_by(OrderModel.created_at.desc(), OrderModel.id.desc())
+        .offset(offset).limit(page_size + 1)
+    )).all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor({"m": "created", "c": rows[-1].created_at.isoformat(), "id": rows[-1].id})
+    return json_response(order_list_adapter, {"items": rows, "total": total, "page": page,
+                                              "page_size": page_size, "next_cursor": next_cursor})
 
 @router.get("/{order_id}", response_model=OrderSchema, status_code=status.HTTP_200_OK)
 async def get_order_by_id(order_id:int, current_user: UserModel = Depends(get_current_buyer),
@@ -131,6 +226,28 @@ async def get_order_status(order_id: int, current_user: UserModel = Depends(get_
         message = f"Оплата не прошла. Попробуйте ещё раз."
     elif order.status == "pending":
         message = f"Оплата в процессе..."
+    elif order.status == "expired":
+        message = f"Время на оплату заказа #{order_id} истекло, товары вернулись в продажу."
+    elif order.status == "refund_required":
+        message = f"Оплата заказа #{order_id} поступила после отмены резерва. Деньги будут возвращены."
 
     return {"order_id": order_id, "status": order.status, 
-            "paid_at": order.paid_at, "message": message}
\ No newline at end of file
+            "paid_at": order.paid_at, "message": message}
+
+@router.get("/{order_id}/payment", response_model=OrderPayment, status_code=status.HTTP_200_OK)
+async def get_order_payment(order_id: int, current_user: UserModel = Depends(get_current_buyer),
+                            session: AsyncSession = Depends(get_async_db)):
+    """
+    Возвращает ссылку на оплату заказа, когда платёж создан.
+    Пока payment_status == "processing", клиент повторяет запрос.
+    """
+    order = (await session.execute(
+        select(OrderModel.status, OrderModel.payment_id, OrderModel.confirmation_url)
+        .where(OrderModel.id == order_id, OrderModel.user_id == current_user.id)
+    )).first()
+    if order is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Order not found")
+
+    return OrderPayment(order_id=order_id, status=order.status,
+                        payment_status="ready" if order.payment_id else "processing",
+                        confirmation_url=order.confirmation_url)
@@ -1,13 +1,16 @@
 import json
 import ipaddress
 from typing import Any
-from sqlalchemy import select
+from sqlalchemy import select, update
 from datetime import datetime, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from yookassa.domain.notification import WebhookNotification 
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 
+from app.log import logger
+from app.cache import product_cache
 from app.db_depends import get_async_db
+from app.reservations import cancel_pending_order
 from app.models.orders import Order as OrderModel
 
 router = APIRouter(
@@ -74,20 +77,44 @@ async def yookassa_webhook(
 
     if not order_id:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing order id")
+    # Значения metadata ЮKassa возвращает строками
+    try:
+        order_id = int(order_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid order id")
     
     result = await session.scalars(select(OrderModel).where(OrderModel.id == order_id))
     order = result.first()
     if order is None:
         return {"status": "ignored"}
     if payment.status == "succeeded":
-        if not order.paid_at:
-            order.status = "paid"
-            order.paid_at = datetime.now(timezone.utc)
-            order.payment_id = payment.id
+        paid_at = datetime.now(timezone.utc)
+        # Условный переход из "pending": блокирует строку заказа, поэтому задача истечения
+        # резервов (SKIP LOCKED) не вернёт его остатки на склад параллельно с оплатой
+        paid_id = await session.scalar(
+            update(OrderModel)
+            .where(OrderModel.id == order.id, OrderModel.status == "pending")
+            .values(status="paid", paid_at=paid_at, payment_id=payment.id, reserved_until=None)
+            .returning(OrderModel.id)
+        )
+        if paid_id is None:
+            # Резерв уже снят и остатки вернулись на склад: деньги нужно вернуть, заказ — проверить вручную
+            refund_id = await session.scalar(
+                update(OrderModel)
+                .where(OrderModel.id == order.id, OrderModel.status.in_(("expired", "canceled")))
+                .values(status="refund_required", paid_at=paid_at, payment_id=payment.id)
+                .returning(OrderModel.id)
+            )
+            if refund_id is not None:
+                logger.warning(f"Order {order.id} paid after its reservation was released, refund required")
         await session.commit()
         return {"status": "ok"}
     elif payment.status == "canceled":
-        order.status = "canceled"
+        product_ids = await cancel_pending_order(session, order.id)
+        if product_ids is not None:
+            await session.commit()
+            await product_cache.delete(*product_ids)
+            return {"status": "ok"}
 
     await session.commit()
     return {"status": "ok"}
\ No newline at end of file
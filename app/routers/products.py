@@ -1,16 +1,42 @@
-import uuid
+import io
+import csv
+import json
+import os
+import hashlib
+import tempfile
+import anyio
+from decimal import Decimal
+from datetime import datetime
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any, Literal
+from collections.abc import AsyncIterator
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, func, desc
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form
+from sqlalchemy import Select, select, update, exists, func, desc, or_, and_, case, cast, tuple_, bindparam, literal, Integer, Numeric
+from sqlalchemy.dialects.postgresql import ARRAY, array
+from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File, Form, Request, Response
+from fastapi.responses import StreamingResponse
 
-from app.auth import get_current_seller
+from app.auth import get_current_seller, get_current_seller_or_admin
 from app.db_depends import get_async_db
+from app.database import async_session_maker
 from app.models.users import User as UserModel
 from app.models.products import Product as ProductModel
-from app.schemas import Product, ProductCreate, ProductList
+from app.models.product_imports import ProductImportJob as ImportJobModel
+from app.media_storage import media_storage
+from app.tasks.image_tasks import generate_image_derivatives, derivative_keys
+from app.product_import import save_import_file
+from app.tasks.import_tasks import import_products_task
+from app.suggest import suggest_index
+from app.inventory import is_active_after_stock_change
+from app.schemas import Product, ProductCreate, ProductList, ProductPage, ProductSuggestion, ProductFacets, FacetCount, PriceBucket, ProductImportJob, \
+    ProductBulkUpdate, ProductBulkUpdateItem, ProductBulkUpdateResult
+from app.config import settings
+from app.cache import product_cache
+from app.conditional import make_etag, is_not_modified, not_modified_response, validator_headers
+from app.serialization import render_json, product_list_adapter, product_page_adapter
+from app.pagination import encode_cursor, decode_cursor, estimate_row_count, counts_cache
 from app.models.categories import Category as CategoryModel
+from app.models.category_closure import CategoryClosure as ClosureModel
 
 
 # Создаём маршрутизатор для товаров
@@ -20,103 +46,387 @@ router = APIRouter(
 )
 
 
-BASE_DIR = Path(__file__).resolve().parent.parent.parent
-MEDIA_ROOT = BASE_DIR / "media" / "products"
-MEDIA_ROOT.mkdir(parents=True, exist_ok=True)
-ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp"}
+# Допустимые типы изображений и расширения, под которыми они сохраняются
+IMAGE_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+# Каталог хранилища для файлов, адресуемых по хешу содержимого
+CAS_PREFIX = "cas"
 MAX_IMAGE_SIZE = 2 * 1024 * 1024  # 2 097 152 байт
+IMAGE_CHUNK_SIZE = 64 * 1024
+# Колонки выгрузки каталога в порядке следования в CSV
+EXPORT_FIELDS: tuple[str, ...] = ("id", "name", "description", "price", "stock", "category_id",
+                                  "seller_id", "rating", "image_url")
+IMPORT_FORMATS_BY_SUFFIX = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+# Границы ценовых диапазонов для фасетов, в рублях
+PRICE_FACET_BOUNDS: tuple[Decimal, ...] = tuple(Decimal(bound) for bound in
+                                              (0, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000))
 
 async def save_product_image(file: UploadFile) -> str:
     """
-    Сохраняет изображение товара и возвращает относительный URL.
+    Сохраняет изображение товара в хранилище по хешу содержимого и возвращает относительный URL.
+    Файл пишется частями без блокировки event loop, загрузка прерывается,
+    как только превышен MAX_IMAGE_SIZE. Одинаковые изображения хранятся один раз.
+    Уменьшенные копии создаёт задача Celery.
     """
-    if file.content_type not in ALLOWED_IMAGE_TYPES:
+    extension = IMAGE_EXTENSIONS.get(file.content_type)
+    if extension is None:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Only JPG, PNG or WebP images are allowed")
 
-    content = await file.read()
-    if len(content) > MAX_IMAGE_SIZE:
-        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Image is too large")
+    fd, name = tempfile.mkstemp(prefix="product-image-")
+    os.close(fd)
+    upload_path = anyio.Path(name)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with await anyio.open_file(upload_path, "wb") as target:
+            while chunk := await file.read(IMAGE_CHUNK_SIZE):
+                size += len(chunk)
+                if size > MAX_IMAGE_SIZE:
+                    raise HTTPException(status.HTTP_400_BAD_REQUEST, "Image is too large")
+                digest.update(chunk)
+                await target.write(chunk)
+        key = f"{CAS_PREFIX}/{digest.hexdigest()}{extension}"
+        if await media_storage.exists(key):
+            await upload_path.unlink()
+        else:
+            await media_storage.put_file(key, Path(name))
+    except BaseException:
+        await upload_path.unlink(missing_ok=True)
+        raise
+
+    generate_image_derivatives.delay(key)
+    return f"/media/{key}"
+
+async def remove_product_image(session: AsyncSession, url: str | None, product_id: int) -> None:
+    """
+    Удаляет файл изображения и его уменьшенные копии, если на них не ссылается другой товар.
+    """
+    if not url or not url.startswith("/media/"):
+        return
+    referenced = await session.scalar(
+        select(exists().where(ProductModel.image_url == url, ProductModel.id != product_id))
+    )
+    if referenced:
+        return
+    key = url.removeprefix("/media/")
+    for media_key in (key, *derivative_keys(key)):
+        await media_storage.delete(media_key)
 
-    extension = Path(file.filename or "").suffix.lower() or ".jpg"
-    file_name = f"{uuid.uuid4()}{extension}"
-    file_path = MEDIA_ROOT / file_name
-    file_path.write_bytes(content)
+def build_product_filters(category_id: int | None = None, min_price: float | None = None,
+                          max_price: float | None = None, in_stock: bool | None = None,
+                          seller_id: int | None = None, search: str | None = None) -> tuple[list, Any]:
+    """
+    Собирает условия выборки активных товаров и выражение ранга для полнотекстового поиска.
+    Условия согласованы с частичными индексами на products (WHERE is_active = true).
+    """
+    filters = [ProductModel.is_active == True]
 
-    return f"/media/products/{file_name}"
+    if category_id is not None:
+        filters.append(ProductModel.category_id == category_id)
+    if min_price is not None:
+        filters.append(ProductModel.price >= min_price)
+    if max_price is not None:
+        filters.append(ProductModel.price <= max_price)
+    if in_stock is not None:
+        filters.append(ProductModel.stock > 0 if in_stock else ProductModel.stock == 0)
+    if seller_id is not None:
+        filters.append(ProductModel.seller_id == seller_id)
+
+    rank_expr = None
+    if search:
+        ts_query = func.websearch_to_tsquery('english', search)
+        filters.append(ProductModel.tsv.op('@@')(ts_query))
+        rank_expr = func.ts_rank_cd(ProductModel.tsv, ts_query)
+    return filters, rank_expr
 
-def remove_product_image(url: str | None) -> None:
+def build_product_page_query(filters: list, rank_expr: Any, offset: int, page_size: int,
+                             with_total: bool = False) -> Select:
     """
-    Удаляет файл изображения, если он существует.
+    Запрос страницы каталога GET /products/: полные строки товаров (и ранг при поиске) в порядке выдачи.
+    Берёт на одну строку больше page_size, чтобы понять, есть ли следующая страница.
+    with_total добавляет COUNT(*) OVER(): он считается до LIMIT, поэтому total приходит вместе со страницей.
     """
-    if not url:
-        return
-    relative_path = url.lstrip("/")
-    file_path = BASE_DIR / relative_path
-    if file_path.exists():
-        file_path.unlink()
+    columns = [ProductModel]
+    order_by = [ProductModel.id]
+    if rank_expr is not None:
+        rank_col = rank_expr.label('rank')
+        columns.append(rank_col)
+        order_by = [desc(rank_col), ProductModel.id]
+    if with_total:
+        columns.append(func.count().over().label('total'))
+    return select(*columns).where(*filters).order_by(*order_by).offset(offset).limit(page_size + 1)
+
+def build_product_validators_query(filters: list) -> Select:
+    """
+    Запрос валидаторов выборки для точного подсчёта: количество товаров и время последнего изменения.
+    """
+    return select(func.count(), func.max(ProductModel.updated_at)).select_from(ProductModel).where(*filters)
+
+async def _count_products(session: AsyncSession, filters: list) -> int:
+    """
+    Точно считает количество товаров, подходящих под фильтры.
+    """
+    total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
+    return await session.scalar(total_stmt) or 0
+
+async def _product_validators(session: AsyncSession, filters: list) -> tuple[int, datetime | None]:
+    """
+    Одним запросом считает количество товаров и время последнего изменения выборки.
+    Изменение, добавление или деактивация любого товара меняет хотя бы одно из значений,
+    поэтому пара годится для ETag. Last-Modified из неё не строится: после деактивации товара
+    max(updated_at) по активным строкам не растёт, и If-Modified-Since ответил бы 304.
+    """
+    row = (await session.execute(build_product_validators_query(filters))).one()
+    return row[0], row[1]
+
+async def _load_facets(session: AsyncSession, filters: list) -> tuple[ProductFacets, int]:
+    """
+    Считает фасеты выборки одним проходом через GROUPING SETS:
+    количество по категориям, продавцам, ценовым диапазонам и наличию.
+    """
+    bounds = cast(array(PRICE_FACET_BOUNDS), ARRAY(Numeric(10, 2)))
+    matched = (select(ProductModel.category_id,
+                      ProductModel.seller_id,
+                      func.width_bucket(ProductModel.price, bounds).label("price_bucket"),
+                      (ProductModel.stock > 0).label("in_stock"))
+               .where(*filters)
+               .cte("matched"))
+    facet_stmt = (select(matched.c.category_id, matched.c.seller_id, matched.c.price_bucket,
+                         matched.c.in_stock, func.count().label("count"))
+                  .group_by(func.grouping_sets(tuple_(matched.c.category_id), tuple_(matched.c.seller_id),
+                                               tuple_(matched.c.price_bucket), tuple_(matched.c.in_stock))))
+    rows = (await session.execute(facet_stmt)).all()
+
+    # Все колонки NOT NULL, поэтому в каждой строке заполнена ровно колонка её набора группировки
+    categories, sellers, price_buckets = [], [], []
+    in_stock_count = out_of_stock_count = 0
+    for row in rows:
+        if row.category_id is not None:
+            categories.append(FacetCount(value=row.category_id, count=row.count))
+        elif row.seller_id is not None:
+            sellers.append(FacetCount(value=row.seller_id, count=row.count))
+        elif row.price_bucket is not None:
+            upper = PRICE_FACET_BOUNDS[row.price_bucket] if row.price_bucket < len(PRICE_FACET_BOUNDS) else None
+            price_buckets.append(PriceBucket(min_price=PRICE_FACET_BOUNDS[row.price_bucket - 1],
+                                             max_price=upper, count=row.count))
+        elif row.in_stock:
+            in_stock_count = row.count
+        else:
+            out_of_stock_count = row.count
+
+    categories.sort(key=lambda facet: facet.count, reverse=True)
+    sellers.sort(key=lambda facet: facet.count, reverse=True)
+    price_buckets.sort(key=lambda bucket: bucket.min_price)
+    product_facets = ProductFacets(categories=categories, sellers=sellers, price_buckets=price_buckets,
+                                   in_stock=in_stock_count, out_of_stock=out_of_stock_count)
+    return product_facets, in_stock_count + out_of_stock_count
 
 @router.get("/", response_model=ProductList, status_code=status.HTTP_200_OK)
-async def get_all_products(page: int = Query(1, ge=1, le=30),
+async def get_all_products(request: Request,
+                            page: int = Query(1, ge=1, le=30),
                             page_size: int = Query(20, ge=1, le=100),
+                            cursor: str | None = Query(None, description="Курсор из next_cursor предыдущей страницы (keyset-пагинация, page игнорируется)"),
                             category_id: int | None = Query(None, description="ID категории для фильтрации"),
                             search: str | None = Query(None, min_length=1, description="Поиск по названию товара"),
                             min_price: float | None = Query(None, ge=0, description="Минимальная цена товара"),
                             max_price: float | None = Query(None, ge=0, description="Максимальная цена товара"),
                             in_stock: bool | None = Query(None, description="true — только товары в наличии, false — только без остатка"),
                             seller_id: int | None = Query(None, description="ID продавца для фильтрации"),
+                            count: Literal["exact", "windowed", "estimated", "cached"] = Query(
+                                "exact", description="Способ подсчёта total_items: exact — отдельный COUNT, "
+                                                     "windowed — COUNT(*) OVER() в запросе страницы, "
+                                                     "estimated — оценка планировщика для больших выборок, "
+                                                     "cached — кэш с коротким TTL по набору фильтров"),
+                            facets: bool = Query(False, description="Вернуть фасеты (категории, продавцы, цены, наличие) по текущим фильтрам"),
                            session: AsyncSession = Depends(get_async_db)):
     """
     Возвращает список всех активных товаров с поддержкой фильтров.
+    Поддерживает два режима пагинации: по номеру страницы (OFFSET) и по курсору (keyset),
+    стоимость которого не зависит от глубины листания.
     """
     if min_price is not None and max_price is not None and min_price > max_price:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_price не может быть больше max_price")
     
-    filters = [ProductModel.is_active == True]
-
-    if category_id is not None:
-        filters.append(ProductModel.category_id == category_id)
-    if min_price is not None:
-        filters.append(ProductModel.price >= min_price)
-    if max_price is not None:
-        filters.append(ProductModel.price <= max_price)
-    if in_stock is not None:
-        filters.append(ProductModel.stock >= 0 if in_stock else ProductModel.stock == 0)
-    if seller_id is not None:
-        filters.append(ProductModel.seller_id == seller_id)
+    search_value = search.strip().lower() if search else ""
+    filters, rank_expr = build_product_filters(category_id=category_id, min_price=min_price, max_price=max_price,
+                                               in_stock=in_stock, seller_id=seller_id, search=search_value)
+
+    total: int | None = None
+    count_strategy = count
+    product_facets = None
+    etag: str | None = None
+    if facets:
+        # Фасеты считаются по всей выборке, поэтому точный total получается из них бесплатно
+        product_facets, total = await _load_facets(session, filters)
+        count_strategy = "exact"
+    elif count == "cached":
+        cache_key = (category_id, seller_id, min_price, max_price, in_stock, " ".join(search_value.split()))
+        total = counts_cache.get(cache_key)
+        if total is None:
+            total = await _count_products(session, filters)
+            counts_cache.set(cache_key, total)
+            count_strategy = "exact"
+    elif count == "estimated":
+        total = await estimate_row_count(session, select(ProductModel.id).where(*filters))
+        if total < settings.COUNT_ESTIMATE_MIN_ROWS:
+            # Для небольших выборок точный подсчёт дешёвый, а оценка может сильно ошибаться
+            total = await _count_products(session, filters)
+            count_strategy = "exact"
+    elif count == "exact" or cursor is not None:
+        # В режиме курсора оконный COUNT увидел бы только оставшиеся строки
+        total, changed_at = await _product_validators(session, filters)
+        count_strategy = "exact"
+        # Валидаторы известны до выборки страницы: 304 отдаём, не загружая товары.
+        # Списки ревалидируются только по ETag (см. _product_validators)
+        etag = make_etag(request.url.query, total, changed_at)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+
+    # Позиция курсора добавляется только к выборке страницы, но не к подсчёту total
+    page_filters = list(filters)
+    if cursor is not None:
+        cursor_data = decode_cursor(cursor, mode="rank" if rank_expr is not None else "id")
+        if rank_expr is not None:
+            last_rank = cursor_data.get("r")
+            if not isinstance(last_rank, (int, float)):
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+            page_filters.append(or_(rank_expr < last_rank,
+                                    and_(rank_expr == last_rank, ProductModel.id > cursor_data["id"])))
+        else:
+            page_filters.append(ProductModel.id > cursor_data["id"])
+    offset = 0 if cursor is not None else (page - 1) * page_size
+
+    product_stmt = build_product_page_query(page_filters, rank_expr, offset, page_size, with_total=total is None)
+    result = await session.execute(product_stmt)
+    rows = result.all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    items = [row[0] for row in rows]
+
+    if total is None:
+        if rows:
+            total = rows[0].total
+        elif offset == 0:
+            total = 0
+        else:
+            # Страница за пределами выборки: окну не из чего посчитать total
+            total = await _count_products(session, filters)
+            count_strategy = "exact"
+
+    next_cursor = None
+    if has_next and rank_expr is not None:
+        next_cursor = encode_cursor({"m": "rank", "r": rows[-1].rank, "id": items[-1].id})
+    elif has_next:
+        next_cursor = encode_cursor({"m": "id", "id": items[-1].id})
+
+    body = render_json(product_list_adapter, {"page": page, "page_items": items, "total_items": total,
+                                              "page_size": page_size, "next_cursor": next_cursor,
+                                              "count_strategy": count_strategy, "facets": product_facets})
+    if etag is None:
+        # Для неточных стратегий подсчёта валидатор — хеш самого ответа
+        etag = make_etag(body)
+        if is_not_modified(request, etag):
+            return not_modified_response(etag)
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag))
+
+@router.get("/suggest", response_model=list[ProductSuggestion], status_code=status.HTTP_200_OK)
+async def suggest_products(q: str = Query(..., min_length=1, max_length=100, description="Начало названия товара"),
+                           limit: int = Query(10, ge=1, le=20, description="Максимальное количество подсказок")):
+    """
+    Возвращает подсказки названий товаров по префиксу для поиска по мере ввода.
+    Обслуживается из in-memory префиксного индекса, без запроса к базе.
+    """
+    await suggest_index.ensure_loaded()
+    return suggest_index.suggest(q, limit)
 
+async def _stream_export(filters: list, export_format: str) -> AsyncIterator[bytes]:
+    """
+    Построчно выгружает товары через серверный курсор: в памяти держится
+    не больше одной пачки из EXPORT_BATCH_SIZE строк, сколько бы товаров ни было.
+    Сессия открывается внутри генератора, так как ответ стримится после выхода из обработчика.
+    """
+    columns = [getattr(ProductModel, name) for name in EXPORT_FIELDS]
+    stmt = (select(*columns).where(*filters).order_by(ProductModel.id)
+            .execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+    if export_format == "csv":
+        yield (",".join(EXPORT_FIELDS) + "\r\n").encode()
+    async with async_session_maker() as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions():
+            if export_format == "csv":
+                buffer = io.StringIO()
+                csv.writer(buffer).writerows(rows)
+                yield buffer.getvalue().encode()
+            else:
+                yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False, default=str) + "\n"
+                              for row in rows).encode()
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_products(export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format",
+                                                                            description="Формат выгрузки"),
+                          category_id: int | None = Query(None, description="ID категории для фильтрации"),
+                          search: str | None = Query(None, min_length=1, description="Поиск по названию товара"),
+                          min_price: float | None = Query(None, ge=0, description="Минимальная цена товара"),
+                          max_price: float | None = Query(None, ge=0, description="Максимальная цена товара"),
+                          in_stock: bool | None = Query(None, description="true — только товары в наличии, false — только без остатка"),
+                          seller_id: int | None = Query(None, description="ID продавца для фильтрации (только для 'admin')"),
+                          current_user: UserModel = Depends(get_current_seller_or_admin)):
+    """
+    Потоково выгружает активный каталог в NDJSON или CSV с теми же фильтрами, что и GET /products/.
+    Продавец выгружает только свои товары, администратор — любые.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="min_price не может быть больше max_price")
+    if current_user.role == "seller":
+        seller_id = current_user.id
+
+    filters, _ = build_product_filters(category_id=category_id, min_price=min_price, max_price=max_price,
+                                       in_stock=in_stock, seller_id=seller_id,
+                                       search=search.strip().lower() if search else None)
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    return StreamingResponse(_stream_export(filters, export_format), media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="products.{export_format}"'})
+
+@router.post("/import", response_model=ProductImportJob, status_code=status.HTTP_202_ACCEPTED)
+async def import_products(file: UploadFile = File(..., description="CSV с заголовком или NDJSON с полями ProductCreate"),
+                          import_format: Literal["csv", "ndjson"] | None = Query(None, alias="format",
+                                                                                 description="Формат файла, по умолчанию — по расширению"),
+                          session: AsyncSession = Depends(get_async_db),
+                          current_user: UserModel = Depends(get_current_seller)):
+    """
+    Принимает файл для массового импорта товаров текущего продавца (только для 'seller').
+    Файл обрабатывает воркер Celery, прогресс и ошибки по строкам доступны через GET /products/import/{job_id}.
+    """
+    if import_format is None:
+        suffix = Path(file.filename or "").suffix.lower()
+        import_format = IMPORT_FORMATS_BY_SUFFIX.get(suffix)
+        if import_format is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="Cannot detect file format, pass format=csv or format=ndjson")
+
+    path = await save_import_file(file)
+    job = ImportJobModel(seller_id=current_user.id, format=import_format)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)  # Для получения created_at из базы
+    import_products_task.delay(job.id, str(path), import_format, current_user.id)
+    return job
 
-    total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
 
-    rank_col = None
-    if search:
-        search_value = search.strip().lower()
-        if search_value:
-            ts_query = func.websearch_to_tsquery('english', search_value)
-            filters.append(ProductModel.tsv.op('@@')(ts_query))
-            rank_col = func.ts_rank_cd(ProductModel.tsv, ts_query).label('rank')
-            total_stmt = select(func.count()).select_from(ProductModel).where(*filters)
-
-    total = await session.scalar(total_stmt) or 0
-
-    if rank_col is not None:
-        product_stmt = (select(ProductModel, rank_col).
-                        where(*filters).
-                        order_by(desc(rank_col), ProductModel.id)).offset((page - 1)*page_size).limit(page_size)
-        result = await session.execute(product_stmt)
-        rows = result.all()
-        items = [row[0] for row in rows]
-    else:
-        products_stmt = (
-            select(ProductModel)
-            .where(*filters)
-            .order_by(ProductModel.id)
-            .offset((page - 1) * page_size)
-            .limit(page_size)
-        )
-        items = (await session.scalars(products_stmt)).all()
+@router.get("/import/{job_id}", response_model=ProductImportJob, status_code=status.HTTP_200_OK)
+async def get_import_job(job_id: int,
+                         session: AsyncSession = Depends(get_async_db),
+                         current_user: UserModel = Depends(get_current_seller)):
+    """
+    Возвращает состояние задачи импорта текущего продавца.
+    """
+    job = await session.scalar(
+        select(ImportJobModel).where(ImportJobModel.id == job_id, ImportJobModel.seller_id == current_user.id)
+    )
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Import job not found")
+    return job
 
-    response = ProductList(page=page, page_items=items, total_items=total, page_size=page_size)
-    return response
 
 @router.post("/", response_model=Product, status_code=status.HTTP_201_CREATED)
 async def create_product(
@@ -140,42 +450,141 @@ async def create_product(
     session.add(session_product)
     await session.commit()
     await session.refresh(session_product)  # Для получения id и is_active из базы
+    suggest_index.upsert(session_product.id, session_product.name, session_product.rating)
     return session_product
 
 
-@router.get("/category/{category_id}", response_model=list[Product], status_code=status.HTTP_200_OK)
-async def get_products_by_category(category_id: int, session: AsyncSession = Depends(get_async_db)):
+@router.get("/category/{category_id}", response_model=ProductPage, status_code=status.HTTP_200_OK)
+async def get_products_by_category(category_id: int, request: Request,
+                                   include_subcategories: bool = Query(True, description="Включать товары всех подкатегорий"),
+                                   page_size: int = Query(20, ge=1, le=100),
+                                   cursor: str | None = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+                                   session: AsyncSession = Depends(get_async_db)):
     """
-    Возвращает список товаров в указанной категории по её ID.
+    Возвращает страницу товаров указанной категории и (по умолчанию) всего её поддерева.
+    Поддерево берётся из таблицы замыкания категорий, страницы листаются по курсору.
     """
-    query_category = await session.scalars(select(CategoryModel).where(CategoryModel.id == category_id,
-                                                                        CategoryModel.is_active == True))
-    result_query = query_category.first()
-    if result_query is None:
+    # Удалённая категория сохраняет связи со своим поддеревом, поэтому проверяем её до выборки
+    category_id_active = await session.scalar(select(CategoryModel.id).where(CategoryModel.id == category_id,
+                                                                             CategoryModel.is_active == True))
+    if category_id_active is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category not found")
-    query_products = await session.scalars(select(ProductModel).where(ProductModel.category_id == category_id, ProductModel.is_active == True))
 
-    return query_products.all()
+    if include_subcategories:
+        subtree = (select(ClosureModel.descendant_id)
+                   .join(CategoryModel, CategoryModel.id == ClosureModel.descendant_id)
+                   .where(ClosureModel.ancestor_id == category_id, CategoryModel.is_active == True))
+        filters = [ProductModel.category_id.in_(subtree)]
+    else:
+        filters = [ProductModel.category_id == category_id]
+    filters.append(ProductModel.is_active == True)
+    if cursor is not None:
+        filters.append(ProductModel.id > decode_cursor(cursor, mode="id")["id"])
+
+    query_products = await session.scalars(
+        select(ProductModel).where(*filters).order_by(ProductModel.id).limit(page_size + 1)
+    )
+    items = query_products.all()
+    has_next = len(items) > page_size
+    items = items[:page_size]
+
+    next_cursor = encode_cursor({"m": "id", "id": items[-1].id}) if has_next else None
+    body = render_json(product_page_adapter, {"items": items, "page_size": page_size, "next_cursor": next_cursor})
+    etag = make_etag(body)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+    return Response(content=body, media_type="application/json", headers=validator_headers(etag))
 
 
 
 @router.get("/{product_id}", response_model=Product, status_code=status.HTTP_200_OK)
-async def get_product(product_id: int, session: AsyncSession = Depends(get_async_db)):
+async def get_product(product_id: int, request: Request, response: Response,
+                      session: AsyncSession = Depends(get_async_db)):
     """
     Возвращает детальную информацию о товаре по его ID.
+    Карточка читается через кэш: товар и активность категории загружаются одним запросом.
+    ETag строится по updated_at товара, поэтому 304 на попадании в кэш не требует обращения к базе.
     """
-    query = await session.scalars(select(ProductModel).where(ProductModel.id == product_id, ProductModel.is_active == True))
-    result_query = query.first()
-    if result_query is None:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product not found")
-    
-    query_check_categories = await session.scalars(select(CategoryModel).where(result_query.category_id == CategoryModel.id,
-                                                                                CategoryModel.is_active == True))
-    result_query_categories = query_check_categories.first()
-    if result_query_categories is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
-    
-    return result_query
+    cached = await product_cache.get(product_id)
+    if cached is None:
+        query = await session.execute(
+            select(ProductModel, CategoryModel.is_active.label("category_is_active"))
+            .outerjoin(CategoryModel, CategoryModel.id == ProductModel.category_id)
+            .where(ProductModel.id == product_id, ProductModel.is_active == True)
+        )
+        result_query = query.first()
+        if result_query is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Product not found")
+        if not result_query.category_is_active:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Category not found")
+
+        cached = {"product": Product.model_validate(result_query[0]).model_dump(mode="json"),
+                  "updated_at": result_query[0].updated_at.isoformat()}
+        await product_cache.set(product_id, cached)
+
+    last_modified = datetime.fromisoformat(cached["updated_at"])
+    etag = make_etag("product", product_id, cached["updated_at"])
+    if is_not_modified(request, etag, last_modified):
+        return not_modified_response(etag, last_modified)
+    response.headers.update(validator_headers(etag, last_modified))
+    return cached["product"]
+
+
+@router.patch("/bulk", response_model=ProductBulkUpdateResult, status_code=status.HTTP_200_OK)
+async def bulk_update_products(payload: ProductBulkUpdate,
+                               session: AsyncSession = Depends(get_async_db),
+                               current_user: UserModel = Depends(get_current_seller)):
+    """
+    Пакетно обновляет остатки и цены товаров текущего продавца (только для 'seller').
+    Все изменения применяются одним UPDATE по unnest-массивам; принадлежность товаров
+    продавцу проверяется в том же запросе, чужие и несуществующие товары не меняются.
+    Товар с нулевым остатком деактивируется, как при оформлении заказа, а пополненный
+    с нуля — снова включается, если продавец его не удалял (общее правило is_active_after_stock_change).
+    Изменение одной цены активность не трогает; удалённые товары не меняются и считаются ненайденными.
+    """
+    changes = func.unnest(
+        bindparam("ids", [item.id for item in payload.items], type_=ARRAY(Integer)),
+        bindparam("stocks", [item.stock for item in payload.items], type_=ARRAY(Integer)),
+        bindparam("prices", [item.price for item in payload.items], type_=ARRAY(Numeric(10, 2))),
+    ).table_valued("id", "stock", "price").render_derived(name="changes")
+    new_stock = func.coalesce(changes.c.stock, ProductModel.stock)
+    updated = (
+        update(ProductModel)
+        .where(ProductModel.id == changes.c.id, ProductModel.seller_id == current_user.id,
+               ProductModel.deleted_at.is_(None))
+        .values(stock=new_stock,
+                price=func.coalesce(changes.c.price, ProductModel.price),
+                is_active=case((changes.c.stock.is_(None), ProductModel.is_active),
+                               else_=is_active_after_stock_change(new_stock)))
+        .returning(ProductModel.id, ProductModel.stock, ProductModel.price, ProductModel.is_active,
+                   ProductModel.name, ProductModel.rating)
+        .cte("updated")
+    )
+    rows = (await session.execute(
+        select(changes.c.id, ProductModel.id.label("existing_id"),
+               updated.c.stock, updated.c.price, updated.c.is_active, updated.c.id.label("updated_id"),
+               updated.c.name, updated.c.rating)
+        .select_from(changes)
+        .outerjoin(updated, updated.c.id == changes.c.id)
+        .outerjoin(ProductModel, and_(ProductModel.id == changes.c.id, ProductModel.deleted_at.is_(None)))
+    )).all()
+    await session.commit()
+
+    results = {}
+    for row in rows:
+        if row.updated_id is not None:
+            results[row.id] = ProductBulkUpdateItem(id=row.id, status="updated", stock=row.stock,
+                                                    price=row.price, is_active=row.is_active)
+            if row.is_active:
+                suggest_index.upsert(row.id, row.name, row.rating)
+            else:
+                suggest_index.remove(row.id)
+        else:
+            results[row.id] = ProductBulkUpdateItem(id=row.id,
+                                                    status="forbidden" if row.existing_id is not None else "not_found")
+    updated_ids = [product_id for product_id, item in results.items() if item.status == "updated"]
+    await product_cache.delete(*updated_ids)
+    return ProductBulkUpdateResult(items=[results[item.id] for item in payload.items], updated=len(updated_ids))
 
 
 @router.put("/{product_id}", response_model=Product)
@@ -202,16 +611,24 @@ async def update_product(
     if not category_result.first():
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Category not found or inactive")
     
-    if image:
-        remove_product_image(session_product.image_url)
-        image_url = await save_product_image(image)
+    previous_image_url = session_product.image_url
+    image_url = await save_product_image(image) if image else previous_image_url
 
     await session.execute(
-        update(ProductModel).where(ProductModel.id == product_id).values(**product.model_dump(), image_url=image_url)
+        update(ProductModel).where(ProductModel.id == product_id)
+        .values(**product.model_dump(), image_url=image_url,
+                is_active=is_active_after_stock_change(literal(product.stock, Integer)))
     )
 
     await session.commit()
+    if image_url != previous_image_url:
+        await remove_product_image(session, previous_image_url, product_id)
+    await product_cache.delete(product_id)
     await session.refresh(session_product)  # Для консистентности данных
+    if session_product.is_active:
+        suggest_index.upsert(session_product.id, session_product.name, session_product.rating)
+    else:
+        suggest_index.remove(session_product.id)
     return session_product
 
 
@@ -224,21 +641,24 @@ async def delete_product(
     """
     Выполняет мягкое удаление товара, если он принадлежит текущему продавцу (только для 'seller').
     """
+    # Распроданный товар тоже неактивен, но его можно удалить
     result = await session.scalars(
-        select(ProductModel).where(ProductModel.id == product_id, ProductModel.is_active == True)
+        select(ProductModel).where(ProductModel.id == product_id, ProductModel.deleted_at.is_(None))
     )
     product = result.first()
 
     if not product:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or inactive")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Product not found or already deleted")
     if product.seller_id != current_user.id:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You can only delete your own products")
     
-    remove_product_image(product.image_url)
     await session.execute(
-        update(ProductModel).where(ProductModel.id == product_id).values(is_active=False)
+        update(ProductModel).where(ProductModel.id == product_id).values(is_active=False, deleted_at=func.now())
     )
     await session.commit()
+    await remove_product_image(session, product.image_url, product_id)
+    await product_cache.delete(product_id)
+    suggest_index.remove(product_id)
     await session.refresh(product)  # Для возврата is_active = False
     return product
 
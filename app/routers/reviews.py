@@ -2,8 +2,12 @@ import jwt
 
 from sqlalchemy import select, func, update
 from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 
+from app.cache import product_cache
+from app.conditional import make_etag, is_not_modified, not_modified_response, validator_headers
+from app.serialization import json_response, review_list_adapter
 from app.db_depends import get_async_db
 from app.models.users import User as UserModel
 from app.models import Product as ProductModel
@@ -14,27 +18,49 @@ from app.schemas import Review as ReviewResponse, ReviewCreate as ReviewRequest
 router = APIRouter(tags=["reviews"])
 
 
+async def _review_validators(session: AsyncSession, filters: list) -> tuple[int, datetime | None]:
+    """
+    Считает количество отзывов и время последнего изменения для ETag списков.
+    Last-Modified из них не строится: удалённый отзыв выпадает из выборки, и max(updated_at) не растёт.
+    """
+    row = (await session.execute(
+        select(func.count(), func.max(ReviewModel.updated_at)).select_from(ReviewModel).where(*filters)
+    )).one()
+    return row[0], row[1]
+
+
 @router.get("/reviews/", response_model=list[ReviewResponse], status_code=status.HTTP_200_OK)
-async def get_all_reviews(session: AsyncSession = Depends(get_async_db)):
+async def get_all_reviews(request: Request, session: AsyncSession = Depends(get_async_db)):
     """
     Возвращает список всех отзывов.
     """
-    stmt = await session.scalars(select(ReviewModel).where(ReviewModel.is_active == True))
+    filters = [ReviewModel.is_active == True]
+    total, changed_at = await _review_validators(session, filters)
+    etag = make_etag("reviews", total, changed_at)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    stmt = await session.scalars(select(ReviewModel).where(*filters))
     all_reviews = stmt.all()
-    return all_reviews
+    return json_response(review_list_adapter, all_reviews, headers=validator_headers(etag))
 
 @router.get("/products/{product_id}/reviews/", response_model=list[ReviewResponse], status_code=status.HTTP_200_OK)
-async def get_reviews_by_id_product(product_id: int, session: AsyncSession = Depends(get_async_db)):
+async def get_reviews_by_id_product(product_id: int, request: Request,
+                                    session: AsyncSession = Depends(get_async_db)):
     """
     Возвращает список отзывов по продукт ID.
     """
-    stmt = await session.scalars(select(ReviewModel).where(ReviewModel.is_active == True, 
-                                                           ReviewModel.product_id == product_id))
-    all_reviews_product_id = stmt.all()
-    
-    if not all_reviews_product_id:
+    filters = [ReviewModel.is_active == True, ReviewModel.product_id == product_id]
+    total, changed_at = await _review_validators(session, filters)
+    if not total:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Reviews not found")
-    return all_reviews_product_id
+    etag = make_etag("product_reviews", product_id, total, changed_at)
+    if is_not_modified(request, etag):
+        return not_modified_response(etag)
+
+    stmt = await session.scalars(select(ReviewModel).where(*filters))
+    all_reviews_product_id = stmt.all()
+    return json_response(review_list_adapter, all_reviews_product_id, headers=validator_headers(etag))
 
 
 async def update_rating_product(id_product: int, session: AsyncSession):
@@ -47,6 +73,8 @@ async def update_rating_product(id_product: int, session: AsyncSession):
     avg_rating_product = stmt_avg_rating_product.scalar() or 0.0
     product = await session.get(ProductModel, id_product)
     await session.execute(update(ProductModel).where(ProductModel.id == product.id).values(rating = avg_rating_product))
+    # Устаревший рейтинг, закэшированный до коммита, проживёт не дольше TTL кэша
+    await product_cache.delete(product.id)
 
 
 @router.post("/reviews/", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
@@ -1,17 +1,18 @@
 import jwt
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import APIRouter, Depends, HTTPException, status
 
 from app.config import settings
-from app.auth import oauth2_scheme
+from app.auth import oauth2_scheme, get_current_admin
+from app.cache import user_cache
 from app.db_depends import get_async_db
 from app.models.users import User as UserModel
 from app.tasks.email_tasks import send_email_task
-from app.schemas import UserCreate, User as UserSchema
-from app.auth import hash_password, verify_password, create_access_token, create_refresh_token
+from app.schemas import UserCreate, UserAdminUpdate, User as UserSchema
+from app.auth import hash_password_async, verify_password_async, create_access_token, create_refresh_token, token_claims, user_state
 
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -31,7 +32,7 @@ async def create_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)
     # Создание объекта пользователя с хешированным паролем
     db_user = UserModel(
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=await hash_password_async(user.password),
         role=user.role
     )
 
@@ -70,9 +71,9 @@ async def refresh_token(refresh_token: str = Depends(oauth2_scheme), db: AsyncSe
     result = await db.scalars(select(UserModel).where(UserModel.email == email, UserModel.is_active == True))
     user = result.first()
     
-    if user is None:
+    if user is None or user.token_version != payload.get("ver", 0):
         raise credentials_exception
-    access_token = create_access_token(data={"sub": user.email, "role": user.role, "id": user.id})
+    access_token = create_access_token(data=token_claims(user))
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/token")
@@ -83,13 +84,44 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSessi
     result = await db.scalars(select(UserModel).where(UserModel.email == form_data.username))
     user = result.first()
 
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    if not user or not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    access_token = create_access_token(data={"sub": user.email, "role": user.role, "id": user.id})
-    refresh_token = create_refresh_token(data={"sub": user.email, "role": user.role, "id": user.id})
+    access_token = create_access_token(data=token_claims(user))
+    refresh_token = create_refresh_token(data=token_claims(user))
     return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+
+@router.patch("/{user_id}", response_model=UserSchema)
+async def update_user(user_id: int,
+                      user_update: UserAdminUpdate,
+                      db: AsyncSession = Depends(get_async_db),
+                      current_user: UserModel = Depends(get_current_admin)):
+    """
+    Меняет роль и/или активность пользователя (только для 'admin').
+    Версия токенов пользователя увеличивается, поэтому все выданные ему токены сразу перестают действовать.
+    """
+    update_data = user_update.model_dump(exclude_unset=True, exclude_none=True)
+    if not update_data:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    if user_id == current_user.id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Admins cannot change their own role or status")
+
+    user = await db.scalar(
+        update(UserModel)
+        .where(UserModel.id == user_id)
+        .values(**update_data, token_version=UserModel.token_version + 1)
+        .returning(UserModel)
+    )
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    await db.commit()
+    # Новое состояние записывается, а не удаляется: иначе запрос, прочитавший базу до коммита,
+    # мог бы вернуть в кэш старую версию токена
+    await user_cache.set(user_id, user_state(user))
+    return user
@@ -1,7 +1,7 @@
 from decimal import Decimal
-from typing import Annotated
+from typing import Annotated, Literal
 from datetime import datetime
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, field_validator, model_validator
 from fastapi import Form
 
 class CategoryCreate(BaseModel):
@@ -27,6 +27,18 @@ class Category(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CategoryTreeNode(BaseModel):
+    """
+    Узел дерева категорий с вложенными подкатегориями.
+    Используется в GET /categories/tree.
+    """
+    id: Annotated[int, Field(description="Уникальный идентификатор категории")]
+    name: Annotated[str, Field(description="Название категории")]
+    parent_id: Annotated[int | None, Field(None, description="ID родительской категории, если есть")]
+    product_count: Annotated[int | None, Field(None, description="Количество активных товаров в категории и её поддереве")]
+    children: Annotated[list["CategoryTreeNode"], Field(default_factory=list, description="Подкатегории")]
+
+
 class ProductCreate(BaseModel):
     """
     Модель для создания и обновления товара.
@@ -74,6 +86,13 @@ class Product(BaseModel):
     
     model_config = ConfigDict(from_attributes=True)
 
+class ProductSuggestion(BaseModel):
+    """
+    Модель подсказки для автодополнения поиска товаров.
+    """
+    id: Annotated[int, Field(description="Уникальный идентификатор товара")]
+    name: Annotated[str, Field(description="Название товара")]
+
 class UserCreate(BaseModel):
     """
     Модель для создания и обновления пользователя.
@@ -94,6 +113,13 @@ class User(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class UserAdminUpdate(BaseModel):
+    """
+    Модель для изменения роли и активности пользователя администратором.
+    """
+    role: Annotated[Literal["buyer", "seller", "admin"] | None, Field(None, description="Новая роль пользователя")]
+    is_active: Annotated[bool | None, Field(None, description="Активность пользователя")]
+
 class ReviewCreate(BaseModel):
     """
     Модель для создания и обновления отзыва.
@@ -118,6 +144,34 @@ class Review(BaseModel):
     is_active: Annotated[bool, Field(description="Активность отзыва")]
 
 
+class FacetCount(BaseModel):
+    """
+    Количество товаров с одним значением фасета (категория или продавец).
+    """
+    value: Annotated[int, Field(description="ID категории или продавца")]
+    count: Annotated[int, Field(ge=0, description="Количество товаров")]
+
+
+class PriceBucket(BaseModel):
+    """
+    Количество товаров в ценовом диапазоне [min_price, max_price).
+    """
+    min_price: Annotated[Decimal, Field(ge=0, description="Нижняя граница диапазона (включительно)")]
+    max_price: Annotated[Decimal | None, Field(None, description="Верхняя граница диапазона, null — без ограничения")]
+    count: Annotated[int, Field(ge=0, description="Количество товаров")]
+
+
+class ProductFacets(BaseModel):
+    """
+    Фасеты выборки товаров для боковой панели витрины.
+    """
+    categories: Annotated[list[FacetCount], Field(description="Количество товаров по категориям")]
+    sellers: Annotated[list[FacetCount], Field(description="Количество товаров по продавцам")]
+    price_buckets: Annotated[list[PriceBucket], Field(description="Гистограмма цен")]
+    in_stock: Annotated[int, Field(ge=0, description="Количество товаров в наличии")]
+    out_of_stock: Annotated[int, Field(ge=0, description="Количество товаров без остатка")]
+
+
 class ProductList(BaseModel):
     """
     Модель пагинации для товаров 
@@ -126,6 +180,94 @@ class ProductList(BaseModel):
     page_items: Annotated[list[Product], Field(description="Товары для текущей страницы")]
     total_items:Annotated[int, Field(ge=0, description="Общее количество товаров")]
     page_size: Annotated[int, Field(ge=1, description="Количество товаров на одной странице")]
+    next_cursor: Annotated[str | None, Field(None, description="Курсор следующей страницы, null — если страниц больше нет")]
+    count_strategy: Annotated[Literal["exact", "windowed", "estimated", "cached"],
+                              Field("exact", description="Каким способом получено значение total_items")]
+    facets: Annotated[ProductFacets | None, Field(None, description="Фасеты выборки, если запрошены")]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductPage(BaseModel):
+    """
+    Модель страницы товаров с курсорной (keyset) пагинацией.
+    """
+    items: Annotated[list[Product], Field(description="Товары на текущей странице")]
+    page_size: Annotated[int, Field(ge=1, description="Количество товаров на одной странице")]
+    next_cursor: Annotated[str | None, Field(None, description="Курсор следующей страницы, null — если страниц больше нет")]
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class ProductStockUpdate(BaseModel):
+    """
+    Изменение остатка и/или цены одного товара в пакетном обновлении.
+    """
+    id: Annotated[int, Field(description="ID товара")]
+    stock: Annotated[int | None, Field(None, ge=0, description="Новый остаток; null — не менять")]
+    price: Annotated[Decimal | None, Field(None, gt=0, decimal_places=2, description="Новая цена; null — не менять")]
+
+    @model_validator(mode="after")
+    def check_changes(self) -> "ProductStockUpdate":
+        if self.stock is None and self.price is None:
+            raise ValueError("stock or price must be provided")
+        return self
+
+
+class ProductBulkUpdate(BaseModel):
+    """
+    Модель пакетного обновления остатков и цен товаров продавца.
+    """
+    items: Annotated[list[ProductStockUpdate], Field(min_length=1, max_length=5000, description="Изменения по товарам")]
+
+    @field_validator("items")
+    @classmethod
+    def check_unique_ids(cls, items: list[ProductStockUpdate]) -> list[ProductStockUpdate]:
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("Product ids must be unique within a batch")
+        return items
+
+
+class ProductBulkUpdateItem(BaseModel):
+    """
+    Результат обновления одного товара.
+    """
+    id: Annotated[int, Field(description="ID товара")]
+    status: Annotated[Literal["updated", "not_found", "forbidden"], Field(description="Результат обновления")]
+    stock: Annotated[int | None, Field(None, description="Остаток после обновления")]
+    price: Annotated[Decimal | None, Field(None, description="Цена после обновления")]
+    is_active: Annotated[bool | None, Field(None, description="Активность товара после обновления")]
+
+
+class ProductBulkUpdateResult(BaseModel):
+    """
+    Модель ответа пакетного обновления: итоги по каждому товару в порядке запроса.
+    """
+    items: Annotated[list[ProductBulkUpdateItem], Field(description="Результаты по товарам")]
+    updated: Annotated[int, Field(ge=0, description="Количество обновлённых товаров")]
+
+
+class ProductImportError(BaseModel):
+    """
+    Ошибка в строке файла импорта.
+    """
+    row: Annotated[int, Field(ge=1, description="Номер строки с данными (без учёта заголовка CSV)")]
+    error: Annotated[str, Field(description="Описание ошибки")]
+
+
+class ProductImportJob(BaseModel):
+    """
+    Модель для ответа с состоянием задачи массового импорта товаров.
+    """
+    id: Annotated[int, Field(description="ID задачи импорта")]
+    format: Annotated[Literal["csv", "ndjson"], Field(description="Формат загруженного файла")]
+    status: Annotated[Literal["pending", "processing", "completed", "failed"], Field(description="Статус задачи")]
+    total_rows: Annotated[int, Field(ge=0, description="Обработано строк")]
+    imported_rows: Annotated[int, Field(ge=0, description="Загружено товаров")]
+    failed_rows: Annotated[int, Field(ge=0, description="Строк с ошибками")]
+    errors: Annotated[list[ProductImportError], Field(description="Ошибки по строкам (не больше IMPORT_MAX_ERRORS)")]
+    created_at: Annotated[datetime, Field(description="Когда задача была создана")]
+    finished_at: Annotated[datetime | None, Field(None, description="Когда обработка завершилась")]
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -142,6 +284,22 @@ class CartItemUpdate(BaseModel):
     """Модель для обновления количества товара в корзине."""
     quantity: int = Field(ge=1, description="Новое количество товара")    
 
+class CartBatchItem(BaseModel):
+    """Изменение одной позиции в пакетном обновлении корзины."""
+    product_id: Annotated[int, Field(description="ID товара")]
+    quantity: Annotated[int, Field(ge=0, description="Новое количество товара; 0 — удалить из корзины")]
+
+class CartBatchUpdate(BaseModel):
+    """Модель для пакетного изменения позиций корзины."""
+    items: Annotated[list[CartBatchItem], Field(min_length=1, max_length=500, description="Изменения позиций")]
+
+    @field_validator("items")
+    @classmethod
+    def check_unique_products(cls, items: list[CartBatchItem]) -> list[CartBatchItem]:
+        if len({item.product_id for item in items}) != len(items):
+            raise ValueError("Product ids must be unique within a batch")
+        return items
+
 class CartItem(BaseModel):
     """Товар в корзине с данными продукта."""
     id: Annotated[int, Field(description="ID позиции корзины")]
@@ -159,6 +317,13 @@ class Cart(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+class CartSummary(BaseModel):
+    """Краткая сводка корзины для бейджа в шапке."""
+    user_id: Annotated[int, Field(description="ID пользователя")]
+    items_count: Annotated[int, Field(ge=0, description="Количество позиций в корзине")]
+    total_quantity: Annotated[int, Field(ge=0, description="Общее количество товаров")]
+    total_price: Annotated[Decimal, Field(ge=0, description="Общая сумма товаров")]
+
 class OrderItem(BaseModel):
     """
     Модель описывает одну строку заказа.
@@ -182,20 +347,35 @@ class Order(BaseModel):
     user_id: Annotated[int, Field(description="ID пользователя")]
     status: Annotated[str, Field(description="Текущий статус заказа")]
     total_amount: Annotated[Decimal, Field(ge=0, description="Общая стоимость")]
+    reserved_until: Annotated[datetime | None, Field(default=None, description="До какого момента товары зарезервированы под неоплаченный заказ")]
     created_at: Annotated[datetime, Field(description="Когда заказ был создан")]
     updated_at: Annotated[datetime, Field(description="Когда последний раз обновлялся")]
     items: Annotated[list[OrderItem], Field(default_factory=list, description="Список позиций")]
 
     model_config = ConfigDict(from_attributes=True)
 
+class OrderSummary(BaseModel):
+    """
+    Краткое представление заказа для истории заказов, без позиций.
+    Полный состав заказа отдаёт GET /orders/{order_id}.
+    """
+    id: Annotated[int, Field(description="ID заказа")]
+    status: Annotated[str, Field(description="Текущий статус заказа")]
+    total_amount: Annotated[Decimal, Field(ge=0, description="Общая стоимость")]
+    items_count: Annotated[int, Field(ge=0, description="Количество позиций в заказе")]
+    created_at: Annotated[datetime, Field(description="Когда заказ был создан")]
+
+    model_config = ConfigDict(from_attributes=True)
+
 class OrderList(BaseModel):
     """
     Модель обёртка для пагинированных списков заказов.
     """
-    items: Annotated[list[Order], Field(description="Заказы на текущей странице")]
+    items: Annotated[list[OrderSummary], Field(description="Заказы на текущей странице")]
     total: Annotated[int, Field(ge=0, description="Общее количество заказов")]
     page: Annotated[int, Field(ge=1, description="Текущая страница")]
     page_size: Annotated[int, Field(ge=1, description="Размер страницы")]
+    next_cursor: Annotated[str | None, Field(None, description="Курсор следующей страницы, null — если страниц больше нет")]
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -204,4 +384,15 @@ class OrderCheckoutResponse(BaseModel):
     Модель для отправки данных клиенту от YooKassa
     """
     order: Annotated[Order, Field(description="Созданный заказ")]
+    confirmation_url: Annotated[str | None, Field(default=None, description="URL для перехода на оплату в YooKassa")]
+    payment_status: Annotated[Literal["ready", "processing"], Field(default="ready",
+                              description="processing — платёж ещё создаётся, ссылку нужно получить через GET /orders/{order_id}/payment")]
+
+class OrderPayment(BaseModel):
+    """
+    Состояние платежа заказа для опроса клиентом после оформления.
+    """
+    order_id: Annotated[int, Field(description="ID заказа")]
+    status: Annotated[str, Field(description="Текущий статус заказа")]
+    payment_status: Annotated[Literal["ready", "processing"], Field(description="Создан ли платёж в YooKassa")]
     confirmation_url: Annotated[str | None, Field(default=None, description="URL для перехода на оплату в YooKassa")]
\ No newline at end of file
@@ -0,0 +1,100 @@
+import time
+import uuid
+import asyncio
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import select, delete, func
+
+import app.payments as payments
+import app.routers.orders as orders_router
+from app.database import async_session_maker
+from app.models.users import User
+from app.models.products import Product
+from app.models.categories import Category
+from app.models.cart_items import CartItem
+from app.models.orders import Order, OrderItem
+
+BUYERS = 300
+INITIAL_STOCK = 100
+QUANTITY_PER_ORDER = 1
+
+
+async def _fake_payment(order_id: int, amount: Decimal, user_email: str, description: str,
+                        idempotence_key: str | None = None) -> dict:
+    # Платёжный шлюз не участвует в гонке за остатками — подменяем его мгновенной заглушкой
+    return {"id": f"bench-{uuid.uuid4()}", "status": "pending", "confirmation_url": None}
+
+
+async def _prepare(run_id: str) -> tuple[int, list[User], list[int]]:
+    """
+    Создаёт продавца, категорию, один товар с INITIAL_STOCK штук и BUYERS покупателей,
+    у каждого из которых этот товар лежит в корзине.
+    """
+    async with async_session_maker() as session:
+        seller = User(email=f"bench-seller-{run_id}@example.com", hashed_password="-", role="seller")
+        category = Category(name=f"bench-{run_id}")
+        session.add_all([seller, category])
+        await session.flush()
+        product = Product(name=f"bench-{run_id}", price=Decimal("100.00"), stock=INITIAL_STOCK,
+                          category_id=category.id, seller_id=seller.id, is_active=True)
+        buyers = [User(email=f"bench-buyer-{run_id}-{i}@example.com", hashed_password="-", role="buyer")
+                  for i in range(BUYERS)]
+        session.add(product)
+        session.add_all(buyers)
+        await session.flush()
+        session.add_all([CartItem(user_id=buyer.id, product_id=product.id, quantity=QUANTITY_PER_ORDER)
+                         for buyer in buyers])
+        await session.commit()
+        return product.id, buyers, [seller.id, category.id]
+
+
+async def _checkout(buyer: User, results: dict[str, int]) -> None:
+    async with async_session_maker() as session:
+        try:
+            await orders_router.checkout_order(user_current=buyer, session=session)
+            results["ok"] += 1
+        except HTTPException as exc:
+            results[f"http {exc.status_code}"] = results.get(f"http {exc.status_code}", 0) + 1
+
+
+async def _cleanup(product_id: int, buyers: list[User], seller_id: int, category_id: int) -> None:
+    async with async_session_maker() as session:
+        buyer_ids = [buyer.id for buyer in buyers]
+        await session.execute(delete(Order).where(Order.user_id.in_(buyer_ids)))
+        await session.execute(delete(User).where(User.id.in_(buyer_ids)))
+        await session.execute(delete(Product).where(Product.id == product_id))
+        await session.execute(delete(Category).where(Category.id == category_id))
+        await session.execute(delete(User).where(User.id == seller_id))
+        await session.commit()
+
+
+async def main() -> None:
+    payments.create_yookassa_payment = _fake_payment
+    run_id = uuid.uuid4().hex[:8]
+    product_id, buyers, (seller_id, category_id) = await _prepare(run_id)
+    results = {"ok": 0}
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(_checkout(buyer, results) for buyer in buyers))
+        elapsed = time.perf_counter() - started
+
+        async with async_session_maker() as session:
+            stock, is_active = (await session.execute(
+                select(Product.stock, Product.is_active).where(Product.id == product_id)
+            )).one()
+            sold = await session.scalar(
+                select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == product_id)
+            )
+        oversold = max(0, sold - INITIAL_STOCK)
+        print(f"{BUYERS} parallel checkouts of one SKU with stock {INITIAL_STOCK} in {elapsed:.2f}s "
+              f"({BUYERS / elapsed:.0f} checkouts/s)")
+        print(f"results: {results}")
+        print(f"sold {sold}, remaining stock {stock}, is_active={is_active}, oversold {oversold}")
+        consistent = sold + stock == INITIAL_STOCK and stock >= 0 and results["ok"] * QUANTITY_PER_ORDER == sold
+        print("OK: no oversell, stock is consistent" if consistent and oversold == 0 else "FAIL: stock is inconsistent")
+    finally:
+        await _cleanup(product_id, buyers, seller_id, category_id)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,157 @@
+import time
+import uuid
+import asyncio
+from decimal import Decimal
+from fastapi import HTTPException
+from sqlalchemy import event, delete
+
+import app.payments as payments
+import app.routers.orders as orders_router
+from app.config import settings
+from app.database import async_engine, async_session_maker
+from app.models.users import User
+from app.models.products import Product
+from app.models.categories import Category
+from app.models.cart_items import CartItem
+from app.models.orders import Order
+
+BUYERS = 50
+INLINE_TIMEOUT_SECONDS = 0.5
+# Задержки заглушки ЮKassa: быстрее таймаута (платёж создаётся сразу) и медленнее (уходит в очередь)
+PAYMENT_LATENCIES = (0.2, 2.0)
+
+
+class _Probe:
+    """
+    Считает время удержания блокировок товаров (от SELECT ... FOR UPDATE до коммита или отката)
+    и пиковое число соединений, одновременно взятых из пула.
+    """
+
+    def __init__(self):
+        self.lock_started: dict[int, float] = {}
+        self.lock_hold_ms: list[float] = []
+        self.checked_out = 0
+        self.peak_checked_out = 0
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if "FOR UPDATE" in statement:
+            self.lock_started[id(conn)] = time.perf_counter()
+
+    def end_transaction(self, conn):
+        started = self.lock_started.pop(id(conn), None)
+        if started is not None:
+            self.lock_hold_ms.append((time.perf_counter() - started) * 1000)
+
+    def checkout(self, *args):
+        self.checked_out += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checked_out)
+
+    def checkin(self, *args):
+        self.checked_out -= 1
+
+    def attach(self) -> None:
+        engine = async_engine.sync_engine
+        event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.listen(engine, "commit", self.end_transaction)
+        event.listen(engine, "rollback", self.end_transaction)
+        event.listen(engine.pool, "checkout", self.checkout)
+        event.listen(engine.pool, "checkin", self.checkin)
+
+    def detach(self) -> None:
+        engine = async_engine.sync_engine
+        event.remove(engine, "before_cursor_execute", self.before_cursor_execute)
+        event.remove(engine, "commit", self.end_transaction)
+        event.remove(engine, "rollback", self.end_transaction)
+        event.remove(engine.pool, "checkout", self.checkout)
+        event.remove(engine.pool, "checkin", self.checkin)
+
+
+def _slow_payment(latency: float):
+    async def _fake_payment(order_id: int, amount: Decimal, user_email: str, description: str,
+                            idempotence_key: str | None = None) -> dict:
+        await asyncio.sleep(latency)
+        return {"id": f"bench-{uuid.uuid4()}", "status": "pending",
+                "confirmation_url": f"https://yookassa.example/{idempotence_key}"}
+    return _fake_payment
+
+
+async def _prepare(run_id: str) -> tuple[int, list[User], int, int]:
+    """
+    Один товар с запасом на всех и BUYERS покупателей с этим товаром в корзине:
+    все оформления конкурируют за блокировку одной строки.
+    """
+    async with async_session_maker() as session:
+        seller = User(email=f"bench-seller-{run_id}@example.com", hashed_password="-", role="seller")
+        category = Category(name=f"bench-{run_id}")
+        session.add_all([seller, category])
+        await session.flush()
+        product = Product(name=f"bench-{run_id}", price=Decimal("100.00"), stock=BUYERS,
+                          category_id=category.id, seller_id=seller.id, is_active=True)
+        buyers = [User(email=f"bench-buyer-{run_id}-{i}@example.com", hashed_password="-", role="buyer")
+                  for i in range(BUYERS)]
+        session.add(product)
+        session.add_all(buyers)
+        await session.flush()
+        session.add_all([CartItem(user_id=buyer.id, product_id=product.id, quantity=1) for buyer in buyers])
+        await session.commit()
+        return product.id, buyers, seller.id, category.id
+
+
+async def _cleanup(product_id: int, buyers: list[User], seller_id: int, category_id: int) -> None:
+    async with async_session_maker() as session:
+        buyer_ids = [buyer.id for buyer in buyers]
+        await session.execute(delete(Order).where(Order.user_id.in_(buyer_ids)))
+        await session.execute(delete(User).where(User.id.in_(buyer_ids)))
+        await session.execute(delete(Product).where(Product.id == product_id))
+        await session.execute(delete(Category).where(Category.id == category_id))
+        await session.execute(delete(User).where(User.id == seller_id))
+        await session.commit()
+
+
+async def _checkout(buyer: User, results: dict[str, int], response_ms: list[float]) -> None:
+    started = time.perf_counter()
+    async with async_session_maker() as session:
+        try:
+            response = await orders_router.checkout_order(user_current=buyer, session=session)
+            results[response.payment_status] = results.get(response.payment_status, 0) + 1
+        except HTTPException as exc:
+            results[f"http {exc.status_code}"] = results.get(f"http {exc.status_code}", 0) + 1
+    response_ms.append((time.perf_counter() - started) * 1000)
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))] if ordered else 0.0
+
+
+async def _run(latency: float) -> None:
+    payments.create_yookassa_payment = _slow_payment(latency)
+    product_id, buyers, seller_id, category_id = await _prepare(uuid.uuid4().hex[:8])
+    probe = _Probe()
+    results: dict[str, int] = {}
+    response_ms: list[float] = []
+    probe.attach()
+    try:
+        await asyncio.gather(*(_checkout(buyer, results, response_ms) for buyer in buyers))
+    finally:
+        probe.detach()
+        await _cleanup(product_id, buyers, seller_id, category_id)
+
+    print(f"{latency * 1000:>8.0f} ms {_percentile(probe.lock_hold_ms, 50):>9.1f} ms "
+          f"{max(probe.lock_hold_ms, default=0.0):>9.1f} ms {probe.peak_checked_out:>6}/{async_engine.pool.size():<3} "
+          f"{_percentile(response_ms, 50):>9.0f} ms  {results}")
+
+
+async def main() -> None:
+    settings.PAYMENT_INLINE_TIMEOUT_SECONDS = INLINE_TIMEOUT_SECONDS
+    # Очередь не нужна: платёж создаст воркер, здесь важно только, что обработчик не ждёт шлюз
+    orders_router.create_order_payment_task.delay = lambda order_id: None
+    print(f"{BUYERS} parallel checkouts of one SKU, inline payment timeout {INLINE_TIMEOUT_SECONDS}s")
+    print(f"{'yookassa':>11} {'lock p50':>12} {'lock max':>12} {'pool peak':>10} {'resp p50':>12}  results")
+    for latency in PAYMENT_LATENCIES:
+        await _run(latency)
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+import time
+import asyncio
+import httpx
+from fastapi import FastAPI
+
+from app.config import settings
+from app.auth import hash_password, verify_password, verify_password_async
+
+DURATION_SECONDS = 3.0
+LOGIN_CONCURRENCY = 32
+PROBE_INTERVAL_SECONDS = 0.005
+PASSWORD = "correct horse battery staple"
+# Небольшая страница каталога: обработчик сам по себе отвечает за доли миллисекунды
+CATALOG_PAGE = {"items": [{"id": i, "name": f"Product {i}", "price": "1999.90"} for i in range(20)]}
+
+
+def _build_app(hashed_password: str, offload: bool) -> FastAPI:
+    """
+    Минимальное приложение с логином и чтением каталога в одном event loop, как в воркере uvicorn.
+    offload=False — прежнее поведение (bcrypt прямо в обработчике).
+    """
+    app = FastAPI()
+
+    @app.post("/login")
+    async def login() -> dict:
+        if offload:
+            ok = await verify_password_async(PASSWORD, hashed_password)
+        else:
+            ok = verify_password(PASSWORD, hashed_password)
+        return {"ok": ok}
+
+    @app.get("/catalog")
+    async def catalog() -> dict:
+        return CATALOG_PAGE
+
+    return app
+
+
+async def _login_worker(client: httpx.AsyncClient, deadline: float, counter: list[int]) -> None:
+    while time.perf_counter() < deadline:
+        await client.post("/login")
+        counter[0] += 1
+
+
+async def _run(app: FastAPI, with_storm: bool) -> tuple[list[float], float]:
+    """
+    Последовательно запрашивает каталог, пока (опционально) LOGIN_CONCURRENCY клиентов логинятся.
+    Возвращает задержки каталога в мс и число логинов в секунду.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + DURATION_SECONDS
+        logins = [0]
+        workers = [asyncio.create_task(_login_worker(client, deadline, logins))
+                   for _ in range(LOGIN_CONCURRENCY if with_storm else 0)]
+        latencies = []
+        # Запросы каталога идут по расписанию; задержка считается от запланированного момента,
+        # поэтому в неё попадает и время, пока event loop был занят хешированием
+        scheduled = time.perf_counter()
+        while scheduled < deadline:
+            await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+            await client.get("/catalog")
+            latencies.append((time.perf_counter() - scheduled) * 1000)
+            scheduled = max(scheduled + PROBE_INTERVAL_SECONDS, time.perf_counter())
+        await asyncio.gather(*workers)
+    return latencies, logins[0] / DURATION_SECONDS
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+def main() -> None:
+    hashed_password = hash_password(PASSWORD)
+    print(f"{LOGIN_CONCURRENCY} concurrent logins, {settings.PASSWORD_HASH_EXECUTOR} pool "
+          f"of {settings.PASSWORD_HASH_WORKERS} workers, {DURATION_SECONDS:.0f}s per case")
+    print(f"{'case':<22} {'catalog reqs':>12} {'catalog p50':>12} {'catalog p99':>12} {'catalog max':>12} {'logins/s':>9}")
+    cases = {
+        "idle": (False, False),
+        "storm, inline bcrypt": (False, True),
+        "storm, hash executor": (True, True),
+    }
+    for name, (offload, with_storm) in cases.items():
+        latencies, login_rate = asyncio.run(_run(_build_app(hashed_password, offload), with_storm))
+        print(f"{name:<22} {len(latencies):>12} {_percentile(latencies, 50):>9.1f} ms {_percentile(latencies, 99):>9.1f} ms "
+              f"{max(latencies):>9.1f} ms {login_rate:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
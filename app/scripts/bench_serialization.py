@@ -0,0 +1,93 @@
+import time
+import asyncio
+from decimal import Decimal
+from datetime import datetime, timezone
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from app.config import settings
+from app.models import Product, Review
+from app.schemas import ProductList, Review as ReviewSchema, OrderList
+from app.serialization import render_json, product_list_adapter, review_list_adapter, order_list_adapter
+
+PAGE_SIZE = 100
+DURATION_SECONDS = 2.0
+
+
+def _make_products(count: int) -> list[Product]:
+    return [Product(id=i, name=f"Product {i}", description="Описание товара " * 10, price=Decimal("1999.90"),
+                    image_url=f"/media/products/{i}.jpg", stock=i % 7, category_id=i % 12, rating=4.25,
+                    is_active=True) for i in range(1, count + 1)]
+
+
+def _make_reviews(count: int) -> list[Review]:
+    now = datetime.now()
+    return [Review(id=i, user_id=i, product_id=i, comment="Отличный товар, рекомендую " * 4, comment_date=now,
+                   grade=5, is_active=True) for i in range(1, count + 1)]
+
+
+def _make_orders(count: int) -> list[dict]:
+    # История заказов отдаёт краткие строки (OrderSummary), а не заказы с позициями
+    now = datetime.now(timezone.utc)
+    return [{"id": i, "status": "paid", "total_amount": Decimal("11999.40"), "items_count": 3, "created_at": now}
+            for i in range(1, count + 1)]
+
+
+def _rate(render) -> float:
+    """
+    Количество отрендеренных ответов в секунду в одном потоке (т.е. на одно ядро).
+    """
+    rendered = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < DURATION_SECONDS:
+        render()
+        rendered += 1
+    return rendered / (time.perf_counter() - started)
+
+
+async def _rate_fastapi_default(response_model, content) -> float:
+    """
+    Путь FastAPI по умолчанию: обработчик собирает схему из ORM-объектов (как делали
+    get_all_products и get_all_orders), затем FastAPI валидирует её по response_model,
+    сериализует в dict/list и кодирует stdlib json.
+    """
+    field = create_model_field(name="Response", type_=response_model, mode="serialization")
+    rendered = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < DURATION_SECONDS:
+        if isinstance(content, dict):
+            handler_result = response_model.model_validate(content, from_attributes=True)
+        else:
+            handler_result = content
+        serialized = await serialize_response(field=field, response_content=handler_result, is_coroutine=True)
+        JSONResponse(serialized).body
+        rendered += 1
+    return rendered / (time.perf_counter() - started)
+
+
+def main() -> None:
+    products = _make_products(PAGE_SIZE)
+    reviews = _make_reviews(PAGE_SIZE)
+    orders = _make_orders(PAGE_SIZE)
+    cases = {
+        "products": (ProductList, product_list_adapter,
+                     {"page": 1, "page_items": products, "total_items": 5000, "page_size": PAGE_SIZE}),
+        "reviews": (list[ReviewSchema], review_list_adapter, reviews),
+        "orders": (OrderList, order_list_adapter,
+                   {"items": orders, "total": PAGE_SIZE, "page": 1, "page_size": PAGE_SIZE}),
+    }
+    print(f"{PAGE_SIZE} items per response, single thread")
+    print(f"{'endpoint':<10} {'fastapi default':>16} {'adapter+json':>14} {'adapter fast':>14}  speedup")
+    for name, (response_model, adapter, content) in cases.items():
+        baseline = asyncio.run(_rate_fastapi_default(response_model, content))
+        settings.FAST_JSON_RESPONSES = False
+        adapter_stdlib = _rate(lambda: render_json(adapter, content))
+        settings.FAST_JSON_RESPONSES = True
+        adapter_fast = _rate(lambda: render_json(adapter, content))
+        print(f"{name:<10} {baseline:>12.0f} r/s {adapter_stdlib:>10.0f} r/s {adapter_fast:>10.0f} r/s  "
+              f"x{adapter_fast / baseline:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import sys
+import json
+import uuid
+import asyncio
+import itertools
+from decimal import Decimal
+from typing import Any
+from sqlalchemy import select, insert, func, text, case, cast, literal, true, Integer, Numeric
+from sqlalchemy.dialects.postgresql import array
+
+from app.database import async_session_maker
+from app.pagination import Explain
+from app.models.users import User
+from app.models.products import Product
+from app.models.categories import Category
+from app.routers.products import build_product_filters, build_product_page_query, build_product_validators_query
+
+# Синтетический каталог, близкий к рабочему по объёму и распределениям: на маленькой таблице
+# планировщик законно выбирает seq scan, и проверка индексов ничего бы не показала
+SEED_PRODUCTS = 100_000
+SEED_CATEGORIES = 50
+SEED_SELLERS = 200
+SEED = 0.42
+# Распроданные товары неактивны (общее правило is_active_after_stock_change)
+SOLD_OUT_SHARE = 0.05
+PRODUCT_WORDS = ("laptop", "tablet", "camera", "watch", "speaker", "headphones", "monitor", "keyboard",
+                 "mouse", "router", "printer", "charger", "cable", "drone", "console", "lamp", "kettle")
+# Искомое слово встречается в названиях редко, как и большинство реальных поисковых запросов
+SEARCH_TERM = "phone"
+SEARCH_TERM_SHARE = 0.005
+PAGE_SIZE = 20
+# Узкий диапазон, как у фильтра цены в каталоге; при широком страница по id с фильтром дешевле индекса цены
+PRICE_RANGE = (Decimal("1000"), Decimal("1005"))
+# Индексы, которые должны обслуживать фильтр, и столбец, по которому в плане ожидается Index Cond.
+# None — условие фильтра входит в предикат частичного индекса, Index Cond у такого узла нет
+FILTER_INDEXES: dict[str, dict[str, str | None]] = {
+    "category": {"ix_products_active_category_id": "category_id", "ix_products_active_category_price": "category_id"},
+    "seller": {"ix_products_active_seller_id": "seller_id", "ix_products_active_seller_price": "seller_id"},
+    "price": {"ix_products_active_price": "price", "ix_products_active_category_price": "price",
+              "ix_products_active_seller_price": "price"},
+    "out_of_stock": {"ix_products_active_out_of_stock_id": None},
+    "search": {"ix_products_tsv_gin": "tsv"},
+}
+# Без избирательных фильтров страница должна читаться индексом в порядке id, а не сортировкой всей таблицы
+ORDERED_PAGE_INDEXES: dict[str, str | None] = {"ix_products_active_id": None, "ix_products_active_in_stock_id": None}
+
+
+def _plan_nodes(plan: dict[str, Any]) -> list[dict[str, Any]]:
+    """
+    Разворачивает дерево плана в список узлов.
+    """
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def _check_plan(plan: dict[str, Any], expected: dict[str, str | None]) -> tuple[bool, str]:
+    """
+    Проверяет, что план не читает products последовательным сканированием и использует
+    один из ожидаемых индексов с Index Cond по отфильтрованному столбцу.
+    """
+    nodes = _plan_nodes(plan)
+    if any(node.get("Node Type") == "Seq Scan" and node.get("Relation Name") == Product.__tablename__
+           for node in nodes):
+        return False, "seq scan"
+    used = [(node["Index Name"], node.get("Index Cond", "")) for node in nodes if "Index Name" in node]
+    for name, condition in used:
+        column = expected.get(name, "")
+        if name in expected and (column is None or column in condition):
+            return True, f"{name} {condition}".strip()
+    return False, f"expected one of {sorted(expected)}, plan uses {used or 'no index'}"
+
+
+async def _seed(session, run_id: str) -> tuple[int, int]:
+    """
+    Наполняет каталог синтетическими продавцами, категориями и товарами внутри транзакции проверки.
+    Возвращает категорию и продавца для фильтров.
+    """
+    # Одинаковые данные от запуска к запуску: планы не зависят от случайного набора строк
+    await session.execute(select(func.setseed(SEED)))
+    sellers = func.generate_series(1, SEED_SELLERS).column_valued("n")
+    seller_ids = (await session.scalars(
+        insert(User).from_select(
+            ["email", "hashed_password", "role", "is_active", "token_version"],
+            select(func.concat(f"index-check-{run_id}-", sellers, "@example.com"),
+                   literal("not-used"), literal("seller"), true(), literal(0)))
+        .returning(User.id)
+    )).all()
+    categories = func.generate_series(1, SEED_CATEGORIES).column_valued("n")
+    category_ids = (await session.scalars(
+        insert(Category).from_select(["name", "is_active"],
+                                     select(func.concat("Index check ", categories), true()))
+        .returning(Category.id)
+    )).all()
+
+    series = select(func.generate_series(1, SEED_PRODUCTS).label("n"),
+                    (func.random() < SOLD_OUT_SHARE).label("sold_out")).subquery("series")
+    words = array(PRODUCT_WORDS)
+
+    def _pick(values, count: int):
+        return values[1 + cast(func.floor(func.random() * count), Integer)]
+
+    await session.execute(
+        insert(Product).from_select(
+            ["name", "description", "price", "stock", "rating", "is_active", "category_id", "seller_id"],
+            select(func.concat(case((func.random() < SEARCH_TERM_SHARE, SEARCH_TERM),
+                                    else_=_pick(words, len(PRODUCT_WORDS))), " model ", series.c.n),
+                   func.concat("Accessory for ", _pick(words, len(PRODUCT_WORDS))),
+                   # Цены распределены логарифмически от 100 до 100 000 рублей
+                   cast(100 * func.power(1000, func.random()), Numeric(10, 2)),
+                   case((series.c.sold_out, 0), else_=1 + cast(func.floor(func.random() * 100), Integer)),
+                   func.random() * 5,
+                   ~series.c.sold_out,
+                   _pick(array(category_ids), SEED_CATEGORIES),
+                   _pick(array(seller_ids), SEED_SELLERS)))
+    )
+    return category_ids[0], seller_ids[0]
+
+
+async def check_product_indexes() -> bool:
+    """
+    Строит EXPLAIN запросов GET /products/ (полная страница товаров и точный подсчёт total)
+    для каждой комбинации фильтров на синтетическом каталоге из SEED_PRODUCTS товаров
+    и проверяет, что каждый избирательный фильтр обслуживается своим индексом.
+    Данные и собранная по ним статистика откатываются вместе с транзакцией.
+    """
+    async with async_session_maker() as session:
+        category_id, seller_id = await _seed(session, uuid.uuid4().hex[:8])
+        await session.execute(text(f"ANALYZE {Product.__tablename__}"))
+
+        ok = True
+        for category, seller, price_range, in_stock, search in itertools.product(
+                (None, category_id), (None, seller_id), (None, PRICE_RANGE), (None, True, False), (None, SEARCH_TERM)):
+            filters, rank_expr = build_product_filters(
+                category_id=category, seller_id=seller, in_stock=in_stock, search=search,
+                min_price=price_range[0] if price_range else None,
+                max_price=price_range[1] if price_range else None,
+            )
+            # Фильтр "в наличии" пропускает почти все активные товары: индекс для него не обязателен
+            selective = {"category": category, "seller": seller, "price": price_range,
+                         "out_of_stock": in_stock is False, "search": search}
+            expected = {name: column for kind, value in selective.items() if value
+                        for name, column in FILTER_INDEXES[kind].items()}
+            statements = {
+                "page": (build_product_page_query(filters, rank_expr, offset=0, page_size=PAGE_SIZE),
+                         expected or ORDERED_PAGE_INDEXES),
+                # Подсчёт почти всей таблицы законно читает её целиком
+                "count": (build_product_validators_query(filters), expected),
+            }
+            combination = (f"category={category} seller={seller} price={price_range} "
+                           f"in_stock={in_stock} search={search}")
+            for kind, (statement, expected_indexes) in statements.items():
+                if not expected_indexes:
+                    print(f"skip      {combination} [{kind}]: no selective filter")
+                    continue
+                plan = await session.scalar(Explain(statement))
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                passed, details = _check_plan(plan[0]["Plan"], expected_indexes)
+                ok = ok and passed
+                print(f"{'index' if passed else 'FAIL':<9} {combination} [{kind}]: {details}")
+        await session.rollback()
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_product_indexes()) else 1)
@@ -0,0 +1,33 @@
+import json
+from typing import Any
+from fastapi import Response
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.schemas import ProductList, ProductPage, Review, OrderList
+
+# Адаптеры компилируются один раз при импорте, а не на каждый запрос
+product_list_adapter = TypeAdapter(ProductList)
+product_page_adapter = TypeAdapter(ProductPage)
+review_list_adapter = TypeAdapter(list[Review])
+order_list_adapter = TypeAdapter(OrderList)
+
+
+def render_json(adapter: TypeAdapter, data: Any) -> bytes:
+    """
+    Валидирует данные (ORM-объекты или словари) по схеме ровно один раз и кодирует в JSON.
+    В быстром режиме JSON пишет pydantic-core напрямую в байты, минуя промежуточные
+    dict/list и stdlib json; иначе повторяет кодирование FastAPI/Starlette по умолчанию.
+    """
+    validated = adapter.validate_python(data, from_attributes=True)
+    if settings.FAST_JSON_RESPONSES:
+        return adapter.dump_json(validated)
+    return json.dumps(adapter.dump_python(validated, mode="json"), ensure_ascii=False,
+                      allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(adapter: TypeAdapter, data: Any, headers: dict[str, str] | None = None) -> Response:
+    """
+    Готовый JSON-ответ в обход повторной валидации по response_model.
+    """
+    return Response(content=render_json(adapter, data), media_type="application/json", headers=headers)
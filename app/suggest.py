@@ -0,0 +1,145 @@
+import re
+import time
+import asyncio
+from bisect import bisect_left, insort
+from sqlalchemy import select
+
+from app.log import logger
+from app.config import settings
+from app.database import async_session_maker
+from app.models.products import Product as ProductModel
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _tokenize(value: str) -> list[str]:
+    return _TOKEN_RE.findall(value.lower())
+
+
+class SuggestIndex:
+    """
+    In-memory префиксный индекс названий активных товаров для автодополнения.
+    Хранит отсортированный список пар (слово, id товара), поэтому поиск по префиксу —
+    это бинарный поиск и просмотр ограниченного диапазона без обращения к базе.
+    Короткий префикс, под который попадает больше scan_limit слов, обслуживается обходом
+    товаров в порядке рейтинга до первых limit совпадений, поэтому лучшие товары
+    не теряются за алфавитно первыми. Индекс прогревается в фоне при старте приложения;
+    локальные изменения применяются инкрементально, изменения с других узлов
+    подтягиваются полной перезагрузкой раз в SUGGEST_RELOAD_SECONDS.
+    """
+
+    def __init__(self, reload_interval: float, scan_limit: int):
+        self.reload_interval = reload_interval
+        self.scan_limit = scan_limit
+        self._entries: list[tuple[str, int]] = []
+        # Товары в порядке выдачи подсказок: рейтинг по убыванию, затем название и id
+        self._ranked: list[tuple[float, str, int]] = []
+        self._products: dict[int, tuple[str, float]] = {}
+        self._loaded_at: float | None = None
+        self._lock = asyncio.Lock()
+        self._reload_task: asyncio.Task | None = None
+
+    async def _load(self) -> None:
+        async with async_session_maker() as session:
+            rows = (await session.execute(
+                select(ProductModel.id, ProductModel.name, ProductModel.rating).where(ProductModel.is_active == True)
+            )).all()
+        products = {row.id: (row.name, row.rating) for row in rows}
+        entries = sorted((token, product_id)
+                         for product_id, (name, _) in products.items()
+                         for token in set(_tokenize(name)))
+        ranked = sorted((-rating, name, product_id) for product_id, (name, rating) in products.items())
+        self._products, self._entries, self._ranked = products, entries, ranked
+        self._loaded_at = time.monotonic()
+
+    async def _reload(self) -> None:
+        try:
+            async with self._lock:
+                await self._load()
+        except Exception as exc:
+            logger.warning(f"Suggest index reload failed: {exc}")
+
+    async def warm_up(self) -> None:
+        """
+        Загружает индекс заранее, чтобы первый запрос подсказок не ждал чтения каталога.
+        """
+        if self._loaded_at is None:
+            await self._reload()
+
+    async def ensure_loaded(self) -> None:
+        """
+        Загружает индекс, если прогрев ещё не успел, и обновляет его в фоне, когда он устарел.
+        """
+        if self._loaded_at is None:
+            async with self._lock:
+                if self._loaded_at is None:
+                    await self._load()
+            return
+        stale = time.monotonic() - self._loaded_at > self.reload_interval
+        if stale and (self._reload_task is None or self._reload_task.done()):
+            self._reload_task = asyncio.create_task(self._reload())
+
+    def suggest(self, query: str, limit: int) -> list[dict]:
+        """
+        Возвращает до limit товаров, в названии которых каждое слово запроса
+        является префиксом какого-либо слова; сортировка по рейтингу.
+        """
+        tokens = _tokenize(query)
+        if not tokens:
+            return []
+        *leading, prefix = tokens
+        start = bisect_left(self._entries, (prefix, -1))
+        end = bisect_left(self._entries, (prefix + "\U0010ffff", -1), lo=start)
+
+        def _matches(name: str, parts: list[str]) -> bool:
+            words = _tokenize(name)
+            return all(any(word.startswith(part) for word in words) for part in parts)
+
+        matches = []
+        if end - start > self.scan_limit:
+            # Префикс подходит к большой части каталога: совпадения среди товаров с высоким
+            # рейтингом находятся быстро, и собирать весь диапазон слов не нужно
+            for entry in self._ranked:
+                if _matches(entry[1], tokens):
+                    matches.append(entry)
+                    if len(matches) == limit:
+                        break
+        else:
+            candidates = {product_id for _, product_id in self._entries[start:end]}
+            for product_id in candidates:
+                name, rating = self._products[product_id]
+                if _matches(name, leading):
+                    matches.append((-rating, name, product_id))
+            matches.sort()
+        return [{"id": product_id, "name": name} for _, name, product_id in matches[:limit]]
+
+    def upsert(self, product_id: int, name: str, rating: float) -> None:
+        """
+        Добавляет товар в индекс или обновляет его название и рейтинг.
+        """
+        if self._loaded_at is None:
+            return
+        self.remove(product_id)
+        self._products[product_id] = (name, rating)
+        for token in set(_tokenize(name)):
+            insort(self._entries, (token, product_id))
+        insort(self._ranked, (-rating, name, product_id))
+
+    def remove(self, product_id: int) -> None:
+        """
+        Убирает товар из индекса (удаление или деактивация).
+        """
+        previous = self._products.pop(product_id, None)
+        if previous is None:
+            return
+        for token in set(_tokenize(previous[0])):
+            position = bisect_left(self._entries, (token, product_id))
+            if position < len(self._entries) and self._entries[position] == (token, product_id):
+                del self._entries[position]
+        ranked = (-previous[1], previous[0], product_id)
+        position = bisect_left(self._ranked, ranked)
+        if position < len(self._ranked) and self._ranked[position] == ranked:
+            del self._ranked[position]
+
+
+suggest_index = SuggestIndex(reload_interval=settings.SUGGEST_RELOAD_SECONDS, scan_limit=settings.SUGGEST_SCAN_LIMIT)
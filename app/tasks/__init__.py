@@ -1,3 +1,10 @@
 from .email_tasks import send_email_task
+from .image_tasks import generate_image_derivatives
+from .payment_tasks import create_order_payment_task
+from .order_tasks import expire_order_reservations_task
+from .idempotency_tasks import cleanup_idempotency_keys_task
+from .import_tasks import import_products_task, fail_stale_import_jobs_task
 
-__all__ = ["send_email_task"]
\ No newline at end of file
+__all__ = ["send_email_task", "generate_image_derivatives", "create_order_payment_task",
+           "expire_order_reservations_task", "cleanup_idempotency_keys_task",
+           "import_products_task", "fail_stale_import_jobs_task"]
@@ -0,0 +1,21 @@
+import asyncio
+from app.log import logger
+from app.config import settings
+from app.celery_app import celery_app
+from app.database import task_session_maker
+from app.idempotency import delete_expired_idempotency_keys
+
+
+async def _cleanup_idempotency_keys() -> int:
+    async with task_session_maker() as session:
+        return await delete_expired_idempotency_keys(session, settings.IDEMPOTENCY_CLEANUP_BATCH_SIZE)
+
+
+@celery_app.task
+def cleanup_idempotency_keys_task():
+    """
+    Периодически (Celery Beat) удаляет сохранённые ответы с истёкшим сроком Idempotency-Key.
+    """
+    deleted = asyncio.run(_cleanup_idempotency_keys())
+    logger.info(f"Expired idempotency keys deleted: {deleted}")
+    return deleted
@@ -0,0 +1,63 @@
+import io
+import asyncio
+from pathlib import PurePosixPath
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from app.log import logger
+from app.celery_app import celery_app
+from app.media_storage import media_storage
+
+# Производные изображения товара: суффикс файла -> максимальная сторона в пикселях
+DERIVATIVE_SIZES = {"thumb": 320, "medium": 960}
+WEBP_QUALITY = 80
+
+
+def derivative_keys(key: str) -> list[str]:
+    """
+    Возвращает ключи производных WebP-изображений для исходного файла в хранилище.
+    """
+    path = PurePosixPath(key)
+    return [str(path.with_name(f"{path.stem}_{suffix}.webp")) for suffix in DERIVATIVE_SIZES]
+
+
+def _render_derivatives(data: bytes) -> list[bytes]:
+    with Image.open(io.BytesIO(data)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        rendered = []
+        for max_side in DERIVATIVE_SIZES.values():
+            derivative = image.copy()
+            derivative.thumbnail((max_side, max_side))
+            buffer = io.BytesIO()
+            derivative.save(buffer, "WEBP", quality=WEBP_QUALITY)
+            rendered.append(buffer.getvalue())
+        return rendered
+
+
+async def _generate_derivatives(key: str) -> None:
+    targets = derivative_keys(key)
+    # Для уже загруженного ранее изображения превью существуют: содержимое то же самое
+    if all([await media_storage.exists(target) for target in targets]):
+        return
+    try:
+        data = await media_storage.read_bytes(key)
+    except FileNotFoundError:
+        # Товар или изображение успели удалить до обработки
+        logger.info(f"Image {key} is gone, skipping derivatives")
+        return
+    try:
+        rendered = _render_derivatives(data)
+    except UnidentifiedImageError:
+        logger.warning(f"Image {key} is not a valid image, skipping derivatives")
+        return
+    for target, content in zip(targets, rendered):
+        await media_storage.put_bytes(target, content)
+
+
+@celery_app.task
+def generate_image_derivatives(key: str):
+    """
+    Генерирует уменьшенные WebP-копии загруженного изображения товара.
+    """
+    asyncio.run(_generate_derivatives(key))
@@ -0,0 +1,31 @@
+import asyncio
+from pathlib import Path
+from app.log import logger
+from app.config import settings
+from app.celery_app import celery_app
+from app.database import task_session_maker
+from app.product_import import run_product_import, fail_stale_import_jobs
+
+
+@celery_app.task
+def import_products_task(job_id: int, path: str, import_format: str, seller_id: int):
+    """
+    Загружает товары из файла импорта, сохранённого обработчиком POST /products/import.
+    """
+    asyncio.run(run_product_import(job_id, Path(path), import_format, seller_id))
+
+
+async def _fail_stale_import_jobs() -> int:
+    async with task_session_maker() as session:
+        return await fail_stale_import_jobs(session, settings.IMPORT_STALE_MINUTES)
+
+
+@celery_app.task
+def fail_stale_import_jobs_task():
+    """
+    Периодически (Celery Beat) закрывает задачи импорта, зависшие после перезапуска воркера.
+    """
+    failed = asyncio.run(_fail_stale_import_jobs())
+    if failed:
+        logger.warning(f"Stale product import jobs marked as failed: {failed}")
+    return failed
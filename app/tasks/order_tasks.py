@@ -0,0 +1,22 @@
+import asyncio
+from app.log import logger
+from app.config import settings
+from app.celery_app import celery_app
+from app.database import task_session_maker
+from app.reservations import expire_all_reservations
+
+
+async def _expire_order_reservations() -> dict[str, int | float]:
+    async with task_session_maker() as session:
+        return await expire_all_reservations(session, settings.RESERVATION_EXPIRY_BATCH_SIZE)
+
+
+@celery_app.task
+def expire_order_reservations_task():
+    """
+    Периодически (Celery Beat) снимает резервы неоплаченных заказов и возвращает остатки на склад.
+    Карточки товаров в кэше обновятся по истечении PRODUCT_CACHE_TTL_SECONDS.
+    """
+    metrics = asyncio.run(_expire_order_reservations())
+    logger.info(f"Order reservations expired: {metrics}")
+    return metrics
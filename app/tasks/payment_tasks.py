@@ -0,0 +1,37 @@
+import asyncio
+from app.log import logger
+from app.cache import product_cache
+from app.celery_app import celery_app
+from app.database import task_session_maker
+from app.payments import PaymentGatewayUnavailable, create_order_payment
+from app.reservations import cancel_pending_order
+
+
+async def _create_order_payment(order_id: int) -> None:
+    async with task_session_maker() as session:
+        await create_order_payment(session, order_id)
+
+
+async def _cancel_order(order_id: int) -> None:
+    async with task_session_maker() as session:
+        product_ids = await cancel_pending_order(session, order_id)
+        await session.commit()
+    if product_ids:
+        await product_cache.delete(*product_ids)
+
+
+@celery_app.task(bind=True, max_retries=5, default_retry_delay=10)
+def create_order_payment_task(self, order_id: int):
+    """
+    Создаёт платёж для заказа, если это не успел сделать обработчик оформления заказа.
+    Повторы безопасны благодаря ключу идемпотентности заказа, но повторяются только
+    временные сбои ЮKassa; при отказе в платеже заказ отменяется и остатки возвращаются.
+    """
+    try:
+        asyncio.run(_create_order_payment(order_id))
+    except PaymentGatewayUnavailable as exc:
+        logger.warning(f"Payment creation for order {order_id} failed: {exc}")
+        raise self.retry(exc=exc, countdown=10 * 2 ** self.request.retries)
+    except Exception:
+        logger.exception(f"Payment for order {order_id} could not be created, canceling the order")
+        asyncio.run(_cancel_order(order_id))
@@ -0,0 +1,54 @@
+import os
+
+# Тестам не нужен .env: недостающие настройки задаются здесь, до импорта приложения.
+# Интеграционные тесты очищают таблицы, поэтому по умолчанию работают с отдельной базой online_store_test
+for name, value in {
+    "DB_HOST": "127.0.0.1",
+    "DB_PORT": "5432",
+    "DB_NAME": "online_store_test",
+    "DB_USER": "postgres",
+    "DB_PASSWORD": "postgres",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "30",
+    "REFRESH_TOKEN_EXPIRE_DAYS": "7",
+    "ALGORITHM": "HS256",
+    "SECRET_KEY": "test-secret-key",
+    "EMAIL_ADMIN": "admin@example.com",
+    "PASSWORD_ADMIN": "admin",
+    "YOOKASSA_SHOP_ID": "1",
+    "YOOKASSA_SECRET_KEY": "test",
+    "CACHE_REDIS_ENABLED": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+import pytest
+
+
+class FakeRedis:
+    """
+    Минимальная замена redis.asyncio.Redis для кэшей: get, set (ex, nx) и delete.
+    """
+
+    def __init__(self):
+        self.data: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: str, ex: int | None = None, nx: bool = False) -> bool | None:
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode()
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+
+@pytest.fixture
+def fake_redis(monkeypatch) -> FakeRedis:
+    """
+    Общий уровень кэшей в памяти вместо Redis.
+    """
+    client = FakeRedis()
+    monkeypatch.setattr("app.cache.get_redis", lambda: client)
+    return client
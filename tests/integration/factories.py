@@ -0,0 +1,88 @@
+"""
+Создание тестовых данных напрямую в базе, минуя API.
+"""
+import os
+from contextlib import asynccontextmanager
+from decimal import Decimal
+from sqlalchemy import insert, text
+
+from app.auth import create_access_token, token_claims
+from app.database import async_session_maker
+from app.models.categories import Category as CategoryModel
+from app.models.category_closure import CategoryClosure as ClosureModel
+from app.models.products import Product as ProductModel
+from app.models.users import User as UserModel
+
+
+async def create_user(role: str = "buyer", email: str | None = None) -> tuple[UserModel, dict[str, str]]:
+    """
+    Создаёт пользователя и возвращает его вместе с заголовком авторизации.
+    """
+    async with async_session_maker() as session:
+        user = UserModel(email=email or f"{role}-{os.urandom(4).hex()}@example.com",
+                         hashed_password="not-used", role=role)
+        session.add(user)
+        await session.commit()
+    return user, {"Authorization": f"Bearer {create_access_token(token_claims(user))}"}
+
+
+async def create_category(name: str = "Category", parent_id: int | None = None, is_active: bool = True) -> int:
+    """
+    Создаёт категорию вместе со строками таблицы замыкания.
+    """
+    async with async_session_maker() as session:
+        category = CategoryModel(name=name, parent_id=parent_id, is_active=is_active)
+        session.add(category)
+        await session.flush()
+        await session.execute(insert(ClosureModel).values(ancestor_id=category.id, descendant_id=category.id, depth=0))
+        if parent_id is not None:
+            await session.execute(text(
+                "INSERT INTO category_closure (ancestor_id, descendant_id, depth) "
+                "SELECT ancestor_id, :id, depth + 1 FROM category_closure WHERE descendant_id = :parent_id"
+            ), {"id": category.id, "parent_id": parent_id})
+        await session.commit()
+        return category.id
+
+
+async def create_product(seller_id: int, category_id: int, name: str = "Product", price: str = "100.00",
+                         stock: int = 10, is_active: bool = True, deleted: bool = False) -> int:
+    async with async_session_maker() as session:
+        product = ProductModel(name=name, price=Decimal(price), stock=stock, is_active=is_active,
+                               category_id=category_id, seller_id=seller_id)
+        session.add(product)
+        await session.flush()
+        if deleted:
+            await session.execute(text("UPDATE products SET deleted_at = now() WHERE id = :id"), {"id": product.id})
+        await session.commit()
+        return product.id
+
+
+async def fetch_product(product_id: int) -> ProductModel:
+    async with async_session_maker() as session:
+        return await session.get(ProductModel, product_id)
+
+
+@asynccontextmanager
+async def lost_stock_update(product_id: int):
+    """
+    Имитирует параллельное изменение товара: триггер молча пропускает списание его остатка,
+    и условный UPDATE при оформлении заказа затрагивает меньше строк, чем в корзине.
+    """
+    async with async_session_maker() as session:
+        await session.execute(text(
+            "CREATE OR REPLACE FUNCTION skip_stock_decrement() RETURNS trigger AS $$ "
+            "BEGIN IF NEW.stock < OLD.stock THEN RETURN NULL; END IF; RETURN NEW; END $$ LANGUAGE plpgsql"
+        ))
+        await session.execute(text("DROP TRIGGER IF EXISTS skip_stock_decrement ON products"))
+        await session.execute(text(
+            f"CREATE TRIGGER skip_stock_decrement BEFORE UPDATE ON products "
+            f"FOR EACH ROW WHEN (OLD.id = {int(product_id)}) EXECUTE FUNCTION skip_stock_decrement()"
+        ))
+        await session.commit()
+    try:
+        yield
+    finally:
+        async with async_session_maker() as session:
+            await session.execute(text("DROP TRIGGER skip_stock_decrement ON products"))
+            await session.execute(text("DROP FUNCTION skip_stock_decrement()"))
+            await session.commit()
@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from factories import create_user, create_category, create_product
+
+
+async def test_adding_same_product_increments_quantity(client):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category())
+
+    first = await client.post("/cart/items", headers=headers, json={"product_id": product_id, "quantity": 2})
+    second = await client.post("/cart/items", headers=headers, json={"product_id": product_id, "quantity": 3})
+    assert first.status_code == second.status_code == 201
+    assert second.json()["id"] == first.json()["id"]
+    assert second.json()["quantity"] == 5
+
+    cart = (await client.get("/cart/", headers=headers)).json()
+    assert [(item["product"]["id"], item["quantity"]) for item in cart["items"]] == [(product_id, 5)]
+
+
+async def test_inactive_product_is_not_added(client):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category(), stock=0, is_active=False)
+
+    response = await client.post("/cart/items", headers=headers, json={"product_id": product_id, "quantity": 1})
+    assert response.status_code == 404
+    assert (await client.get("/cart/", headers=headers)).json()["items"] == []
+
+
+async def test_batch_update_is_atomic(client):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    first = await create_product(seller.id, category_id)
+    second = await create_product(seller.id, category_id)
+    await client.post("/cart/items", headers=headers, json={"product_id": first, "quantity": 1})
+
+    response = await client.post("/cart/items/batch", headers=headers, json={"items": [
+        {"product_id": first, "quantity": 0}, {"product_id": second, "quantity": 4}]})
+    assert response.status_code == 200
+    assert [(item["product"]["id"], item["quantity"]) for item in response.json()["items"]] == [(second, 4)]
+
+    # Неизвестный товар откатывает весь пакет
+    failed = await client.post("/cart/items/batch", headers=headers, json={"items": [
+        {"product_id": second, "quantity": 1}, {"product_id": 999, "quantity": 1}]})
+    assert failed.status_code == 404
+    assert (await client.get("/cart/", headers=headers)).json()["items"][0]["quantity"] == 4
+
+
+async def test_cart_totals_match_summary(client):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    cheap = await create_product(seller.id, category_id, price="10.50")
+    expensive = await create_product(seller.id, category_id, price="99.99")
+
+    empty_cart = (await client.get("/cart/", headers=headers)).json()
+    empty_summary = (await client.get("/cart/summary", headers=headers)).json()
+    assert (empty_cart["total_quantity"], Decimal(empty_cart["total_price"])) == (0, 0)
+    assert (empty_summary["items_count"], empty_summary["total_quantity"], Decimal(empty_summary["total_price"])) == (0, 0, 0)
+
+    await client.post("/cart/items/batch", headers=headers, json={"items": [
+        {"product_id": cheap, "quantity": 2}, {"product_id": expensive, "quantity": 1}]})
+    cart = (await client.get("/cart/", headers=headers)).json()
+    summary = (await client.get("/cart/summary", headers=headers)).json()
+    assert cart["total_quantity"] == summary["total_quantity"] == 3
+    assert Decimal(cart["total_price"]) == Decimal(summary["total_price"]) == Decimal("120.99")
+    assert summary["items_count"] == 2
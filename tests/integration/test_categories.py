@@ -0,0 +1,31 @@
+from factories import create_user, create_category, create_product
+
+
+async def test_deleted_category_hides_cached_products(client, fake_redis):
+    _, admin_headers = await create_user("admin")
+    seller, _ = await create_user("seller")
+    category_id = await create_category()
+    product_id = await create_product(seller.id, category_id)
+    # Карточка попадает в оба уровня кэша до удаления категории
+    assert (await client.get(f"/products/{product_id}")).status_code == 200
+
+    assert (await client.delete(f"/categories/{category_id}", headers=admin_headers)).status_code == 200
+    response = await client.get(f"/products/{product_id}")
+    assert (response.status_code, response.json()["detail"]) == (404, "Category not found")
+
+
+async def test_category_tree_is_revalidated_by_etag(client):
+    _, admin_headers = await create_user("admin")
+    await create_category("Phones")
+
+    first = await client.get("/categories/tree")
+    etag = first.headers["ETag"]
+    assert (first.status_code, first.headers["Cache-Control"]) == (200, "no-cache")
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}'):
+        revalidated = await client.get("/categories/tree", headers={"If-None-Match": if_none_match})
+        assert (revalidated.status_code, revalidated.headers["ETag"]) == (304, etag)
+
+    assert (await client.post("/categories/", headers=admin_headers, json={"name": "Laptops"})).status_code == 201
+    changed = await client.get("/categories/tree", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+    assert [node["name"] for node in changed.json()] == ["Phones", "Laptops"]
@@ -0,0 +1,113 @@
+import asyncio
+from sqlalchemy import func, select, update
+
+from app.auth import hash_password_async
+from app.database import async_session_maker
+from app.idempotency import IDEMPOTENCY_HEADER, REPLAYED_HEADER
+from app.models.idempotency_keys import IdempotencyKey
+from app.models.orders import Order as OrderModel
+from app.models.users import User as UserModel
+from factories import create_user, create_category, create_product, lost_stock_update
+
+
+async def _count(model) -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+
+async def _buyer_with_cart(client, stock: int = 10):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category(), stock=stock)
+    response = await client.post("/cart/items", headers=headers, json={"product_id": product_id, "quantity": 1})
+    assert response.status_code == 201
+    return headers, product_id
+
+
+async def test_retried_checkout_is_replayed(client, payment_gateway):
+    headers, _ = await _buyer_with_cart(client)
+    headers = headers | {IDEMPOTENCY_HEADER: "checkout-1"}
+
+    first = await client.post("/orders/checkout", headers=headers)
+    retry = await client.post("/orders/checkout", headers=headers)
+    assert first.status_code == retry.status_code == 201
+    assert REPLAYED_HEADER not in first.headers
+    assert retry.headers[REPLAYED_HEADER] == "true"
+    assert retry.json() == first.json()
+    assert await _count(OrderModel) == 1
+    assert len(payment_gateway) == 1
+
+
+async def test_concurrent_duplicates_run_once(client, payment_gateway):
+    headers, _ = await _buyer_with_cart(client)
+    headers = headers | {IDEMPOTENCY_HEADER: "checkout-concurrent"}
+
+    responses = await asyncio.gather(*(client.post("/orders/checkout", headers=headers) for _ in range(3)))
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    assert len({response.json()["order"]["id"] for response in responses}) == 1
+    assert sum(REPLAYED_HEADER in response.headers for response in responses) == 2
+    assert await _count(OrderModel) == 1
+
+
+async def test_key_reused_for_other_request_is_rejected(client):
+    headers, product_id = await _buyer_with_cart(client)
+    headers = headers | {IDEMPOTENCY_HEADER: "add-item"}
+
+    added = await client.post("/cart/items", headers=headers, json={"product_id": product_id, "quantity": 2})
+    assert added.status_code == 201
+    other_body = await client.post("/cart/items", headers=headers, json={"product_id": product_id, "quantity": 3})
+    assert other_body.status_code == 422
+    assert (await client.get("/cart/", headers=headers)).json()["total_quantity"] == 3
+
+
+async def test_keys_are_scoped_per_user(client, payment_gateway):
+    first_headers, _ = await _buyer_with_cart(client)
+    second_headers, _ = await _buyer_with_cart(client)
+
+    for headers in (first_headers, second_headers):
+        response = await client.post("/orders/checkout", headers=headers | {IDEMPOTENCY_HEADER: "same-key"})
+        assert response.status_code == 201
+        assert REPLAYED_HEADER not in response.headers
+    assert await _count(OrderModel) == 2
+
+
+async def test_invalid_key_is_rejected(client):
+    response = await client.post("/orders/checkout", headers={IDEMPOTENCY_HEADER: ""})
+    assert response.status_code == 400
+    response = await client.post("/orders/checkout", headers={IDEMPOTENCY_HEADER: "k" * 256})
+    assert response.status_code == 400
+
+
+async def test_conflict_releases_key_for_retry(client, payment_gateway):
+    headers, product_id = await _buyer_with_cart(client)
+    headers = headers | {IDEMPOTENCY_HEADER: "checkout-retry"}
+
+    async with lost_stock_update(product_id):
+        conflict = await client.post("/orders/checkout", headers=headers)
+    assert conflict.status_code == 409
+    assert await _count(IdempotencyKey) == 0
+
+    retry = await client.post("/orders/checkout", headers=headers)
+    assert retry.status_code == 201
+    assert REPLAYED_HEADER not in retry.headers
+    assert await _count(OrderModel) == 1
+
+
+async def test_anonymous_and_token_requests_are_not_stored(client):
+    user, _ = await create_user("buyer")
+    async with async_session_maker() as session:
+        await session.execute(update(UserModel).where(UserModel.id == user.id)
+                              .values(hashed_password=await hash_password_async("secret-password")))
+        await session.commit()
+    key = {IDEMPOTENCY_HEADER: "login"}
+
+    responses = [await client.post("/users/token", headers=key,
+                                   data={"username": user.email, "password": "secret-password"}) for _ in range(2)]
+    assert [response.status_code for response in responses] == [200, 200]
+    assert not any(REPLAYED_HEADER in response.headers for response in responses)
+
+    # refresh-токен передаётся в Authorization, но ответ с новым access-токеном тоже не сохраняется
+    refresh_headers = key | {"Authorization": f"Bearer {responses[0].json()['refresh_token']}"}
+    refreshed = await client.post("/users/refresh-token", headers=refresh_headers)
+    assert refreshed.status_code == 200 and REPLAYED_HEADER not in refreshed.headers
+    assert await _count(IdempotencyKey) == 0
@@ -0,0 +1,182 @@
+from decimal import Decimal
+from sqlalchemy import func, select
+
+from app.database import async_session_maker
+from app.pagination import encode_cursor
+from app.payments import PaymentGatewayUnavailable
+from app.models.cart_items import CartItem as CartItemModel
+from app.models.orders import Order as OrderModel
+from factories import create_user, create_category, create_product, fetch_product, lost_stock_update
+
+
+async def _fill_cart(client, headers, items: dict[int, int]) -> None:
+    response = await client.post("/cart/items/batch", headers=headers, json={"items": [
+        {"product_id": product_id, "quantity": quantity} for product_id, quantity in items.items()]})
+    assert response.status_code == 200
+
+
+async def _count(model) -> int:
+    async with async_session_maker() as session:
+        return await session.scalar(select(func.count()).select_from(model))
+
+
+async def test_checkout_rejects_empty_cart_and_unavailable_products(client, payment_gateway):
+    seller, seller_headers = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    scarce = await create_product(seller.id, category_id, stock=1)
+    removed = await create_product(seller.id, category_id)
+
+    empty = await client.post("/orders/checkout", headers=headers)
+    assert (empty.status_code, empty.json()["detail"]) == (400, "Cart is empty")
+
+    await _fill_cart(client, headers, {scarce: 2})
+    not_enough = await client.post("/orders/checkout", headers=headers)
+    assert not_enough.status_code == 400
+    assert not_enough.json()["detail"].startswith("Not enough stock")
+
+    await _fill_cart(client, headers, {scarce: 1, removed: 1})
+    await client.delete(f"/products/{removed}", headers=seller_headers)
+    unavailable = await client.post("/orders/checkout", headers=headers)
+    assert (unavailable.status_code, unavailable.json()["detail"]) == (400, f"Product {removed} is unavailable")
+
+    assert (await fetch_product(scarce)).stock == 1
+    assert await _count(OrderModel) == 0
+    assert payment_gateway == []
+
+
+async def test_checkout_conflict_rolls_back_everything(client, payment_gateway):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    first = await create_product(seller.id, category_id, stock=5)
+    second = await create_product(seller.id, category_id, stock=5)
+    await _fill_cart(client, headers, {first: 1, second: 1})
+
+    async with lost_stock_update(second):
+        response = await client.post("/orders/checkout", headers=headers)
+    assert response.status_code == 409
+
+    assert [(await fetch_product(product_id)).stock for product_id in (first, second)] == [5, 5]
+    assert await _count(OrderModel) == 0
+    assert await _count(CartItemModel) == 2
+    assert (await client.post("/orders/checkout", headers=headers)).status_code == 201
+
+
+async def test_checkout_reserves_stock_and_creates_payment(client, payment_gateway):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    last_unit = await create_product(seller.id, category_id, price="50.00", stock=2)
+    plenty = await create_product(seller.id, category_id, price="10.00", stock=10)
+    await _fill_cart(client, headers, {last_unit: 2, plenty: 3})
+
+    response = await client.post("/orders/checkout", headers=headers)
+    assert response.status_code == 201
+    body = response.json()
+    order_id = body["order"]["id"]
+    assert Decimal(body["order"]["total_amount"]) == Decimal("130.00")
+    assert body["confirmation_url"] == f"https://pay.example/{order_id}"
+    assert [call["order_id"] for call in payment_gateway] == [order_id]
+
+    sold_out = await fetch_product(last_unit)
+    assert (sold_out.stock, sold_out.is_active) == (0, False)
+    assert (await fetch_product(plenty)).stock == 7
+    assert await _count(CartItemModel) == 0
+    async with async_session_maker() as session:
+        order = await session.get(OrderModel, order_id)
+    assert order.status == "pending" and order.reserved_until is not None
+
+    payment = (await client.get(f"/orders/{order_id}/payment", headers=headers)).json()
+    assert (payment["payment_status"], payment["confirmation_url"]) == ("ready", body["confirmation_url"])
+
+
+async def test_checkout_defers_payment_when_gateway_fails(client, monkeypatch):
+    async def unavailable_gateway(**kwargs):
+        raise PaymentGatewayUnavailable("YooKassa is down")
+
+    queued = []
+    monkeypatch.setattr("app.payments.create_yookassa_payment", unavailable_gateway)
+    monkeypatch.setattr("app.routers.orders.create_order_payment_task.delay", queued.append)
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category())
+    await _fill_cart(client, headers, {product_id: 1})
+
+    response = await client.post("/orders/checkout", headers=headers)
+    assert response.status_code == 201
+    order_id = response.json()["order"]["id"]
+    assert response.json()["payment_status"] == "processing"
+    assert queued == [order_id]
+    payment = (await client.get(f"/orders/{order_id}/payment", headers=headers)).json()
+    assert payment["payment_status"] == "processing"
+
+
+async def _assert_checkout_undone(client, headers, product_id: int, order_id: int) -> None:
+    async with async_session_maker() as session:
+        order = await session.get(OrderModel, order_id)
+    assert (order.status, order.reserved_until) == ("canceled", None)
+    restored = await fetch_product(product_id)
+    assert (restored.stock, restored.is_active) == (1, True)
+    cart = (await client.get("/cart/", headers=headers)).json()
+    assert [(item["product"]["id"], item["quantity"]) for item in cart["items"]] == [(product_id, 1)]
+
+
+async def test_checkout_cancels_order_when_payment_is_rejected(client, monkeypatch):
+    async def misconfigured_gateway(**kwargs):
+        raise RuntimeError("Задайте YOOKASSA_SHOP_ID и YOOKASSA_SECRET_KEY в .env")
+
+    queued = []
+    monkeypatch.setattr("app.payments.create_yookassa_payment", misconfigured_gateway)
+    monkeypatch.setattr("app.routers.orders.create_order_payment_task.delay", queued.append)
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category(), stock=1)
+    await _fill_cart(client, headers, {product_id: 1})
+
+    response = await client.post("/orders/checkout", headers=headers)
+    assert (response.status_code, response.json()["detail"]) == (502, "Payment could not be created")
+    assert queued == []
+    await _assert_checkout_undone(client, headers, product_id, order_id=1)
+
+
+async def test_checkout_cancels_order_when_payment_cannot_be_queued(client, monkeypatch):
+    async def unavailable_gateway(**kwargs):
+        raise PaymentGatewayUnavailable("YooKassa is down")
+
+    def broker_down(order_id):
+        raise ConnectionError("Redis is down")
+
+    monkeypatch.setattr("app.payments.create_yookassa_payment", unavailable_gateway)
+    monkeypatch.setattr("app.routers.orders.create_order_payment_task.delay", broker_down)
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category(), stock=1)
+    await _fill_cart(client, headers, {product_id: 1})
+
+    response = await client.post("/orders/checkout", headers=headers)
+    assert response.status_code == 503
+    await _assert_checkout_undone(client, headers, product_id, order_id=1)
+
+
+async def test_order_history_keyset_pages(client, payment_gateway):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category())
+    order_ids = []
+    for _ in range(3):
+        await _fill_cart(client, headers, {product_id: 1})
+        order_ids.append((await client.post("/orders/checkout", headers=headers)).json()["order"]["id"])
+
+    first_page = (await client.get("/orders/", headers=headers, params={"page_size": 2})).json()
+    assert first_page["total"] == 3
+    assert [item["id"] for item in first_page["items"]] == order_ids[:0:-1]
+    assert first_page["items"][0]["items_count"] == 1
+
+    second_page = (await client.get("/orders/", headers=headers,
+                                    params={"page_size": 2, "cursor": first_page["next_cursor"]})).json()
+    assert [item["id"] for item in second_page["items"]] == order_ids[:1]
+    assert second_page["next_cursor"] is None
+
+    foreign_cursor = await client.get("/orders/", headers=headers, params={"cursor": encode_cursor({"m": "id", "id": 1})})
+    assert foreign_cursor.status_code == 400
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from sqlalchemy import func, select, update
+
+from app.database import async_session_maker
+from app.models.product_imports import ProductImportJob as ImportJobModel
+from app.models.products import Product as ProductModel
+from app.product_import import IMPORT_DIR, run_product_import, fail_stale_import_jobs
+from factories import create_user, create_category
+
+
+async def _create_job(seller_id: int, status: str = "pending", idle_minutes: int = 0, total_rows: int = 0) -> int:
+    async with async_session_maker() as session:
+        job = ImportJobModel(seller_id=seller_id, format="csv", status=status, total_rows=total_rows)
+        session.add(job)
+        await session.flush()
+        if idle_minutes:
+            await session.execute(update(ImportJobModel).where(ImportJobModel.id == job.id)
+                                  .values(updated_at=func.now() - timedelta(minutes=idle_minutes)))
+        await session.commit()
+        return job.id
+
+
+async def _get_job(job_id: int) -> ImportJobModel:
+    async with async_session_maker() as session:
+        return await session.get(ImportJobModel, job_id)
+
+
+def _write_import_file(name: str, content: str):
+    IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = IMPORT_DIR / name
+    path.write_text(content, encoding="utf-8")
+    return path
+
+
+async def test_stale_jobs_are_failed(db):
+    seller, _ = await create_user("seller")
+    stuck = await _create_job(seller.id, status="processing", idle_minutes=60, total_rows=2000)
+    lost = await _create_job(seller.id, status="pending", idle_minutes=60)
+    running = await _create_job(seller.id, status="processing")
+    finished = await _create_job(seller.id, status="completed", idle_minutes=60)
+
+    async with async_session_maker() as session:
+        assert await fail_stale_import_jobs(session, stale_minutes=30) == 2
+
+    stuck_job = await _get_job(stuck)
+    assert stuck_job.status == "failed" and stuck_job.finished_at is not None
+    assert stuck_job.errors == [{"row": 2001, "error": "Import interrupted, please upload the file again"}]
+    assert (await _get_job(lost)).status == "failed"
+    assert (await _get_job(running)).status == "processing"
+    assert (await _get_job(finished)).status == "completed"
+
+
+async def test_import_loads_valid_rows_and_reports_errors(db):
+    seller, _ = await create_user("seller")
+    category_id = await create_category()
+    job_id = await _create_job(seller.id)
+    path = _write_import_file(f"test-{job_id}.csv", (
+        "name,description,price,stock,category_id\n"
+        f"Imported lamp,,19.99,5,{category_id}\n"
+        f"Bad price,,-1,5,{category_id}\n"
+        "Missing category,,5.00,1,999\n"
+    ))
+
+    await run_product_import(job_id, path, "csv", seller.id)
+
+    job = await _get_job(job_id)
+    assert (job.status, job.total_rows, job.imported_rows, job.failed_rows) == ("completed", 3, 1, 2)
+    assert [error["row"] for error in job.errors] == [2, 3]
+    assert not path.exists()
+    async with async_session_maker() as session:
+        names = list(await session.scalars(select(ProductModel.name).where(ProductModel.seller_id == seller.id)))
+    assert names == ["Imported lamp"]
+
+
+async def test_import_skips_job_that_is_not_pending(db):
+    seller, _ = await create_user("seller")
+    category_id = await create_category()
+    job_id = await _create_job(seller.id, status="failed")
+    path = _write_import_file(f"test-{job_id}.csv", f"name,description,price,stock,category_id\nLamp,,1.00,1,{category_id}\n")
+
+    await run_product_import(job_id, path, "csv", seller.id)
+
+    assert (await _get_job(job_id)).status == "failed"
+    assert not path.exists()
+    async with async_session_maker() as session:
+        assert await session.scalar(select(func.count()).select_from(ProductModel)) == 0
@@ -0,0 +1,171 @@
+import pytest
+from sqlalchemy import update
+
+from app.database import async_session_maker
+from app.models.products import Product as ProductModel
+from app.pagination import encode_cursor
+from app.suggest import suggest_index
+from factories import create_user, create_category, create_product, fetch_product
+
+
+async def test_product_cursor_pages_cover_list_once(client):
+    seller, _ = await create_user("seller")
+    category_id = await create_category()
+    product_ids = [await create_product(seller.id, category_id, name=f"Product {i}") for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"page_size": 2} | ({"cursor": cursor} if cursor else {})
+        body = (await client.get("/products/", params=params)).json()
+        assert body["total_items"] == 5
+        seen.extend(item["id"] for item in body["page_items"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == product_ids
+
+    # Курсор обычного списка не подходит к выдаче поиска, отсортированной по рангу
+    mismatch = await client.get("/products/", params={"cursor": encode_cursor({"m": "id", "id": seen[1]}),
+                                                      "search": "product"})
+    assert mismatch.status_code == 400
+
+
+@pytest.mark.parametrize("count", ["exact", "windowed", "estimated", "cached"])
+async def test_count_strategies_agree(client, count):
+    seller, _ = await create_user("seller")
+    category_id = await create_category()
+    for i in range(3):
+        await create_product(seller.id, category_id, name=f"Product {i}")
+    await create_product(seller.id, category_id, name="Sold out", stock=0, is_active=False)
+
+    body = (await client.get("/products/", params={"count": count, "page_size": 2})).json()
+    assert body["total_items"] == 3
+    # Небольшая выборка: оценку и промах кэша заменяет точный подсчёт
+    assert body["count_strategy"] == ("windowed" if count == "windowed" else "exact")
+
+    out_of_range = (await client.get("/products/", params={"count": count, "page": 5, "page_size": 2})).json()
+    assert out_of_range["page_items"] == []
+    assert out_of_range["total_items"] == 3
+
+
+async def test_products_of_inactive_category_are_not_listed(client):
+    seller, _ = await create_user("seller")
+    parent_id = await create_category("Parent")
+    child_id = await create_category("Child", parent_id=parent_id)
+    inactive_id = await create_category("Inactive", is_active=False)
+    child_product = await create_product(seller.id, child_id)
+    await create_product(seller.id, inactive_id)
+
+    subtree = await client.get(f"/products/category/{parent_id}")
+    assert subtree.status_code == 200
+    assert [item["id"] for item in subtree.json()["items"]] == [child_product]
+
+    inactive = await client.get(f"/products/category/{inactive_id}")
+    assert inactive.status_code == 400
+    assert inactive.json()["detail"] == "Category not found"
+    assert (await client.get("/products/category/999")).status_code == 400
+
+
+async def test_product_list_is_revalidated_by_etag_only(client):
+    seller, seller_headers = await create_user("seller")
+    category_id = await create_category()
+    product_ids = [await create_product(seller.id, category_id, name=f"Product {i}") for i in range(3)]
+
+    response = await client.get("/products/")
+    assert response.status_code == 200
+    assert "Last-Modified" not in response.headers
+    etag = response.headers["ETag"]
+
+    cached = await client.get("/products/", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+
+    # После удаления товара max(updated_at) активных строк не растёт, но ETag меняется
+    assert (await client.delete(f"/products/{product_ids[-1]}", headers=seller_headers)).status_code == 200
+    revalidated = await client.get("/products/", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 200
+    assert revalidated.json()["total_items"] == 2
+    by_date = await client.get("/products/", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+    assert by_date.status_code == 200
+
+
+async def test_bulk_update_reactivates_restocked_products_except_deleted(client):
+    seller, seller_headers = await create_user("seller")
+    other_seller, _ = await create_user("seller")
+    category_id = await create_category()
+    sold_out = await create_product(seller.id, category_id, stock=0, is_active=False)
+    deleted = await create_product(seller.id, category_id, stock=0, is_active=False, deleted=True)
+    selling = await create_product(seller.id, category_id, stock=3)
+    foreign = await create_product(other_seller.id, category_id, stock=0, is_active=False)
+
+    response = await client.patch("/products/bulk", headers=seller_headers, json={"items": [
+        {"id": sold_out, "stock": 5}, {"id": deleted, "stock": 5}, {"id": selling, "stock": 0},
+        {"id": foreign, "stock": 5}, {"id": 999, "stock": 5},
+    ]})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["updated"] == 2
+    assert [(item["status"], item["is_active"]) for item in body["items"]] == [
+        ("updated", True), ("not_found", None), ("updated", False), ("forbidden", None), ("not_found", None),
+    ]
+    assert (await fetch_product(sold_out)).is_active
+    assert (await fetch_product(deleted)).stock == 0
+    assert not (await fetch_product(foreign)).is_active
+
+
+async def test_bulk_price_change_keeps_activity(client):
+    seller, seller_headers = await create_user("seller")
+    category_id = await create_category()
+    # Товар, выставленный с нулевым остатком (например, под предзаказ), остаётся активным
+    listed_empty = await create_product(seller.id, category_id, stock=0)
+    sold_out = await create_product(seller.id, category_id, stock=0, is_active=False)
+
+    response = await client.patch("/products/bulk", headers=seller_headers, json={"items": [
+        {"id": listed_empty, "price": "120.00"}, {"id": sold_out, "price": "80.00"}]})
+    assert [(item["price"], item["is_active"]) for item in response.json()["items"]] == [
+        ("120.00", True), ("80.00", False)]
+    assert (await fetch_product(listed_empty)).is_active
+
+
+async def test_sold_out_product_can_be_deleted_and_stays_inactive(client):
+    seller, seller_headers = await create_user("seller")
+    category_id = await create_category()
+    product_id = await create_product(seller.id, category_id, stock=0, is_active=False)
+
+    assert (await client.delete(f"/products/{product_id}", headers=seller_headers)).status_code == 200
+    assert (await fetch_product(product_id)).deleted_at is not None
+    assert (await client.delete(f"/products/{product_id}", headers=seller_headers)).status_code == 404
+
+    restock = await client.patch("/products/bulk", headers=seller_headers,
+                                 json={"items": [{"id": product_id, "stock": 10}]})
+    assert restock.json()["items"][0]["status"] == "not_found"
+    assert not (await fetch_product(product_id)).is_active
+
+
+async def test_suggest_prefers_rating_over_alphabet(client, monkeypatch):
+    seller, _ = await create_user("seller")
+    category_id = await create_category()
+    ratings = {"Apple juice": 1.0, "Avocado oil": 2.0, "Azure lamp": 5.0, "Azure kettle": 4.0, "Bread": 3.0}
+    ids = {}
+    for name, rating in ratings.items():
+        ids[name] = await create_product(seller.id, category_id, name=name)
+        async with async_session_maker() as session:
+            await session.execute(update(ProductModel).where(ProductModel.id == ids[name]).values(rating=rating))
+            await session.commit()
+    monkeypatch.setattr(suggest_index, "_loaded_at", None)
+    await suggest_index.warm_up()
+
+    # Короткий префикс обходит товары по рейтингу, длинный — диапазон слов; порядок выдачи один и тот же
+    for scan_limit in (2, 100):
+        monkeypatch.setattr(suggest_index, "scan_limit", scan_limit)
+        response = await client.get("/products/suggest", params={"q": "a", "limit": 2})
+        assert [item["name"] for item in response.json()] == ["Azure lamp", "Azure kettle"]
+        response = await client.get("/products/suggest", params={"q": "azure k"})
+        assert [item["name"] for item in response.json()] == ["Azure kettle"]
+
+    suggest_index.remove(ids["Azure lamp"])
+    suggest_index.upsert(ids["Bread"], "Banana bread", 6.0)
+    response = await client.get("/products/suggest", params={"q": "b"})
+    assert [item["name"] for item in response.json()] == ["Banana bread"]
+    monkeypatch.setattr(suggest_index, "scan_limit", 0)
+    response = await client.get("/products/suggest", params={"q": "a", "limit": 5})
+    assert [item["name"] for item in response.json()] == ["Azure kettle", "Avocado oil", "Apple juice"]
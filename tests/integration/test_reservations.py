@@ -0,0 +1,114 @@
+from datetime import timedelta
+from sqlalchemy import update, func
+
+from app.database import async_session_maker
+from app.models.orders import Order as OrderModel
+from app.reservations import expire_all_reservations
+from factories import create_user, create_category, create_product, fetch_product
+
+
+async def _checkout(client, headers, items: dict[int, int]) -> int:
+    await client.post("/cart/items/batch", headers=headers, json={"items": [
+        {"product_id": product_id, "quantity": quantity} for product_id, quantity in items.items()]})
+    response = await client.post("/orders/checkout", headers=headers)
+    assert response.status_code == 201
+    return response.json()["order"]["id"]
+
+
+async def _expire_now(order_id: int) -> None:
+    async with async_session_maker() as session:
+        await session.execute(update(OrderModel).where(OrderModel.id == order_id)
+                              .values(reserved_until=func.now() - timedelta(seconds=1)))
+        await session.commit()
+
+
+async def _expire_reservations() -> dict:
+    async with async_session_maker() as session:
+        return await expire_all_reservations(session, batch_size=1)
+
+
+async def test_expired_reservation_returns_stock_once(client, payment_gateway):
+    seller, seller_headers = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    sold_out = await create_product(seller.id, category_id, stock=2)
+    deleted = await create_product(seller.id, category_id, stock=1)
+    remaining = await create_product(seller.id, category_id, stock=10)
+    order_id = await _checkout(client, headers, {sold_out: 2, deleted: 1, remaining: 4})
+    # Продавец удаляет распроданный заказом товар, пока заказ ждёт оплаты
+    assert (await client.delete(f"/products/{deleted}", headers=seller_headers)).status_code == 200
+    await _expire_now(order_id)
+
+    metrics = await _expire_reservations()
+    assert {key: metrics[key] for key in ("orders", "units", "products", "reactivated", "batches")} == {
+        "orders": 1, "units": 7, "products": 3, "reactivated": 1, "batches": 1}
+
+    restocked = await fetch_product(sold_out)
+    assert (restocked.stock, restocked.is_active) == (2, True)
+    still_deleted = await fetch_product(deleted)
+    assert (still_deleted.stock, still_deleted.is_active) == (1, False)
+    assert (await fetch_product(remaining)).stock == 10
+    status = (await client.get(f"/orders/{order_id}/status", headers=headers)).json()
+    assert status["status"] == "expired"
+
+    assert (await _expire_reservations())["orders"] == 0
+    assert (await fetch_product(remaining)).stock == 10
+
+
+async def test_active_reservations_are_kept(client, payment_gateway):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    category_id = await create_category()
+    first = await create_product(seller.id, category_id, stock=3)
+    second = await create_product(seller.id, category_id, stock=3)
+    expired_order = await _checkout(client, headers, {first: 1})
+    await _expire_now(expired_order)
+    await _expire_now(await _checkout(client, headers, {second: 1}))
+    kept_order = await _checkout(client, headers, {first: 2})
+
+    metrics = await _expire_reservations()
+    # Пачки по одному заказу: второй запуск цикла забирает вторую просроченную пачку
+    assert (metrics["orders"], metrics["batches"]) == (2, 2)
+    assert [(await fetch_product(product_id)).stock for product_id in (first, second)] == [1, 3]
+    assert (await client.get(f"/orders/{kept_order}/status", headers=headers)).json()["status"] == "pending"
+
+
+async def _notify(client, order_id: int, payment_status: str):
+    response = await client.post("/payments/yookassa/webhook", headers={"X-Forwarded-For": "185.71.76.1"}, json={
+        "type": "notification", "event": f"payment.{payment_status}",
+        "object": {"id": f"payment-{order_id}", "status": payment_status, "paid": payment_status == "succeeded",
+                   "amount": {"value": "10.00", "currency": "RUB"}, "metadata": {"order_id": str(order_id)}},
+    })
+    assert response.status_code == 200
+
+
+async def test_paid_order_is_not_expired(client, payment_gateway):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category(), stock=3)
+    order_id = await _checkout(client, headers, {product_id: 2})
+
+    await _notify(client, order_id, "succeeded")
+    await _expire_now(order_id)
+    assert (await _expire_reservations())["orders"] == 0
+
+    status = (await client.get(f"/orders/{order_id}/status", headers=headers)).json()
+    assert status["status"] == "paid" and status["paid_at"] is not None
+    assert (await fetch_product(product_id)).stock == 1
+
+
+async def test_payment_after_expiry_requires_refund(client, payment_gateway):
+    seller, _ = await create_user("seller")
+    _, headers = await create_user("buyer")
+    product_id = await create_product(seller.id, await create_category(), stock=3)
+    order_id = await _checkout(client, headers, {product_id: 2})
+    await _expire_now(order_id)
+    await _expire_reservations()
+
+    await _notify(client, order_id, "succeeded")
+    await _notify(client, order_id, "canceled")
+
+    status = (await client.get(f"/orders/{order_id}/status", headers=headers)).json()
+    assert status["status"] == "refund_required" and status["paid_at"] is not None
+    # Остатки вернулись при истечении резерва и не списываются и не возвращаются повторно
+    assert (await fetch_product(product_id)).stock == 3
@@ -0,0 +1,22 @@
+import pytest
+
+from factories import create_user
+
+
+@pytest.mark.parametrize("shared_cache", [False, True], ids=["database", "redis"])
+async def test_role_change_and_blocking_revoke_tokens_at_once(client, request, shared_cache):
+    if shared_cache:
+        request.getfixturevalue("fake_redis")
+    _, admin_headers = await create_user("admin")
+    buyer, buyer_headers = await create_user("buyer")
+    seller, seller_headers = await create_user("seller")
+
+    # Состояние пользователей попадает в кэш до изменения
+    assert (await client.get("/cart/", headers=buyer_headers)).status_code == 200
+    assert (await client.get("/products/export", headers=seller_headers)).status_code == 200
+
+    assert (await client.patch(f"/users/{buyer.id}", headers=admin_headers, json={"role": "seller"})).status_code == 200
+    assert (await client.get("/cart/", headers=buyer_headers)).status_code == 401
+
+    assert (await client.patch(f"/users/{seller.id}", headers=admin_headers, json={"is_active": False})).status_code == 200
+    assert (await client.get("/products/export", headers=seller_headers)).status_code == 401
@@ -0,0 +1,40 @@
+import time
+
+from app.cache import TTLCache, TieredCache, user_cache
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+
+async def test_tiered_cache_without_redis_forgets_after_local_ttl():
+    cache = TieredCache("test", maxsize=10, local_ttl=0.05, remote_ttl=60)
+    await cache.set(1, {"token_version": 0})
+
+    assert await cache.get(1) == {"token_version": 0}
+    time.sleep(0.06)
+    assert await cache.get(1) is None
+
+
+async def test_user_cache_keeps_nothing_in_process():
+    # Без Redis каждая проверка токена читает пользователя из базы
+    await user_cache.set(1, {"token_version": 0})
+    assert await user_cache.get(1) is None
+
+
+async def test_user_state_read_before_change_does_not_overwrite_it(fake_redis):
+    stale = {"id": 1, "role": "buyer", "is_active": True, "token_version": 0}
+
+    await user_cache.set(1, stale | {"role": "seller", "token_version": 1})
+    await user_cache.set(1, stale, only_missing=True)
+
+    assert (await user_cache.get(1))["token_version"] == 1
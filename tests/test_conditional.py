@@ -0,0 +1,48 @@
+from datetime import datetime, timezone
+from starlette.requests import Request
+
+from app.conditional import make_etag, etag_matches, is_not_modified, validator_headers
+
+
+def _request(**headers: str) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                    "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]})
+
+
+def test_etag_depends_on_every_part():
+    assert make_etag("page=1", 10, None) == make_etag("page=1", 10, None)
+    assert make_etag("page=1", 10, None) != make_etag("page=1", 9, None)
+
+
+def test_etag_matches_weak_and_listed_validators():
+    etag = make_etag("product", 1)
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    etag = make_etag("product", 1)
+    last_modified = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    request = _request(if_none_match='"stale"', if_modified_since="Fri, 01 Jan 2027 00:00:00 GMT")
+
+    assert not is_not_modified(request, etag, last_modified)
+
+
+def test_if_modified_since_compares_whole_seconds():
+    etag = make_etag("product", 1)
+    last_modified = datetime(2026, 1, 1, 12, 0, 0, 500000, tzinfo=timezone.utc)
+
+    assert is_not_modified(_request(if_modified_since="Thu, 01 Jan 2026 12:00:00 GMT"), etag, last_modified)
+    assert not is_not_modified(_request(if_modified_since="Thu, 01 Jan 2026 11:59:59 GMT"), etag, last_modified)
+    assert not is_not_modified(_request(if_modified_since="not a date"), etag, last_modified)
+
+
+def test_etag_only_validators_ignore_if_modified_since():
+    etag = make_etag("products", 10)
+
+    assert not is_not_modified(_request(if_modified_since="Fri, 01 Jan 2100 00:00:00 GMT"), etag)
+    assert "Last-Modified" not in validator_headers(etag)
@@ -0,0 +1,30 @@
+import pytest
+from fastapi import HTTPException
+
+from app.pagination import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    payload = {"m": "rank", "r": 0.0759, "id": 42}
+    cursor = encode_cursor(payload)
+
+    assert "=" not in cursor
+    assert decode_cursor(cursor, mode="rank") == payload
+
+
+def test_cursor_from_other_mode_is_rejected():
+    cursor = encode_cursor({"m": "id", "id": 42})
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, mode="rank")
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Cursor does not match this query"
+
+
+@pytest.mark.parametrize("cursor", ["not-base64!", encode_cursor({"m": "id"}), encode_cursor({"m": "id", "id": "1"}),
+                                    encode_cursor([1, 2])])
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, mode="id")
+    assert exc_info.value.status_code == 400
+    assert exc_info.value.detail == "Invalid cursor"